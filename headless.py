@@ -0,0 +1,69 @@
+import argparse
+import sys
+
+from src.headless import HeadlessRunner
+from src.replay import InputRecording, InputReplay
+from src.substeps import SubstepPolicy
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(
+        description="Run the engine without window at maximum speed and report the throughput"
+    )
+    parser.add_argument(
+        "-m", "--map", type=str, default="bd", choices=sorted(HeadlessRunner.MAPS),
+        help="The map to load"
+    )
+    parser.add_argument(
+        "-n", "--steps", type=int, default=None,
+        help="Number of fixed steps to simulate"
+    )
+    parser.add_argument(
+        "-s", "--seconds", type=float, default=10.,
+        help="Simulated seconds, used if --steps is not given"
+    )
+    parser.add_argument(
+        "-dt", "--fixed-dt", type=float, default=1. / 60.,
+        help="The fixed time step passed to Engine.update"
+    )
+    parser.add_argument(
+        "-ss", "--substeps", type=str, default="fixed:10",
+        help="Substep policy, e.g. 'fixed:10', 'max-dt:0.002' or 'adaptive',"
+             " optionally followed by '/N' to update containers every N substeps"
+             " or '/0' for once per frame"
+    )
+    parser.add_argument(
+        "--seed", type=int, default=0,
+        help="Seed of the random generators"
+    )
+    parser.add_argument(
+        "-r", "--replay", type=str, default=None,
+        help="Replay an input recording of 'main.py --record' instead of the map,"
+             " the checksums of each step are compared with the recording"
+             " or stored in the recording if it has none"
+    )
+
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    options = parse_arguments()
+
+    if options.replay:
+        recording = InputRecording.load(options.replay)
+        had_checksums = bool(recording.checksums)
+        replay = InputReplay(recording).run(num_steps=options.steps)
+        replay.print_report()
+        if not had_checksums:
+            recording.save(options.replay)
+            print("stored", len(recording.checksums), "checksums in", options.replay)
+        sys.exit(1 if replay.num_mismatches else 0)
+
+    runner = HeadlessRunner(
+        map_name=options.map,
+        fixed_dt=options.fixed_dt,
+        substep_policy=SubstepPolicy.from_string(options.substeps),
+        seed=options.seed,
+    )
+    runner.run(num_steps=options.steps, seconds=options.seconds)
+    runner.print_report()
@@ -11,6 +11,14 @@ def parse_arguments():
         "-fs", "--fullscreen", type=bool, nargs="?", default=False, const=True,
         help="Start in fullscreen mode"
     )
+    parser.add_argument(
+        "--seed", type=int, default=0,
+        help="Seed of the random generators"
+    )
+    parser.add_argument(
+        "-r", "--record", type=str, default=None,
+        help="Record the player input to this file, replay it with 'headless.py --replay'"
+    )
 
     return parser.parse_args()
 
@@ -19,7 +27,7 @@ if __name__ == "__main__":
     options = parse_arguments()
     size = None if options.fullscreen else (640, 480)
 
-    window = MainWindow(size=size)
+    window = MainWindow(size=size, seed=options.seed, record_filename=options.record)
     pyglet.clock.schedule_interval(window.update, 1 / 60.0)
     pyglet.app.run()
 
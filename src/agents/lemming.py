@@ -47,6 +47,8 @@ class Lemming(AgentBase):
 
     def update(self, dt):
         super().update(dt)
+        if not self.body:
+            return
 
         dir_progress = max(0., self.body.velocity.x * self.direction)
         self.direction_progress += (dir_progress - self.direction_progress) * min(1., dt * 3.)
@@ -55,5 +57,4 @@ class Lemming(AgentBase):
             self.direction_progress = 100.
         #print(self.direction_progress)
 
-        if self.body:
-            self.apply_move(self.direction, dt)
+        self.apply_move(self.direction, dt)
@@ -1,15 +1,76 @@
+import math
+
+import numpy as np
 import pymunk
-from pymunk import Vec2d
+from pyglet import gl
 
 from .base import AgentBase
-from ..objects.primitives import Box, Circle, Ngon
-from ..objects.graphical import GraphicSettings
-from ..keyhandler import KeyHandler
 
 
 class Particles(AgentBase):
-    def __init__(self, **parameters):
+    """
+    Particle system that keeps all particles in numpy arrays instead of pymunk bodies.
+
+    Particles are integrated in one vectorized step and collide one-way against
+    the shapes in the space. The space is sampled like a coarse signed distance field,
+    one point query per occupied grid cell, and the distance is extrapolated
+    along the gradient to each particle in the cell.
+    All particles are rendered as pentagon outlines in a single vertex list.
+
+    :param max_particles: int, the oldest particles are dropped when exceeded
+    :param cell_size: float, size of the grid cells of the distance samples
+    :param restitution: float, bounciness of collisions
+    :param friction: float, amount of tangential velocity removed by a collision
+    :param seed: int, seed of the random generator used by add_particles()
+    """
+
+    NUM_RENDER_SEGMENTS = 5
+    # cell coordinates are expected within +/- this value
+    _CELL_OFFSET = 2 ** 20
+    TRANSIENT_ATTRIBUTES = {
+        "_vertex_list": None,
+    }
+
+    def __init__(
+            self,
+            max_particles=20000,
+            cell_size=.5,
+            restitution=.3,
+            friction=.2,
+            seed=None,
+            **parameters
+    ):
         super().__init__(start_position=(0, 0), **parameters)
+        self.max_particles = max_particles
+        self.cell_size = cell_size
+        self.restitution = restitution
+        self.friction = friction
+        self.rng = np.random.default_rng(seed)
+        self.num_particles = 0
+        self.positions = np.zeros((0, 2))
+        self.velocities = np.zeros((0, 2))
+        self.radii = np.zeros((0, ))
+        self.ages = np.zeros((0, ))
+        self.lifetimes = np.zeros((0, ))
+        self.filter_indices = np.zeros((0, ), dtype=np.int32)
+        self._shape_filters = [pymunk.ShapeFilter()]
+        self._vertex_list = None
+        t = np.arange(self.NUM_RENDER_SEGMENTS) / self.NUM_RENDER_SEGMENTS * math.pi * 2
+        ngon = np.stack([np.sin(t), np.cos(t)], axis=-1)
+        # start and end point of each outline segment, shape (2 * segments, 2)
+        self._unit_segments = np.stack([ngon, np.roll(ngon, -1, axis=0)], axis=1).reshape(-1, 2)
+
+    def to_dict(self):
+        return {
+            **super().to_dict(),
+            "max_particles": self.max_particles,
+            "cell_size": self.cell_size,
+            "restitution": self.restitution,
+            "friction": self.friction,
+        }
+
+    def __len__(self):
+        return self.num_particles
 
     def create_objects(self):
         pass
@@ -22,16 +83,171 @@ class Particles(AgentBase):
             lifetime=3.,
             shape_filter=None,
     ):
-        body = self.add_body(
-            Ngon(position, radius, 5, density=.1, default_shape_filter=shape_filter)
+        self.add_particle_arrays(
+            positions=[position],
+            velocities=[velocity],
+            radii=[radius],
+            lifetimes=[lifetime],
+            shape_filter=shape_filter,
         )
-        body.velocity = velocity
-        body.lifetime = 0.
-        body.max_lifetime = lifetime
+
+    def add_particles(
+            self,
+            position,
+            num=10,
+            min_angle=0,
+            max_angle=360,
+            min_velocity=1,
+            max_velocity=10,
+            min_radius=0.02,
+            max_radius=0.13,
+            min_lifetime=3,
+            max_lifetime=4,
+            shape_filter=None,
+    ):
+        """Add `num` particles at position with random direction, speed, radius and lifetime"""
+        angles = np.radians(self.rng.uniform(min_angle, max_angle, num))
+        speeds = self.rng.uniform(min_velocity, max_velocity, num)
+        self.add_particle_arrays(
+            positions=np.broadcast_to(np.array(position, dtype=np.float64), (num, 2)),
+            velocities=np.stack([np.sin(angles), np.cos(angles)], axis=-1) * speeds[:, None],
+            radii=self.rng.uniform(min_radius, max_radius, num),
+            lifetimes=self.rng.uniform(min_lifetime, max_lifetime, num),
+            shape_filter=shape_filter,
+        )
+
+    def add_particle_arrays(self, positions, velocities, radii, lifetimes, shape_filter=None):
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+        num = positions.shape[0]
+        if not num:
+            return
+        if shape_filter is None:
+            shape_filter = self._shape_filters[0]
+        if shape_filter not in self._shape_filters:
+            self._shape_filters.append(shape_filter)
+        filter_index = self._shape_filters.index(shape_filter)
+
+        self.positions = np.concatenate([self.positions, positions])
+        self.velocities = np.concatenate([self.velocities, np.asarray(velocities, dtype=np.float64).reshape(-1, 2)])
+        self.radii = np.concatenate([self.radii, np.broadcast_to(np.asarray(radii, dtype=np.float64), (num, ))])
+        self.ages = np.concatenate([self.ages, np.zeros(num)])
+        self.lifetimes = np.concatenate([self.lifetimes, np.broadcast_to(np.asarray(lifetimes, dtype=np.float64), (num, ))])
+        self.filter_indices = np.concatenate([self.filter_indices, np.full(num, filter_index, dtype=np.int32)])
+        self.num_particles = self.positions.shape[0]
+
+        if self.num_particles > self.max_particles:
+            self._keep(slice(self.num_particles - self.max_particles, None))
+
+    def clear(self):
+        self._keep(slice(0, 0))
 
     def update(self, dt):
         super().update(dt)
-        for body in self.bodies:
-            body.lifetime += dt
-            if body.lifetime >= body.max_lifetime:
-                self.remove_body(body)
+        if not self.num_particles:
+            return
+
+        self.ages += dt
+        alive = self.ages < self.lifetimes
+        if not np.all(alive):
+            self._keep(alive)
+            if not self.num_particles:
+                return
+
+        self.velocities += np.array(self.engine.space.gravity) * dt
+        self.positions += self.velocities * dt
+        self._collide()
+
+    def update_graphics(self, dt):
+        super().update_graphics(dt)
+        if not self.num_particles:
+            self._delete_vertex_list()
+            return
+
+        batch = self.engine.renderer.get_permanent_batch(self.graphic_settings.line_batch_name)
+        if not batch:
+            self._delete_vertex_list()
+            return
+
+        num_vertices = self.num_particles * self._unit_segments.shape[0]
+        vertices = self.positions[:, None, :] + self._unit_segments[None, :, :] * self.radii[:, None, None]
+        vertices = vertices.ravel().tolist()
+        if self._vertex_list is None:
+            self._vertex_list = batch.add(num_vertices, gl.GL_LINES, None, ("v2f/stream", vertices))
+        else:
+            if self._vertex_list.get_size() != num_vertices:
+                self._vertex_list.resize(num_vertices)
+            self._vertex_list.vertices[:] = vertices
+
+    def destroy_graphics(self):
+        super().destroy_graphics()
+        self._delete_vertex_list()
+
+    def _delete_vertex_list(self):
+        if self._vertex_list is not None:
+            self._vertex_list.delete()
+            self._vertex_list = None
+
+    def _keep(self, index):
+        """Keep only the particles selected by the slice or mask"""
+        self.positions = self.positions[index]
+        self.velocities = self.velocities[index]
+        self.radii = self.radii[index]
+        self.ages = self.ages[index]
+        self.lifetimes = self.lifetimes[index]
+        self.filter_indices = self.filter_indices[index]
+        self.num_particles = self.positions.shape[0]
+
+    def _collide(self):
+        distances, gradients = self._sample_distance_field()
+        penetration = self.radii - distances
+        hit = penetration > 0
+        if not np.any(hit):
+            return
+
+        normals = gradients[hit]
+        self.positions[hit] += normals * penetration[hit, None]
+
+        velocities = self.velocities[hit]
+        normal_speed = np.sum(velocities * normals, axis=-1)
+        approaching = normal_speed < 0
+        normal_velocities = normals * np.where(approaching, normal_speed, 0.)[:, None]
+        tangent_velocities = velocities - normals * normal_speed[:, None]
+        self.velocities[hit] = np.where(
+            approaching[:, None],
+            tangent_velocities * (1. - self.friction) - normal_velocities * self.restitution,
+            velocities,
+        )
+
+    def _sample_distance_field(self):
+        """
+        Returns the approximated signed distance and gradient to the nearest shape for each particle.
+        Each occupied (cell, shape filter) pair is sampled once at the cell center.
+        """
+        # pack cell x, cell y and filter index into one int64 key, 1d unique is much faster
+        cells = np.floor(self.positions / self.cell_size).astype(np.int64) + self._CELL_OFFSET
+        num_filters = len(self._shape_filters)
+        keys = (cells[:, 0] * (2 * self._CELL_OFFSET) + cells[:, 1]) * num_filters + self.filter_indices
+        unique_keys, inverse = np.unique(keys, return_inverse=True)
+
+        filter_indices = unique_keys % num_filters
+        unique_keys //= num_filters
+        unique_cells = np.stack([
+            unique_keys // (2 * self._CELL_OFFSET), unique_keys % (2 * self._CELL_OFFSET)
+        ], axis=-1) - self._CELL_OFFSET
+
+        max_distance = self.cell_size + float(np.max(self.radii))
+        centers = (unique_cells + .5) * self.cell_size
+        cell_distances = np.full(len(unique_keys), np.inf)
+        cell_gradients = np.zeros((len(unique_keys), 2))
+        point_query_nearest = self.engine.space.point_query_nearest
+        for i, (center, filter_index) in enumerate(zip(centers.tolist(), filter_indices.tolist())):
+            hit = point_query_nearest(center, max_distance, self._shape_filters[filter_index])
+            if hit and hit.shape:
+                cell_distances[i] = hit.distance
+                cell_gradients[i] = hit.gradient
+
+        gradients = cell_gradients[inverse]
+        distances = cell_distances[inverse] + np.sum(
+            (self.positions - centers[inverse]) * gradients, axis=-1
+        )
+        return distances, gradients
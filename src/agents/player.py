@@ -1,3 +1,6 @@
+from collections import deque
+
+import numpy as np
 import pymunk
 from pymunk import Vec2d
 
@@ -5,7 +8,6 @@ from .base import AgentBase
 from ..objects.primitives import Box, Circle, Ngon
 from ..objects.graphical import GraphicSettings
 from ..keyhandler import KeyHandler
-from ..util import dump_object
 
 
 class Player(AgentBase):
@@ -17,6 +19,11 @@ class Player(AgentBase):
         self.shape_filter = pymunk.ShapeFilter(categories=0b1, mask=pymunk.ShapeFilter.ALL_MASKS ^ 0b1)
         self.radius = .4
         self.picked_bodies = []
+        # seconds after which bullets are released to the engine's body_pool,
+        # None keeps them until something else removes them
+        self.bullet_lifetime = None
+        # (engine time, body) of the bullets in the order they were shot, if bullet_lifetime is set
+        self._bullets = deque()
 
     @property
     def position(self):
@@ -83,19 +90,17 @@ class Player(AgentBase):
 
         self.keys.update(dt)
 
+        if self.bullet_lifetime is not None:
+            while self._bullets and self.engine.time - self._bullets[0][0] >= self.bullet_lifetime:
+                self.engine.body_pool.release(self._bullets.popleft()[1])
+
     def has_foot_contact(self):
-        for offset in (
-                (0, 0), (-self.radius, 0), (self.radius, 0)
-        ):
-            ground = self.engine.trace(
-                self.position + offset, direction=(0, -1),
-                max_steps=20, min_distance=.02, max_distance=1., shape_filter=self.shape_filter
-            )
-            #if ground:
-            #    print((self.position - ground.position).length)
-            if ground and (self.position - ground.position).length <= self.radius * 1.2:
-                return True
-        return False
+        origins = np.array(((0, 0), (-self.radius, 0), (self.radius, 0))) + tuple(self.position)
+        hits = self.engine.queries.ray_query(
+            origins, directions=(0, -1), max_distance=1., shape_filter=self.shape_filter,
+        )
+        distances = np.linalg.norm(hits["position"] - tuple(self.position), axis=-1)
+        return bool(np.any(hits["hit"] & (distances <= self.radius * 1.2)))
 
     def jump(self, dt):
         body = self.bodies[0]
@@ -123,37 +128,27 @@ class Player(AgentBase):
             self.engine.add_body(body)
 
     def shoot(self, dir):
-        bullet = self.add_body(Ngon(
-            self.position, radius=.1, segments=3,
+        bullet = self.engine.body_pool.acquire(
+            self, Ngon,
+            position=self.position, radius=.1, segments=3,
+            velocity=dir * 100, angular_velocity=100.,
             density=1200,
             default_shape_filter=self.shape_filter,
-        ))
-        bullet.angular_velocity = 100.
-        bullet.velocity = dir * 100
-
-    def on_collision(self, a, b, arbiter: pymunk.Arbiter):
-        body = b if a in self.bodies else a
-        body_type = body.get_user_data("type")
-
-        #if body_type == "stone":
-        if arbiter.total_impulse.y > 20.:
-            mass = body.mass
-            if mass:
+        )
+        if self.bullet_lifetime is not None:
+            self._bullets.append((self.engine.time, bullet))
+
+    def on_collision_events(self, events):
+        arrays = events.arrays
+        # the upwards impulse of a single contact, like the arbiter's total_impulse
+        impulses = arrays["peak_impulse"]
+        hard = events.get_body_mask(self.bodies) & (impulses[:, 1] > 20.)
+        for row in np.flatnonzero(hard).tolist():
+            a, b = events.bodies[arrays["body_a"][row]], events.bodies[arrays["body_b"][row]]
+            body = b if a in self.bodies else a
+            if body.mass:
                 self.engine.add_particles(
                     self.position + (0, self.radius*.7),
-                    num=max(10, int(arbiter.total_impulse.length / 4.)),
+                    num=max(10, int(np.linalg.norm(impulses[row]) / 4.)),
                     shape_filter=self.shape_filter
                 )
-
-            print(f"COLLISION {a} <-> {b}")
-            dump_object(arbiter)
-            #print("mass", body.mass)
-
-        #if body_type == "sand":
-        #    self.engine.remove_body(body)
-
-        return True
-        for key in dir(arbiter):
-            if not key.startswith("_"):
-                print(f"{key:20} = {getattr(arbiter, key)}")
-        return True
\ No newline at end of file
@@ -0,0 +1,96 @@
+from typing import Dict
+
+import numpy as np
+import pymunk
+from pymunk import Vec2d
+
+
+class BodyTransforms:
+    """
+    Once-per-frame pass over all awake dynamic bodies.
+
+    Gathers the interpolated positions and angles into numpy arrays and
+    transforms the local points of all bodies with the same number of points
+    with one batched rotation. Sleeping and static bodies are not part of
+    the pass, they use the per-body fallback in Body.get_render_transform().
+    If culling is enabled in the Renderer, only visible bodies are considered.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.positions = np.zeros((0, 2))
+        self.angles = np.zeros((0, ))
+        self._rows: Dict["Body", int] = dict()
+        self._points: Dict["Body", np.ndarray] = dict()
+
+    def __len__(self):
+        return len(self._rows)
+
+    def clear(self):
+        self.positions = np.zeros((0, 2))
+        self.angles = np.zeros((0, ))
+        self._rows = dict()
+        self._points = dict()
+
+    def get_transform(self, body):
+        """Returns (position, angle) of the body in the current frame or None"""
+        row = self._rows.get(body)
+        if row is not None:
+            position = self.positions[row]
+            return Vec2d(float(position[0]), float(position[1])), float(self.angles[row])
+
+    def get_points(self, body):
+        """Returns the world points as array of shape (N, 2) or None"""
+        return self._points.get(body)
+
+    def update(self):
+        renderer = self.engine.renderer
+        if renderer is not None and renderer.view_bb is not None:
+            # only the bodies that survived culling
+            candidates = [b._body for b in renderer.visible_bodies if b is not None and b._body is not None]
+        else:
+            candidates = self.engine.space.bodies
+        pymunk_bodies = [
+            b for b in candidates
+            if b.body_type == pymunk.Body.DYNAMIC and not b.is_sleeping and hasattr(b, "_parent_body")
+        ]
+        bodies = [b._parent_body for b in pymunk_bodies]
+        num_bodies = len(bodies)
+
+        transforms = np.array(
+            [self._get_transforms(b) for b in pymunk_bodies], dtype=np.float64
+        ).reshape(num_bodies, 6)
+        t = self.engine.interpolation_alpha
+        self.positions = transforms[:, 0:2] + (transforms[:, 3:5] - transforms[:, 0:2]) * t
+        self.angles = transforms[:, 2] + (transforms[:, 5] - transforms[:, 2]) * t
+        self._rows = {body: row for row, body in enumerate(bodies)}
+        self._points = dict()
+
+        groups = dict()
+        for row, body in enumerate(bodies):
+            groups.setdefault(len(body.get_local_points()), []).append(row)
+
+        cos = np.cos(self.angles)
+        sin = np.sin(self.angles)
+        for num_points, rows in groups.items():
+            if not num_points:
+                continue
+            local_points = np.stack([bodies[row].get_local_points() for row in rows])
+            rows = np.array(rows)
+            c = cos[rows, None]
+            s = sin[rows, None]
+            x = local_points[..., 0]
+            y = local_points[..., 1]
+            points = np.empty_like(local_points)
+            points[..., 0] = self.positions[rows, 0, None] + x * c - y * s
+            points[..., 1] = self.positions[rows, 1, None] + x * s + y * c
+            for i, row in enumerate(rows):
+                self._points[bodies[row]] = points[i]
+
+    def _get_transforms(self, pymunk_body):
+        """Returns previous and current (x, y, angle)"""
+        position, angle = pymunk_body.position, pymunk_body.angle
+        previous = self.engine.get_previous_transform(pymunk_body)
+        if previous:
+            return previous[0].x, previous[0].y, previous[1], position.x, position.y, angle
+        return position.x, position.y, angle, position.x, position.y, angle
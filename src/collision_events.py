@@ -0,0 +1,123 @@
+from typing import Dict, Tuple
+
+import numpy as np
+from pymunk import Arbiter, Vec2d
+
+
+# One row per touching pair of listening bodies and frame.
+# body_a and body_b are indices into CollisionEvents.bodies,
+# impulse is the impulse applied to body_a summed over all substeps of the frame,
+# kinetic_energy the summed energy lost in the collision,
+# point the first contact point of the first substep
+# and peak_impulse the impulse of the single substep with the largest y component,
+# which does not depend on the number of substeps.
+COLLISION_EVENT_DTYPE = np.dtype([
+    ("body_a", np.int32),
+    ("body_b", np.int32),
+    ("impulse", np.float64, (2, )),
+    ("kinetic_energy", np.float64),
+    ("point", np.float64, (2, )),
+    ("peak_impulse", np.float64, (2, )),
+])
+
+
+class CollisionEvents:
+    """
+    Per-frame buffer of the collisions of listening bodies.
+
+    The contact tracker records into a preallocated numpy buffer during the space steps,
+    after all substeps of Engine.update() the buffer is passed once to the
+    on_collision_events() hook of every listening container that has a body
+    in the events, directly or in a nested container (see Body.iter_listening_containers()).
+    The arrays and bodies are only valid during that call.
+
+    :param capacity: int, initial number of rows, the buffer doubles when full
+    """
+
+    def __init__(self, capacity=256):
+        self.buffer = np.zeros(capacity, dtype=COLLISION_EVENT_DTYPE)
+        self.num_events = 0
+        self.bodies = []
+        self._body_indices = dict()
+        self._rows: Dict[Tuple[int, int], int] = dict()
+        self._containers = []
+
+    def __len__(self):
+        return self.num_events
+
+    @property
+    def capacity(self):
+        return self.buffer.shape[0]
+
+    @property
+    def arrays(self):
+        """The structured array of this frame's events, shape (num_events, )"""
+        return self.buffer[:self.num_events]
+
+    def clear(self):
+        self.num_events = 0
+        self.bodies = []
+        self._body_indices = dict()
+        self._rows = dict()
+        self._containers = []
+
+    def iter_events(self):
+        """Yields (body_a, body_b, impulse, kinetic_energy, point) for each event"""
+        for row in self.arrays.tolist():
+            yield (
+                self.bodies[row[0]], self.bodies[row[1]],
+                Vec2d(row[2]), row[3], Vec2d(row[4]),
+            )
+
+    def get_body_mask(self, bodies):
+        """Returns a bool array, True for each event involving one of `bodies`"""
+        indices = [self._body_indices[b] for b in bodies if b in self._body_indices]
+        arrays = self.arrays
+        return np.isin(arrays["body_a"], indices) | np.isin(arrays["body_b"], indices)
+
+    def record(self, key, body_a, body_b, arbiter: Arbiter):
+        """Called from the post_solve callback of each substep"""
+        row = self._rows.get(key)
+        impulse = arbiter.total_impulse
+        if row is not None:
+            event = self.buffer[row]
+            if self.bodies[event["body_a"]] is not body_a:
+                impulse = -impulse
+            event["impulse"] += impulse
+            event["kinetic_energy"] += arbiter.total_ke
+            if impulse.y > event["peak_impulse"][1]:
+                event["peak_impulse"] = impulse
+            return
+
+        if self.num_events >= self.capacity:
+            self.buffer = np.concatenate([self.buffer, np.zeros_like(self.buffer)])
+        row = self._rows[key] = self.num_events
+        self.num_events += 1
+
+        points = arbiter.contact_point_set.points
+        self.buffer[row] = (
+            self._get_body_index(body_a),
+            self._get_body_index(body_b),
+            impulse,
+            arbiter.total_ke,
+            points[0].point_a if points else (0., 0.),
+            impulse,
+        )
+
+    def dispatch(self):
+        """Pass the events to the containers and clear the buffer"""
+        if self.num_events:
+            for container in self._containers:
+                container.on_collision_events(self)
+        self.clear()
+
+    def _get_body_index(self, body):
+        index = self._body_indices.get(body)
+        if index is None:
+            index = len(self.bodies)
+            self.bodies.append(body)
+            self._body_indices[body] = index
+            for container in body.iter_listening_containers():
+                if container not in self._containers:
+                    self._containers.append(container)
+        return index
@@ -0,0 +1,187 @@
+import weakref
+from typing import Dict, Tuple
+
+from pymunk import Arbiter
+
+
+class Contact:
+    """State of one touching pair of bodies"""
+
+    __slots__ = ("ref_a", "ref_b", "num_arbiters", "begin_frame")
+
+    def __init__(self, body_a, body_b):
+        self.ref_a = weakref.ref(body_a)
+        self.ref_b = weakref.ref(body_b)
+        # number of touching shape pairs between the two bodies
+        self.num_arbiters = 0
+        # frame of the dispatched begin, None until the first post_solve
+        self.begin_frame = None
+
+    @property
+    def bodies(self):
+        return self.ref_a(), self.ref_b()
+
+
+class ContactTracker:
+    """
+    Tracks touching pairs of bodies between the pymunk begin and separate callbacks.
+
+    Only pairs of listening bodies are seen, see Body.has_collision_listener().
+    The container hooks are called on all listening parent containers of both bodies,
+    see Body.iter_listening_containers().
+    Per pair, on_collision() and on_contact_begin() are dispatched once on the first post_solve
+    of the contact, on_contact_persist() at most once per Engine.update() while the pair touches
+    and is awake, and on_contact_end() when the last shapes of the pair separate.
+    Each post_solve is also recorded into the Engine's CollisionEvents.
+    Removing a body from the space separates all its contacts, so the number of entries
+    is bounded by the number of currently touching pairs.
+
+    All hooks except on_contact_persist() are called during a space step
+    and must not add or remove bodies.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.frame = 0
+        self._contacts: Dict[Tuple[int, int], Contact] = dict()
+        # keys of the pairs touched in this frame, a dict for an id-independent order
+        self._persisting: Dict[Tuple[int, int], None] = dict()
+        self._stats = {
+            "begun": 0,
+            "ended": 0,
+        }
+
+    def __len__(self):
+        return len(self._contacts)
+
+    def stats(self):
+        return {
+            **self._stats,
+            "num_contacts": len(self._contacts),
+        }
+
+    def clear(self):
+        self._contacts.clear()
+        self._persisting.clear()
+
+    def get_contact(self, body_a, body_b):
+        """Returns the Contact between the two bodies or None"""
+        return self._get(self.make_key(body_a, body_b), body_a, body_b)
+
+    def iter_contacts(self, body=None):
+        """Yields (body_a, body_b) of all touching pairs, optionally only those with `body`"""
+        for contact in list(self._contacts.values()):
+            a, b = contact.bodies
+            if a is None or b is None:
+                continue
+            if body is None or body is a or body is b:
+                yield a, b
+
+    def prune(self):
+        """Drop entries whose bodies have been garbage collected"""
+        for key, contact in list(self._contacts.items()):
+            if contact.ref_a() is None or contact.ref_b() is None:
+                del self._contacts[key]
+                self._persisting.pop(key, None)
+
+    @staticmethod
+    def make_key(body_a, body_b):
+        a, b = id(body_a), id(body_b)
+        return (a, b) if a < b else (b, a)
+
+    def begin(self, arbiter: Arbiter, space, data):
+        body_a, body_b = self._get_bodies(arbiter)
+        key = self.make_key(body_a, body_b)
+        contact = self._get(key, body_a, body_b)
+        if contact is None:
+            contact = self._contacts[key] = Contact(body_a, body_b)
+        contact.num_arbiters += 1
+        return True
+
+    def post_solve(self, arbiter: Arbiter, space, data):
+        body_a, body_b = self._get_bodies(arbiter)
+        key = self.make_key(body_a, body_b)
+        contact = self._get(key, body_a, body_b)
+        if contact is None:
+            # handler installed while the shapes were touching
+            contact = self._contacts[key] = Contact(body_a, body_b)
+            contact.num_arbiters += 1
+
+        self.engine.collision_events.record(key, body_a, body_b, arbiter)
+        if contact.begin_frame is None:
+            contact.begin_frame = self.frame
+            self._stats["begun"] += 1
+            self._dispatch_begin(body_a, body_b, arbiter)
+        elif contact.begin_frame != self.frame:
+            self._persisting[key] = None
+
+    def separate(self, arbiter: Arbiter, space, data):
+        body_a, body_b = self._get_bodies(arbiter)
+        key = self.make_key(body_a, body_b)
+        contact = self._get(key, body_a, body_b)
+        if contact is None:
+            return
+        contact.num_arbiters -= 1
+        if contact.num_arbiters > 0:
+            return
+
+        del self._contacts[key]
+        self._persisting.pop(key, None)
+        if contact.begin_frame is not None:
+            self._stats["ended"] += 1
+            self._dispatch_end(body_a, body_b)
+
+    def dispatch_persist(self):
+        """Called once after the space steps of Engine.update()"""
+        persisting, self._persisting = self._persisting, dict()
+        for key in persisting:
+            contact = self._contacts.get(key)
+            if contact is None:
+                continue
+            a, b = contact.bodies
+            if a is None or b is None:
+                continue
+            a.on_contact_persist(b)
+            b.on_contact_persist(a)
+            for c in self._get_containers(a, b):
+                c.on_contact_persist(a, b)
+        self.frame += 1
+
+    def _get(self, key, body_a, body_b):
+        contact = self._contacts.get(key)
+        if contact is not None:
+            a, b = contact.bodies
+            if not ((a is body_a and b is body_b) or (a is body_b and b is body_a)):
+                # stale entry of a collected body whose id got reused
+                del self._contacts[key]
+                self._persisting.pop(key, None)
+                return None
+        return contact
+
+    @staticmethod
+    def _get_bodies(arbiter: Arbiter):
+        shapes = arbiter.shapes
+        return shapes[0]._parent_body, shapes[1]._parent_body
+
+    @staticmethod
+    def _get_containers(body_a, body_b):
+        containers = list(body_a.iter_listening_containers())
+        for c in body_b.iter_listening_containers():
+            if c not in containers:
+                containers.append(c)
+        return containers
+
+    def _dispatch_begin(self, body_a, body_b, arbiter):
+        body_a.on_collision(body_b, arbiter)
+        body_b.on_collision(body_a, arbiter)
+        body_a.on_contact_begin(body_b, arbiter)
+        body_b.on_contact_begin(body_a, arbiter)
+        for c in self._get_containers(body_a, body_b):
+            c.on_collision(body_a, body_b, arbiter)
+            c.on_contact_begin(body_a, body_b, arbiter)
+
+    def _dispatch_end(self, body_a, body_b):
+        body_a.on_contact_end(body_b)
+        body_b.on_contact_end(body_a)
+        for c in self._get_containers(body_a, body_b):
+            c.on_contact_end(body_a, body_b)
@@ -1,21 +1,29 @@
-from typing import List
-import math
 import random
+import weakref
+from typing import List
 
 import pymunk
-from pymunk import Vec2d, Arbiter
+from pymunk import Vec2d
 
 from .images import Images
 from .renderer import Renderer
+from .body_transforms import BodyTransforms
 from .objects.body import Body
 from .objects.constraints import Constraint
 from .objects.graphical import Graphical
 from .objects.physical import PhysicsInterface
 from .objects.container import ObjectContainer
+from .objects.pool import BodyPool
 from .agents.base import AgentBase
 from .agents.player import Player
 from .agents.particles import Particles
 from .log import LogMixin
+from .util.timer import PhaseTimings
+from .substeps import SubstepPolicy, FixedSubsteps
+from .spatial_queries import SpatialQueries
+from .contacts import ContactTracker
+from .collision_events import CollisionEvents
+from .snapshot import Snapshot, create_snapshot, restore_snapshot
 
 
 class Engine(LogMixin):
@@ -43,20 +51,56 @@ class Engine(LogMixin):
                 )
             )
 
-    def __init__(self):
+    def __init__(self, headless=False, substep_policy: SubstepPolicy = None, seed=None, image_disk_cache=False):
+        """
+        :param headless: bool, if True, no Images and Renderer are created
+            and objects will never create their graphics
+        :param substep_policy: SubstepPolicy instance, defaults to 10 fixed substeps
+        :param seed: int, seed of `rng` and of the particles, None for a random seed
+        :param image_disk_cache: ImageDiskCache, True for the default cache path
+            or False to not cache generated images on disk, see Images
+        """
         self.space = pymunk.Space()
+        self._space_finalizer = self._create_space_finalizer()
         self.space.gravity = Vec2d(0., -10.)
+        # bodies at rest for this many seconds fall asleep and cost nothing
+        self.space.sleep_time_threshold = .5
         self.time = 0.
-        self.images = Images()
-        self.renderer = Renderer(self)
+        self.headless = headless
+        self.images = None if headless else Images(disk_cache=image_disk_cache)
+        self.renderer = None if headless else Renderer(self)
+        self.body_transforms = None if headless else BodyTransforms(self)
+        self.body_pool = BodyPool(self)
+        self.queries = SpatialQueries(self)
+        # number of space steps, used to invalidate cached queries
+        self.step_count = 0
+        # number of update() calls, the simulation step used by input recordings
+        self.num_updates = 0
+        # random generator for gameplay and map code, use instead of the random module
+        self.rng = random.Random(seed)
+        self.phase_timings = PhaseTimings(enabled=False)
+        self.substep_policy = substep_policy or FixedSubsteps(10)
+        self.num_substeps = 0
+        self.substep_dt = 0.
+        # fixed-step accumulator used by advance()
+        self.fixed_step_dt = 1. / 60.
+        self.max_steps_per_frame = 5
+        self.num_dropped_steps = 0
+        self.interpolation_alpha = 1.
+        self._time_accumulator = 0.
+        self._previous_transforms = dict()
         self.container = ObjectContainer()
         self.container._engine = self
         self._empty_shape_filter = pymunk.ShapeFilter()
+        # default mode of trace(), "sdf" or "segment", which changes the meaning
+        # of TraceHit.distance and position, see _trace_sdf() and _trace_segment()
+        self.trace_mode = "sdf"
         self._window_size = Vec2d((320, 200))
         self.player = None
-        self._ignore_collisions = set()
+        self.collision_events = CollisionEvents()
+        self.contacts = ContactTracker(self)
         self._install_collision_handler()
-        self.particles = self.add_container(Particles())
+        self.particles = self.add_container(Particles(seed=seed))
 
     @property
     def window_size(self):
@@ -67,22 +111,85 @@ class Engine(LogMixin):
         self._window_size = Vec2d(v)
 
     def update(self, dt, fixed_dt=None):
-        pymunk_steps = 10
-        pymunk_dt = (fixed_dt or dt) / pymunk_steps
-        for i in range(pymunk_steps):
-            self.space.step(pymunk_dt)
-            self.container.update(pymunk_dt)
-
+        frame_dt = fixed_dt or dt
+        policy = self.substep_policy
+        with self.phase_timings.measure("substep_policy"):
+            num_substeps = max(1, policy.num_substeps(self, frame_dt))
+        self.num_substeps = num_substeps
+        self.substep_dt = frame_dt / num_substeps
+
+        container_dt = 0.
+        for i in range(num_substeps):
+            with self.phase_timings.measure("space_step"):
+                self.space.step(self.substep_dt)
+                self.step_count += 1
+            container_dt += self.substep_dt
+            if policy.is_container_update(i, num_substeps):
+                with self.phase_timings.measure("container_update"):
+                    self.container.update(container_dt)
+                container_dt = 0.
+
+        self.contacts.dispatch_persist()
+        self.collision_events.dispatch()
         self.time += dt
+        self.num_updates += 1
+
+    def advance(self, dt):
+        """
+        Accumulate the real frame time and run update() in steps of fixed_step_dt.
+
+        At most max_steps_per_frame steps are run, the remaining time is dropped
+        to avoid the spiral of death on slow machines.
+        Sets interpolation_alpha for rendering between the last two physics states.
+
+        :param dt: float, real time since last call
+        :return: int, number of fixed steps
+        """
+        self._time_accumulator += dt
+        num_steps = int(self._time_accumulator / self.fixed_step_dt)
+        if num_steps > self.max_steps_per_frame:
+            self.num_dropped_steps += num_steps - self.max_steps_per_frame
+            self._time_accumulator -= (num_steps - self.max_steps_per_frame) * self.fixed_step_dt
+            num_steps = self.max_steps_per_frame
+
+        for i in range(num_steps):
+            if i == num_steps - 1:
+                self._store_previous_transforms()
+            self.update(self.fixed_step_dt)
+            self._time_accumulator -= self.fixed_step_dt
+
+        self.interpolation_alpha = max(0., min(1., self._time_accumulator / self.fixed_step_dt))
+        return num_steps
+
+    def get_previous_transform(self, pymunk_body: pymunk.Body):
+        """
+        Returns (position, angle) of the pymunk body before the last fixed step
+        of advance(), or None
+        """
+        return self._previous_transforms.get(pymunk_body)
+
+    def _store_previous_transforms(self):
+        self._previous_transforms = {
+            b: (b.position, b.angle)
+            for b in self.space.bodies
+            if b.body_type == pymunk.Body.DYNAMIC and not b.is_sleeping
+        }
 
     def render(self, dt: float):
+        if self.headless:
+            raise RuntimeError("Can not render a headless Engine")
         if self.player:
             center_pos = self.player.position + (0, 0)
             player_distance_pos = self.player.position + (0, 10)
             speed = .5 + .3 * (player_distance_pos - self.renderer.translation).get_length()
             self.renderer.translation += (center_pos - self.renderer.translation) * speed * dt
             #self.renderer.scale += (1. + 5.*speed - self.renderer.scale) * speed * dt
-        self.container.update_graphics(dt)
+        with self.phase_timings.measure("culling"):
+            self.renderer.update_culling()
+        with self.phase_timings.measure("body_transforms"):
+            self.body_transforms.update()
+        with self.phase_timings.measure("update_graphics"):
+            self.container.update_graphics(dt)
         self.renderer.render()
 
     def add_body(self, body: Body):
@@ -104,9 +211,15 @@ class Engine(LogMixin):
         self.container.remove_container(container)
 
     def point_query_nearest_body(self, position, max_distance=0, shape_filter=None):
-        hit = self.space.point_query_nearest(
-            position, max_distance, shape_filter or self._empty_shape_filter
+        """Returns the Body nearest to position within max_distance or None, results are cached until the next step"""
+        shape_filter = shape_filter or self._empty_shape_filter
+        return self.queries.cached(
+            ("nearest_body", self.queries.quantize(position), max_distance, shape_filter),
+            lambda: self._point_query_nearest_body(position, max_distance, shape_filter)
         )
+
+    def _point_query_nearest_body(self, position, max_distance, shape_filter):
+        hit = self.space.point_query_nearest(position, max_distance, shape_filter)
         # print("Hit", position, hit)
         if not hit or not hit.shape:
             return None
@@ -114,9 +227,15 @@ class Engine(LogMixin):
         return hit.shape._parent_body
 
     def point_query_body(self, position, max_distance=0, shape_filter=None):
-        hit = self.space.point_query(
-            position, max_distance, shape_filter or self._empty_shape_filter
+        """Returns a Body within max_distance of position or None, results are cached until the next step"""
+        shape_filter = shape_filter or self._empty_shape_filter
+        return self.queries.cached(
+            ("body", self.queries.quantize(position), max_distance, shape_filter),
+            lambda: self._point_query_body(position, max_distance, shape_filter)
         )
+
+    def _point_query_body(self, position, max_distance, shape_filter):
+        hit = self.space.point_query(position, max_distance, shape_filter)
         # print("Hit", position, hit)
         if not hit:
             return None
@@ -126,16 +245,83 @@ class Engine(LogMixin):
 
         return hit.shape._parent_body
 
-    def trace(self, position, direction, max_steps=1000, min_distance=0.001, max_distance=1e6, shape_filter=None):
+    def trace(
+            self, position, direction, max_steps=1000, min_distance=0.001, max_distance=1e6,
+            shape_filter=None, mode=None,
+    ):
         """
-        Raymarching through the pymunk physics space
+        Find the first surface along a ray through the pymunk physics space
         :param position: tuple, start of ray in world coordinates
         :param direction: tuple, direction as normalized vector
-        :param max_steps: int, number of maximum steps to reach a surface
-        :param min_distance: float, distance to surface to consider as hit
+        :param max_steps: int, number of maximum steps to reach a surface, only for mode "sdf"
+        :param min_distance: float, distance to surface to consider as hit, only for mode "sdf"
         :param max_distance: float, maximum distance to scan for objects
         :param shape_filter: pymunk.Shapefilter instance or None
-        :return: Engine.TraceHit instance or None
+        :param mode: str, "segment" for a single segment query or "sdf" for raymarching
+            along point queries, defaults to Engine.trace_mode
+        :return: Engine.TraceHit instance or None, results are cached until the next step
+        """
+        shape_filter = shape_filter or self._empty_shape_filter
+        mode = mode or self.trace_mode
+        quantize = self.queries.quantize
+        return self.queries.cached(
+            (
+                "trace", quantize(position), quantize(direction),
+                max_steps, min_distance, max_distance, shape_filter, mode,
+            ),
+            lambda: self._trace(position, direction, max_steps, min_distance, max_distance, shape_filter, mode)
+        )
+
+    def _trace(self, position, direction, max_steps, min_distance, max_distance, shape_filter, mode):
+        if mode == "segment":
+            return self._trace_segment(position, direction, max_distance, shape_filter)
+        elif mode == "sdf":
+            return self._trace_sdf(position, direction, max_steps, min_distance, max_distance, shape_filter)
+        raise ValueError(f"Unknown trace mode '{mode}', expected 'segment' or 'sdf'")
+
+    def trace_all(self, position, direction, max_distance=1e6, shape_filter=None):
+        """
+        Find all surfaces along a ray
+        :return: list of Engine.TraceHit, sorted by distance
+        """
+        shape_filter = shape_filter or self._empty_shape_filter
+        position = Vec2d(position)
+        end = position + Vec2d(direction) * max_distance
+        hits = [
+            self._segment_trace_hit(position, hit, max_distance)
+            for hit in self.space.segment_query(position, end, 0, shape_filter)
+            if hit.shape
+        ]
+        hits.sort(key=lambda hit: hit.distance)
+        return hits
+
+    def _trace_segment(self, position, direction, max_distance, shape_filter):
+        """
+        Single segment query.
+        TraceHit.distance is the distance from the start of the ray
+        and TraceHit.gradient is the surface normal
+        """
+        shape_filter = shape_filter or self._empty_shape_filter
+        position = Vec2d(position)
+        end = position + Vec2d(direction) * max_distance
+        hit = self.space.segment_query_first(position, end, 0, shape_filter)
+        if not hit or not hit.shape:
+            return None
+        return self._segment_trace_hit(position, hit, max_distance)
+
+    def _segment_trace_hit(self, position, hit: pymunk.SegmentQueryInfo, max_distance):
+        return self.TraceHit(
+            body=hit.shape._parent_body,
+            position=hit.point,
+            distance=hit.alpha * max_distance,
+            gradient=hit.normal,
+            num_steps=1,
+        )
+
+    def _trace_sdf(self, position, direction, max_steps, min_distance, max_distance, shape_filter):
+        """
+        Raymarching along the signed distance of point queries.
+        TraceHit.distance is the remaining distance of position to the surface
         """
         shape_filter = shape_filter or self._empty_shape_filter
         position = Vec2d(position)
@@ -159,40 +345,84 @@ class Engine(LogMixin):
     def dump(self, file=None):
         self.container.dump_tree(file=file)
 
+    def snapshot(self, filename=None) -> Snapshot:
+        """
+        Returns a Snapshot of the whole container tree and the kinematic state of all bodies.
+        Parked bodies of the body_pool are not included.
+        :param filename: str or Path, optional file to save the snapshot to
+        """
+        snapshot = create_snapshot(self)
+        if filename is not None:
+            snapshot.save(filename)
+        return snapshot
+
+    def restore(self, snapshot):
+        """
+        Replace all objects with the objects of the snapshot.
+        The physics are created immediately, the graphics on the next render().
+        Bodies and constraints are recreated in the order of the physics space, so
+        the state_checksum() of the restored world matches, and sleeping bodies fall asleep again.
+        Contacts and the solver's warm starting start anew, so the restored world continues
+        close to, but not bit-identical with, the original.
+        Most of the time is spent creating the pymunk bodies and shapes.
+
+        Snapshot files contain no pickled data, only classes derived from Parameterized
+        or listed in snapshot.VALUE_CLASSES are instantiated, without calling their constructors.
+        A crafted file can still set arbitrary attribute values on these objects,
+        so only restore snapshots from trusted sources.
+        Invalid snapshots raise ValueError before the current world is touched.
+
+        :param snapshot: Snapshot instance or filename of a saved snapshot
+        """
+        if not isinstance(snapshot, Snapshot):
+            snapshot = Snapshot.load(snapshot)
+        restore_snapshot(self, snapshot)
+
+    def _reset_world(self):
+        """Delete the graphics of all objects and continue with an empty space"""
+        if not self.headless:
+            for obj in self.container.iter_objects_recursive():
+                if isinstance(obj, Graphical):
+                    obj.destroy_graphics()
+            self.body_transforms.clear()
+        self.body_pool.clear()
+        # the restored bodies are unknown to the old pool
+        self.body_pool = BodyPool(self)
+
+        space = pymunk.Space()
+        space.gravity = self.space.gravity
+        space.sleep_time_threshold = self.space.sleep_time_threshold
+        space.iterations = self.space.iterations
+        space.damping = self.space.damping
+        self._space_finalizer.detach()
+        self.space = space
+        self._space_finalizer = self._create_space_finalizer()
+        self._install_collision_handler()
+        self.contacts.clear()
+        self.collision_events.clear()
+        self.queries.clear()
+        self._previous_transforms = dict()
+
+    def _create_space_finalizer(self):
+        """
+        Empty the space when the engine is garbage collected.
+        The engine, it's objects and the pymunk objects form reference cycles, whose members
+        are freed in arbitrary order, and chipmunk touches all contained bodies when the space
+        is freed, which crashes if the bodies are freed first.
+        """
+        finalizer = weakref.finalize(self, _empty_space, self.space)
+        finalizer.atexit = False
+        return finalizer
+
     def _install_collision_handler(self):
-        handler = self.space.add_collision_handler(0, 0)
-        handler.begin = self._collision_begin
-        handler.post_solve = self._collision_post_solve
-
-    def _collision_begin(self, arbiter: Arbiter, space, data):
-        shapes = arbiter.shapes
-        body_a = shapes[0]._parent_body
-        body_b = shapes[1]._parent_body
-        key = (body_a, body_b)
-        if key in self._ignore_collisions:
-            self._ignore_collisions.remove(key)
-        return True
-
-    def _collision_post_solve(self, arbiter: Arbiter, space, data):
-        shapes = arbiter.shapes
-        body_a = shapes[0]._parent_body
-        body_b = shapes[1]._parent_body
-        # print(f"COLLISION {body_a} <-> {body_b}", arbiter.total_impulse, arbiter.total_ke)
-
-        key = (body_a, body_b)
-        if key in self._ignore_collisions:
-            return True
-
-        self._ignore_collisions.add(key)
-
-        accept = True
-        accept = accept and body_a.on_collision(body_b, arbiter)
-        accept = accept and body_b.on_collision(body_a, arbiter)
-        containers = {body_a._parent_container, body_b._parent_container}
-        for c in containers:
-            accept = accept and c.on_collision(body_a, body_b, arbiter)
-
-        return accept
+        """
+        Only collisions involving a shape of a body with collision listener are passed to python
+        """
+        for other_type in (Body.DEFAULT_COLLISION_TYPE, Body.LISTENER_COLLISION_TYPE):
+            handler = self.space.add_collision_handler(Body.LISTENER_COLLISION_TYPE, other_type)
+            handler.begin = self.contacts.begin
+            handler.post_solve = self.contacts.post_solve
+            handler.separate = self.contacts.separate
 
     def add_particles(
             self,
@@ -208,14 +438,20 @@ class Engine(LogMixin):
             max_lifetime=4,
             shape_filter=None,
     ):
-        for i in range(num):
-            angle = math.radians(random.uniform(min_angle, max_angle))
-            velocity = Vec2d(math.sin(angle), math.cos(angle))
-            velocity *= random.uniform(min_velocity, max_velocity)
-            self.particles.add_particle(
-                position=position,
-                velocity=velocity,
-                radius=random.uniform(min_radius, max_radius),
-                lifetime=random.uniform(min_lifetime, max_lifetime),
-                shape_filter=shape_filter,
-            )
\ No newline at end of file
+        self.particles.add_particles(
+            position=position,
+            num=num,
+            min_angle=min_angle,
+            max_angle=max_angle,
+            min_velocity=min_velocity,
+            max_velocity=max_velocity,
+            min_radius=min_radius,
+            max_radius=max_radius,
+            min_lifetime=min_lifetime,
+            max_lifetime=max_lifetime,
+            shape_filter=shape_filter,
+        )
+
+
+def _empty_space(space: pymunk.Space):
+    space.remove(*space.constraints, *space.shapes, *space.bodies)
@@ -0,0 +1,94 @@
+import time
+
+from .engine import Engine
+from .maps import map_gen, bd_map
+from .agents.player import Player
+
+
+class HeadlessRunner:
+    """
+    Runs an Engine without window and graphics at maximum speed
+    with a fixed time step, e.g. for soak tests and benchmarks.
+    """
+
+    MAPS = {
+        "bd": bd_map.initialize_map,
+        "gen": map_gen.initialize_map,
+        "gen2": map_gen.initialize_map_2,
+        "gen-large": lambda engine: map_gen.initialize_map(engine, (-200, -20), (200, 20)),
+    }
+
+    def __init__(self, map_name="bd", fixed_dt=1. / 60., with_player=True, substep_policy=None, seed=None):
+        if map_name not in self.MAPS:
+            raise ValueError(f"Unknown map '{map_name}', choose one of {', '.join(self.MAPS)}")
+
+        self.map_name = map_name
+        self.fixed_dt = fixed_dt
+        self.engine = Engine(headless=True, substep_policy=substep_policy, seed=seed)
+        self.engine.phase_timings.enabled = True
+
+        if with_player:
+            self.engine.player = Player((0, 1))
+            self.engine.add_container(self.engine.player)
+
+        self.MAPS[map_name](self.engine)
+
+        self.num_steps = 0
+        self.wall_time = 0.
+
+    @property
+    def simulated_time(self):
+        return self.num_steps * self.fixed_dt
+
+    def step(self):
+        with self.engine.phase_timings.measure("engine_update"):
+            self.engine.update(self.fixed_dt)
+        self.num_steps += 1
+
+    def run(self, num_steps=None, seconds=None, callback=None):
+        """
+        Step the engine as fast as possible
+        :param num_steps: int, number of fixed steps to run
+        :param seconds: float, simulated seconds to run, used if num_steps is None
+        :param callback: callable(runner), called after each step
+        """
+        if num_steps is None:
+            num_steps = int(round((seconds or 10.) / self.fixed_dt))
+
+        start_time = time.perf_counter()
+        for i in range(num_steps):
+            self.step()
+            if callback:
+                callback(self)
+        self.wall_time += time.perf_counter() - start_time
+
+    def stats(self):
+        wall_time = self.wall_time or 1e-9
+        return {
+            "map": self.map_name,
+            "steps": self.num_steps,
+            "fixed_dt": self.fixed_dt,
+            "substep_policy": self.engine.substep_policy,
+            "simulated_seconds": self.simulated_time,
+            "wall_seconds": self.wall_time,
+            "simulated_per_wall_second": self.simulated_time / wall_time,
+            "steps_per_second": self.num_steps / wall_time,
+            "bodies": len(self.engine.space.bodies),
+            "sleeping_bodies": sum(1 for b in self.engine.space.bodies if b.is_sleeping),
+            "constraints": len(self.engine.space.constraints),
+        }
+
+    def print_report(self, file=None, stats=None):
+        """
+        :param file: optional file object, default is stdout
+        :param stats: optional dict to print instead of stats(), e.g. extended by a caller
+        """
+        if stats is None:
+            stats = self.stats()
+        max_len = max(len(key) for key in stats)
+        for key, value in stats.items():
+            if isinstance(value, float):
+                value = round(value, 4)
+            print(f"{key:{max_len}}: {value}", file=file)
+        print("phases:", file=file)
+        self.engine.phase_timings.print(file=file)
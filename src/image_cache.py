@@ -0,0 +1,93 @@
+import hashlib
+import os
+
+
+def default_cache_path():
+    base_path = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base_path, "cthulhu2d", "images")
+
+
+class ImageDiskCache:
+    """
+    Content-addressed disk cache for raw RGBA image bytes.
+
+    Files are named by the hash of the key (e.g. a normalized ImageGeneratorSettings uri
+    along with the ImageGenerator.VERSION). The modification time of a file is its
+    last access time, the least recently used files are deleted when the
+    total size exceeds max_bytes.
+    """
+
+    FILE_EXTENSION = ".rgba"
+
+    def __init__(self, path=None, max_bytes=64 * 1024 * 1024):
+        self.path = path or default_cache_path()
+        self.max_bytes = max_bytes
+        self._total_bytes = None
+        os.makedirs(self.path, exist_ok=True)
+
+    def filename(self, key):
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.path, f"{digest}{self.FILE_EXTENSION}")
+
+    def get(self, key, size):
+        """
+        Returns the RGBA bytes of an image of `size` or None if not in cache
+        """
+        filename = self.filename(key)
+        expected_bytes = size[0] * size[1] * 4
+        try:
+            with open(filename, "rb") as fp:
+                data = fp.read()
+            if len(data) != expected_bytes:
+                return None
+            os.utime(filename)
+        except OSError:
+            return None
+        return data
+
+    def put(self, key, data: bytes):
+        filename = self.filename(key)
+        temp_filename = f"{filename}.{os.getpid()}.tmp"
+        try:
+            previous_bytes = os.path.getsize(filename)
+        except OSError:
+            previous_bytes = 0
+        with open(temp_filename, "wb") as fp:
+            fp.write(data)
+        os.replace(temp_filename, filename)
+
+        if self._total_bytes is not None:
+            self._total_bytes += len(data) - previous_bytes
+        self.evict()
+
+    def clear(self):
+        for filename, size, mtime in self._iter_files():
+            os.remove(filename)
+        self._total_bytes = 0
+
+    def total_bytes(self):
+        if self._total_bytes is None:
+            self._total_bytes = sum(size for filename, size, mtime in self._iter_files())
+        return self._total_bytes
+
+    def evict(self):
+        """Delete least recently used files until the cache fits into max_bytes"""
+        if self.total_bytes() <= self.max_bytes:
+            return
+        files = sorted(self._iter_files(), key=lambda f: f[2])
+        total_bytes = sum(f[1] for f in files)
+        for filename, size, mtime in files:
+            if total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(filename)
+            except OSError:
+                pass
+            total_bytes -= size
+        self._total_bytes = total_bytes
+
+    def _iter_files(self):
+        for entry in os.scandir(self.path):
+            if entry.is_file() and entry.name.endswith(self.FILE_EXTENSION):
+                stat = entry.stat()
+                yield entry.path, stat.st_size, stat.st_mtime_ns
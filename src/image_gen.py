@@ -10,17 +10,37 @@ from .parameterized import Parameterized
 class ImageGeneratorSettings(Parameterized):
 
     TUPLE_KEYS = ("size", "color")
+    INT_KEYS = ("segments", "seed")
+    FLOAT_KEYS = ("gradient", "noise", "noise_scale")
 
     def __init__(
             self,
             shape="rect",
             size=(32, 32),
             color=(1, 1, 1, 1),
+            segments=6,
+            gradient=0.,
+            noise=0.,
+            noise_scale=4.,
+            seed=0,
     ):
+        """
+        :param shape: str, one of "rect", "circle", "ngon"
+        :param segments: int, number of corners for shape "ngon"
+        :param gradient: float, amount of darkening from top to bottom
+        :param noise: float, amount of value noise added to the color
+        :param noise_scale: float, number of noise cells per image width
+        :param seed: int, seed of the noise
+        """
         super().__init__()
         self.shape = shape
         self.size = size
         self.color = color
+        self.segments = segments
+        self.gradient = gradient
+        self.noise = noise
+        self.noise_scale = noise_scale
+        self.seed = seed
 
     def to_dict(self):
         return {
@@ -28,6 +48,11 @@ class ImageGeneratorSettings(Parameterized):
             "shape": self.shape,
             "size": self.size,
             "color": self.color,
+            "segments": self.segments,
+            "gradient": self.gradient,
+            "noise": self.noise,
+            "noise_scale": self.noise_scale,
+            "seed": self.seed,
         }
 
     def to_uri(self):
@@ -55,6 +80,10 @@ class ImageGeneratorSettings(Parameterized):
                     value = tuple(int(v) for v in value)
                 else:
                     value = tuple(float(v) for v in value)
+            elif key in cls.INT_KEYS:
+                value = int(value)
+            elif key in cls.FLOAT_KEYS:
+                value = float(value)
 
             setattr(settings, key, value)
         return settings
@@ -68,6 +97,9 @@ class ImageGenerator:
 
     """
 
+    # part of the disk cache keys, increase when the output of create_rgba_image() changes
+    VERSION = 2
+
     def __init__(self):
         pass
 
@@ -76,36 +108,51 @@ class ImageGenerator:
         return self.create_from_settings(settings)
 
     def create_from_settings(self, settings: ImageGeneratorSettings):
+        return self.create_rgba_image(settings).to_pyglet()
+
+    def create_rgba_image(self, settings: ImageGeneratorSettings):
         image = RGBAImage(settings.size)
         image.fill(settings.color)
 
+        if settings.gradient:
+            image.add_color_mask(image.gradient_mask(start=(.5, 1.), end=(.5, 0.)) * -settings.gradient)
+
+        if settings.noise:
+            image.add_color_mask(
+                (image.noise_mask(scale=settings.noise_scale, seed=settings.seed) - .5) * settings.noise
+            )
+
         if settings.shape == "rect":
             image.add_mask(image.rect_bevel_mask())
 
         elif settings.shape == "circle":
             image.fill_alpha(image.circle_mask())
 
-        return image.to_pyglet()
+        elif settings.shape == "ngon":
+            image.fill_alpha(image.ngon_mask(segments=settings.segments))
+
+        return image
 
 
 class RGBAImage:
 
     def __init__(self, size):
         self.size = size
-        self.pixels = np.zeros((size[1], size[0], 4), dtype=np.float)
+        self.pixels = np.zeros((size[1], size[0], 4), dtype=np.float64)
         self.fill_alpha(1)
 
-    def to_pyglet(self):
+    def to_bytes(self):
         byte_array = self.pixels * 255
         byte_array = np.clip(byte_array, 0, 255)
         byte_array = np.array(byte_array, dtype=np.uint8)
-        data = byte_array.flatten()
-        data = bytes(data)
+        return byte_array.tobytes()
+
+    def to_pyglet(self):
         return pyglet.image.ImageData(
             width=self.size[0],
             height=self.size[1],
             format="RGBA",
-            data=data,
+            data=self.to_bytes(),
         )
 
     def fill(self, vec):
@@ -117,34 +164,80 @@ class RGBAImage:
     def add_mask(self, mask):
         self.pixels += mask
 
+    def add_color_mask(self, mask):
+        """Add the mask to the rgb channels only"""
+        self.pixels[:, :, :3] += mask
+
+    def coordinates(self):
+        """
+        Returns the normalized x and y coordinates of each pixel
+        as two arrays of shape (height, width, 1), ranging from 0 to 1
+        """
+        xs = np.arange(self.size[0], dtype=np.float64) / max(1, self.size[0] - 1)
+        ys = np.arange(self.size[1], dtype=np.float64) / max(1, self.size[1] - 1)
+        x, y = np.meshgrid(xs, ys)
+        return x[:, :, np.newaxis], y[:, :, np.newaxis]
+
     def circle_mask(self, center=None, radius=None):
         if radius is None:
             radius = .5
         if center is None:
             center = (.5, .5)
 
-        max_size = max(*self.size)
-        mask = np.ndarray((self.size[1], self.size[0], 1), dtype=np.float)
-        for y in range(mask.shape[0]):
-            yf = y / (mask.shape[0] - 1)
-            for x in range(mask.shape[1]):
-                xf = x / (mask.shape[1] - 1)
-                dist = np.sqrt((xf - center[0])**2 + (yf - center[1])**2)
-                step = max(0, min(1, (radius - dist) * max_size + 1))
-                mask[y][x][0] = step
-
-        return mask
+        x, y = self.coordinates()
+        dist = np.sqrt((x - center[0]) ** 2 + (y - center[1]) ** 2)
+        return self._smooth_step(radius - dist)
 
     def rect_bevel_mask(self, padding=.2, amount=.1):
-        mask = np.ndarray((self.size[1], self.size[0], 1), dtype=np.float)
-        for y in range(mask.shape[0]):
-            yf = y / (mask.shape[0] - 1)
-            for x in range(mask.shape[1]):
-                xf = x / (mask.shape[1] - 1)
-                value = max(0., padding - xf) + \
-                    max(0., padding - yf) + \
-                    min(0., 1. - padding - xf) + \
-                    min(0., 1. - padding - yf)
-                mask[y][x][0] = value / padding * amount
-        return mask
+        x, y = self.coordinates()
+        value = np.maximum(0., padding - x) + \
+            np.maximum(0., padding - y) + \
+            np.minimum(0., 1. - padding - x) + \
+            np.minimum(0., 1. - padding - y)
+        return value / padding * amount
+
+    def ngon_mask(self, segments=6, center=None, radius=None, angle=0.):
+        """Regular polygon with a corner at the top, `angle` rotates counter-clockwise in radians"""
+        if radius is None:
+            radius = .5
+        if center is None:
+            center = (.5, .5)
+
+        x, y = self.coordinates()
+        x, y = x - center[0], y - center[1]
+        dist = np.sqrt(x ** 2 + y ** 2)
+        segment_angle = np.pi * 2. / segments
+        a = np.mod(np.arctan2(x, y) + angle, segment_angle) - segment_angle / 2.
+        edge_dist = radius * np.cos(segment_angle / 2.) / np.cos(a)
+        return self._smooth_step(edge_dist - dist)
+
+    def gradient_mask(self, start=(0., 0.), end=(0., 1.)):
+        """Linear gradient from 0 at `start` to 1 at `end`"""
+        x, y = self.coordinates()
+        direction = np.array(end, dtype=np.float64) - start
+        length_sqr = max(1e-12, float(np.dot(direction, direction)))
+        t = ((x - start[0]) * direction[0] + (y - start[1]) * direction[1]) / length_sqr
+        return np.clip(t, 0., 1.)
+
+    def radial_gradient_mask(self, center=None, radius=None):
+        """Gradient from 1 at `center` to 0 at `radius`"""
+        if radius is None:
+            radius = .5
+        if center is None:
+            center = (.5, .5)
 
+        x, y = self.coordinates()
+        dist = np.sqrt((x - center[0]) ** 2 + (y - center[1]) ** 2)
+        return np.clip(1. - dist / radius, 0., 1.)
+
+    def noise_mask(self, scale=4., seed=0):
+        """Value noise in range [0, 1] with `scale` cells per image width"""
+        from .maps.rand import RandomXY
+        xs = np.arange(self.size[0], dtype=np.float64) / max(1, self.size[0]) * scale
+        ys = np.arange(self.size[1], dtype=np.float64) / max(1, self.size[0]) * scale
+        return RandomXY(seed).noise_grid(xs, ys)[:, :, np.newaxis]
+
+    def _smooth_step(self, distance):
+        """One pixel wide anti-aliased step of a normalized signed distance"""
+        max_size = max(*self.size)
+        return np.clip(distance * max_size + 1, 0., 1.)
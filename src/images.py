@@ -2,28 +2,110 @@ import os
 
 import pyglet
 
-from .image_gen import ImageGenerator
+from .image_gen import ImageGenerator, ImageGeneratorSettings
+from .image_cache import ImageDiskCache
 
 
 class Images:
+    """
+    Loads and caches images by name.
 
-    def __init__(self, base_path=None):
+    Names starting with `gen/` are generated by the ImageGenerator and are also
+    cached on disk, keyed by the normalized uri and the generator version, if `disk_cache` is set.
+
+    All images up to `atlas_max_image_size` are packed into shared atlas textures,
+    so sprites of different images can be drawn with one texture bind.
+
+    :param base_path: str, path of the png files
+    :param disk_cache: ImageDiskCache, True for the default cache path or False to disable,
+        disabled by default so only the game window writes to the user's cache directory
+    :param atlas_size: int, width and height of the atlas textures, 0 to disable packing
+    :param atlas_max_image_size: int, larger images get their own texture
+    """
+
+    def __init__(self, base_path=None, disk_cache=False, atlas_size=1024, atlas_max_image_size=256):
         if base_path is None:
             base_path = os.path.abspath(os.path.dirname(__file__))
         self.base_path = base_path
         self._centered_images = {}
         self.generator = ImageGenerator()
+        if disk_cache is True:
+            disk_cache = ImageDiskCache()
+        self.disk_cache = disk_cache or None
+        self.atlas_size = atlas_size
+        self.atlas_max_image_size = min(atlas_max_image_size, atlas_size - 2)
+        self._texture_bin = None
+        self._atlas_texture_ids = set()
+        self._stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+        }
+
+    def stats(self):
+        """
+        Returns dict with number of memory and disk cache hits and
+        the number of misses, which either generated or loaded an image
+        """
+        return {
+            **self._stats,
+            "images": len(self._centered_images),
+            "atlas_textures": len(self._atlas_texture_ids),
+            "disk_bytes": self.disk_cache.total_bytes() if self.disk_cache else 0,
+        }
 
     def centered_image(self, name):
-        if name not in self._centered_images:
-            image = self._load_image(name)
+        if name in self._centered_images:
+            self._stats["memory_hits"] += 1
+        else:
+            image = self._pack_image(self._load_image(name))
             image.anchor_x = image.width // 2
             image.anchor_y = image.height // 2
             self._centered_images[name] = image
         return self._centered_images[name]
 
+    def _pack_image(self, image):
+        """Returns the image as region of an atlas texture, if it fits"""
+        if not self.atlas_size or max(image.width, image.height) > self.atlas_max_image_size:
+            return image
+
+        # pyglet.image creates the shadow window on import, keep headless engines display-free
+        from pyglet.image.atlas import TextureBin, AllocatorException
+        if self._texture_bin is None:
+            self._texture_bin = TextureBin(self.atlas_size, self.atlas_size)
+        try:
+            # one pixel border to avoid bleeding of neighbours with subpixel sprites
+            region = self._texture_bin.add(image, border=1)
+        except AllocatorException:
+            return image
+
+        self._atlas_texture_ids.add(region.owner.id)
+        return region
+
     def _load_image(self, name):
         if name.startswith("/gen/") or name.startswith("gen/"):
-            return self.generator.create_from_uri(name)
+            return self._load_generated_image(name)
+        self._stats["misses"] += 1
         return pyglet.image.load(os.path.join(f"{name}.png"))
 
+    def _load_generated_image(self, name):
+        settings = ImageGeneratorSettings.from_uri(name)
+        if not self.disk_cache:
+            self._stats["misses"] += 1
+            return self.generator.create_from_settings(settings)
+
+        key = f"v{self.generator.VERSION}:{settings.to_uri()}"
+        data = self.disk_cache.get(key, settings.size)
+        if data is not None:
+            self._stats["disk_hits"] += 1
+        else:
+            self._stats["misses"] += 1
+            data = self.generator.create_rgba_image(settings).to_bytes()
+            self.disk_cache.put(key, data)
+
+        return pyglet.image.ImageData(
+            width=settings.size[0],
+            height=settings.size[1],
+            format="RGBA",
+            data=data,
+        )
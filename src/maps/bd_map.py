@@ -17,6 +17,7 @@ from ..agents.tentacle import Tentacle
 from ..agents.lemming import Lemming
 from ..objects.graphical import GraphicSettings
 from ..objects.container import ObjectContainer
+from ..objects.chunks import ChunkedWorld
 from ..image_gen import ImageGeneratorSettings
 from .rand import RandomXY
 
@@ -93,7 +94,7 @@ def initialize_map(engine: Engine, map_str=None):
     map_rows = [l.strip() for l in map_str.splitlines() if l.strip()]
     map_rows = [list(row[::2]) for row in map_rows]
     
-    container = engine.add_container(ObjectContainer())
+    container = engine.add_container(ChunkedWorld())
     
     for y, row in enumerate(map_rows):
         y = len(map_rows) - 1 - y
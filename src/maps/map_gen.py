@@ -3,7 +3,6 @@ Some testbed for map creation
 """
 
 import math
-import random
 
 import numpy as np
 
@@ -16,6 +15,7 @@ from ..objects.constraints import FixedJoint, SpringJoint
 from ..agents.tentacle import Tentacle
 from ..objects.graphical import GraphicSettings
 from ..objects.container import ObjectContainer
+from ..objects.chunks import ChunkedWorld
 from ..image_gen import ImageGeneratorSettings
 from .rand import RandomXY
 
@@ -68,8 +68,9 @@ MAPS = [
 ]
 
 
-def initialize_map(engine: Engine):
-    random_surroundings(engine, (-30, -20), (30, 20))
+def initialize_map(engine: Engine, top_left=(-30, -20), bottom_right=(30, 20)):
+    world = engine.add_container(ChunkedWorld())
+    random_surroundings(world, top_left, bottom_right)
     engine.player.start_position = (0, 10)
 
     engine.add_body(
@@ -164,8 +165,8 @@ def add_from_map(engine: Engine, MAP=None, pos=None, density=None):
     if pos is None:
         pos = Vec2d((0, 20))
 
-    MAP = MAP or random.choice(MAPS)
-    density = random.uniform(.5, 25) if density is None else density
+    MAP = MAP or engine.rng.choice(MAPS)
+    density = engine.rng.uniform(.5, 25) if density is None else density
 
     boxes = {}
 
@@ -173,14 +174,14 @@ def add_from_map(engine: Engine, MAP=None, pos=None, density=None):
     def _connect(a, b, anchor_a, anchor_b):
         engine.add_constraint(FixedJoint(a, b, anchor_a, anchor_b, breaking_impulse=500))
 
-    extent = random.uniform(.1, 0.6)
+    extent = engine.rng.uniform(.1, 0.6)
     extent_smaller = 1.
-    if random.randrange(5) == 0:
-        extent_smaller = 1. - random.uniform(0., random.uniform(0., 1.))
+    if engine.rng.randrange(5) == 0:
+        extent_smaller = 1. - engine.rng.uniform(0., engine.rng.uniform(0., 1.))
     for y, row in enumerate(MAP):
         for x, v in enumerate(row):
             if v:
-                local_density = random.uniform(0.1, density)
+                local_density = engine.rng.uniform(0.1, density)
                 graphic_settings = GraphicSettings(
                     draw_lines=True, draw_sprite=True,
                     image_name=ImageGeneratorSettings(
@@ -224,32 +225,31 @@ def density_color(density):
 def random_surroundings(container, top_left, bottom_right, noise_range=(0, .5), scale=(1, 1), noise_scale=(.2, .2)):
     extent = Vec2d(scale) * .49
     rnd = RandomXY(1)
-    for y in range(top_left[1], bottom_right[1]):
-        for x in range(top_left[0], bottom_right[0]):
-            n = rnd.fractal_noise(x * noise_scale[0], y * noise_scale[1])
-            x = x * scale[0]
-            y = y * scale[1]
-            if noise_range[0] <= n <= noise_range[1]:
-                density = 0
-                if rnd.random(x, y, 23) < .4:
-                    density = 10
-
-                color = np.array((n, n, n), dtype=np.float)
-                color = np.power(color, (1.2, 1.21, 1.22))
-                if density:
-                    color = np.power(color, (1, 1.5, 1))
-                color = (color - noise_range[0]) / (noise_range[1] - noise_range[0])
-                color = .8 - .6 * color
-                color = np.round(color * 10) / 10
-                sprite_settings = GraphicSettings(
-                    draw_lines=True,
-                    draw_sprite=True,
-                    image_name=ImageGeneratorSettings(
-                        shape="rect",
-                        color=color,
-                    )
-                )
-                body = Box((x, y), extent, density=density, graphic_settings=sprite_settings)
-
-                container.add_body(body)
+    xs = np.arange(top_left[0], bottom_right[0])
+    ys = np.arange(top_left[1], bottom_right[1])
+    noise = rnd.fractal_noise_grid(xs * noise_scale[0], ys * noise_scale[1])
+    densities = np.where(rnd.random_grid(xs * scale[0], ys * scale[1], 23) < .4, 10, 0)
+
+    colors = np.repeat(noise[:, :, np.newaxis], 3, axis=-1)
+    colors = np.power(colors, (1.2, 1.21, 1.22))
+    colors = np.where(densities[:, :, np.newaxis] > 0, np.power(colors, (1, 1.5, 1)), colors)
+    colors = (colors - noise_range[0]) / (noise_range[1] - noise_range[0])
+    colors = .8 - .6 * colors
+    colors = np.round(colors * 10) / 10
+
+    inside = (noise_range[0] <= noise) & (noise <= noise_range[1])
+    for iy, ix in zip(*np.nonzero(inside)):
+        sprite_settings = GraphicSettings(
+            draw_lines=True,
+            draw_sprite=True,
+            image_name=ImageGeneratorSettings(
+                shape="rect",
+                color=colors[iy, ix],
+            )
+        )
+        body = Box(
+            (float(xs[ix] * scale[0]), float(ys[iy] * scale[1])), extent,
+            density=int(densities[iy, ix]), graphic_settings=sprite_settings
+        )
 
+        container.add_body(body)
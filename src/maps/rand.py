@@ -1,5 +1,7 @@
 import random
 
+import numpy as np
+
 
 class RandomXY:
 
@@ -49,6 +51,78 @@ class RandomXY:
 
         return noise_value / amount_sum
 
+    def random_grid(self, xs, ys, seed=None):
+        """
+        Vectorized version of random() using an integer hash instead of random.Random.
+        Values are uniform in [0, 1) but differ from the values of random().
+
+        :param xs: 1-d sequence of x coordinates, converted to int
+        :param ys: 1-d sequence of y coordinates, converted to int
+        :return: numpy array of shape (len(ys), len(xs))
+        """
+        ix = np.floor(np.asarray(xs, dtype=np.float64)).astype(np.int64)
+        iy = np.floor(np.asarray(ys, dtype=np.float64)).astype(np.int64)
+        return self._hash_uniform(ix[np.newaxis, :], iy[:, np.newaxis], seed)
+
+    def noise_grid(self, xs, ys, seed=None):
+        """
+        Vectorized version of noise() for the lattice of all xs and ys
+        :return: numpy array of shape (len(ys), len(xs))
+        """
+        x = np.asarray(xs, dtype=np.float64)[np.newaxis, :]
+        y = np.asarray(ys, dtype=np.float64)[:, np.newaxis]
+        return self._noise_xy(x, y, seed)
+
+    def fractal_noise_grid(
+            self, xs, ys, num_layers=5, amount_factor=.5, scale_factor=4, offset=(1000, 1000), seed=None
+    ):
+        """
+        Vectorized version of fractal_noise() for the lattice of all xs and ys
+        :return: numpy array of shape (len(ys), len(xs))
+        """
+        x = np.asarray(xs, dtype=np.float64)[np.newaxis, :]
+        y = np.asarray(ys, dtype=np.float64)[:, np.newaxis]
+        amount_sum = 0.
+        amount = 1.
+        noise_value = np.zeros((y.shape[0], x.shape[1]))
+        for i in range(num_layers):
+            noise_value += amount * self._noise_xy(x, y, seed=seed)
+            amount_sum += amount
+            x = x * scale_factor + offset[0]
+            y = y * scale_factor + offset[1]
+            amount *= amount_factor
+
+        return noise_value / amount_sum
+
+    def _noise_xy(self, x, y, seed=None):
+        fx, fy = np.floor(x), np.floor(y)
+        ix, iy = fx.astype(np.int64), fy.astype(np.int64)
+        fx, fy = x - fx, y - fy
+        n0 = self._hash_uniform(ix, iy, seed)
+        n1 = self._hash_uniform(ix + 1, iy, seed)
+        n2 = self._hash_uniform(ix, iy + 1, seed)
+        n3 = self._hash_uniform(ix + 1, iy + 1, seed)
+
+        ny1 = n0 * (1 - fx) + n1 * fx
+        ny2 = n2 * (1 - fx) + n3 * fx
+        return ny1 * (1 - fy) + ny2 * fy
+
+    def _hash_uniform(self, ix, iy, seed=None):
+        """
+        Hash int64 arrays ix, iy (broadcastable) to floats in [0, 1)
+        with the splitmix64 finalizer
+        """
+        seed = self._combine_seed(0, 0, seed) & 0xffffffffffffffff
+        h = np.uint64(seed) \
+            ^ (ix.astype(np.uint64) * np.uint64(self._primes[1] * 0x9e3779b1)) \
+            ^ (iy.astype(np.uint64) * np.uint64(self._primes[2] * 0x85ebca77))
+        h = h ^ (h >> np.uint64(30))
+        h = h * np.uint64(0xbf58476d1ce4e5b9)
+        h = h ^ (h >> np.uint64(27))
+        h = h * np.uint64(0x94d049bb133111eb)
+        h = h ^ (h >> np.uint64(31))
+        return (h >> np.uint64(11)).astype(np.float64) * (1. / (1 << 53))
+
     def generator(self, x, y, seed=None):
         rnd = random.Random(self._combine_seed(x, y, seed))
         for i in range(self._pre_iter_depth):
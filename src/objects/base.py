@@ -5,6 +5,12 @@ from ..parameterized import Parameterized
 class EngineObject(Parameterized):
 
     engine_object_classes = dict()
+    # attributes that are not stored in snapshots (or pickled), mapped to the value
+    # or the factory of the value they get when restored.
+    # Entries of base classes are merged, see get_transient_attributes()
+    TRANSIENT_ATTRIBUTES = {
+        "_engine": None,
+    }
 
     def __init_subclass__(cls, **kwargs):
         class_name = cls.__name__
@@ -29,6 +35,17 @@ class EngineObject(Parameterized):
         self._id = f"{meta_info['id']}-{meta_info['counter']}"
         meta_info["counter"] += 1
 
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for name in get_transient_attributes(type(self)):
+            state.pop(name, None)
+        return state
+
+    def __setstate__(self, state):
+        for name, default in get_transient_attributes(type(self)).items():
+            state[name] = default() if callable(default) else default
+        self.__dict__.update(state)
+
     def to_dict(self):
         params = {
             **super().to_dict(),
@@ -101,6 +118,35 @@ class EngineObject(Parameterized):
         pass
 
 
+_transient_attributes_cache = dict()
+
+
+def get_transient_attributes(cls):
+    """Returns the merged TRANSIENT_ATTRIBUTES of the class and all base classes"""
+    attributes = _transient_attributes_cache.get(cls)
+    if attributes is None:
+        attributes = dict()
+        for base in reversed(cls.__mro__):
+            attributes.update(base.__dict__.get("TRANSIENT_ATTRIBUTES", {}))
+        _transient_attributes_cache[cls] = attributes
+    return attributes
+
+
+_overrides_cache = dict()
+
+
+def overrides_any(cls, base, names):
+    """True if `cls` overrides any of the methods `names` of `base`, cached per class"""
+    key = (cls, base, names)
+    result = _overrides_cache.get(key)
+    if result is None:
+        result = _overrides_cache[key] = any(
+            getattr(cls, name) is not getattr(base, name)
+            for name in names
+        )
+    return result
+
+
 def get_class_short_name(name):
 
     def _get_short_name(num_chars):
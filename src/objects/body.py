@@ -1,19 +1,34 @@
 from typing import List
 
+import numpy as np
 import pymunk
 from pymunk import Vec2d
 
+from .base import overrides_any
 from .graphical import Graphical
 from .physical import PhysicsInterface
 
 
 class Body(PhysicsInterface, Graphical):
 
+    # collision_type of shapes without collision listener, collisions between them stay in chipmunk
+    DEFAULT_COLLISION_TYPE = 0
+    # collision_type of shapes whose collisions are passed to on_collision()
+    LISTENER_COLLISION_TYPE = 1
+    # overriding any of these makes the body listen to collisions
+    LISTENER_METHODS = ("on_collision", "on_contact_begin", "on_contact_persist", "on_contact_end")
+    TRANSIENT_ATTRIBUTES = {
+        "_body": None,
+        "_shapes": list,
+        "_local_points": None,
+    }
+
     def __init__(
             self,
             position, angle=0, density=0, velocity=(0, 0), friction=1.,
             default_shape_filter=None,
             pickable=False,
+            collision_listener=False,
             **parameters
     ):
         from .constraints import Constraint
@@ -24,13 +39,14 @@ class Body(PhysicsInterface, Graphical):
         self.start_angle = angle
         self.start_angular_velocity = 0.
         self.pickable = pickable
+        self.collision_listener = collision_listener
         self.density = density
         self._friction = friction
-        self._start_angular_velocity_applied = False
         self._default_shape_filter = default_shape_filter
         self._start_velocity = Vec2d(velocity)
 
         self._body: pymunk.Body = None
+        self._local_points = None
         self._shapes: List[pymunk.Shape] = []
         self._constraints: List[Constraint] = []
 
@@ -41,6 +57,7 @@ class Body(PhysicsInterface, Graphical):
             "start_angle": self.start_angle,
             "start_angular_velocity": self.start_angular_velocity,
             "density": self.density,
+            "collision_listener": self.collision_listener,
             #"default_shape_filter": self._default_shape_filter,
         }
 
@@ -56,6 +73,7 @@ class Body(PhysicsInterface, Graphical):
         if self._body:
             self._body.position = v
         self.start_position = v
+        self._graphics_current = False
 
     @property
     def velocity(self):
@@ -92,6 +110,7 @@ class Body(PhysicsInterface, Graphical):
         if self._body:
             self._body.angle = v
         self.start_angle = v
+        self._graphics_current = False
 
     @property
     def friction(self):
@@ -128,14 +147,69 @@ class Body(PhysicsInterface, Graphical):
                 self.engine.remove_body(self)
 
     def on_collision(self, body, arbiter: pymunk.Arbiter):
+        """
+        Called for collisions with shapes of this body, only if has_collision_listener() is True
+        for this or the other body
+        """
         return True
 
+    def on_contact_begin(self, body, arbiter: pymunk.Arbiter):
+        """Called once when this body starts touching `body`, after on_collision()"""
+        pass
+
+    def on_contact_persist(self, body):
+        """Called at most once per Engine.update() while this body and `body` touch and are awake"""
+        pass
+
+    def on_contact_end(self, body):
+        """Called when this body stops touching `body` or one of them is removed"""
+        pass
+
+    def has_collision_listener(self):
+        """
+        True if collision_listener is set, on_collision() or an on_contact_*() hook is overridden
+        or any parent container has a collision listener
+        """
+        if self.collision_listener or overrides_any(type(self), Body, self.LISTENER_METHODS):
+            return True
+        return next(self.iter_listening_containers(), None) is not None
+
+    def iter_listening_containers(self):
+        """
+        Yields all parent containers with a collision listener, innermost first.
+        These receive the container hooks for collisions of this body, e.g. a map
+        container gets the collisions of the bodies of its agents.
+        """
+        container = self._parent_container
+        while container is not None:
+            if container.has_collision_listener():
+                yield container
+            container = container._parent_container
+
+    def _get_collision_type(self):
+        if self.has_collision_listener():
+            return self.LISTENER_COLLISION_TYPE
+        return self.DEFAULT_COLLISION_TYPE
+
+    def _update_collision_type(self):
+        """
+        Set the collision_type of the existing shapes, it depends on the parent containers,
+        so call when the body is moved to another container without recreating it's physics
+        """
+        collision_type = self._get_collision_type()
+        for shape in self._shapes:
+            if shape.collision_type != collision_type:
+                shape.collision_type = collision_type
+
     def on_constraint_added(self, constraint):
         pass
 
     def on_remove_constraint(self, constraint):
         pass
 
+    def can_create_physics(self):
+        return self._body is None
+
     def destroy_physics(self):
         for shape in self._shapes:
             self.engine.space.remove(shape)
@@ -145,12 +219,17 @@ class Body(PhysicsInterface, Graphical):
             self.engine.space.remove(self._body)
         self._body = None
 
-    def update(self, dt):
-        super().update(dt)
-        if self._body and not self._start_angular_velocity_applied:
+    def is_sleeping(self):
+        """Static bodies and sleeping pymunk bodies are considered sleeping"""
+        if not self._body:
+            return False
+        return self._body.body_type == pymunk.Body.STATIC or self._body.is_sleeping
+
+    def apply_start_velocity(self):
+        """Called by the container after create_physics()"""
+        if self._body:
             self._body.angular_velocity = self.start_angular_velocity
             self._body.velocity = self._start_velocity
-            self._start_angular_velocity_applied = True
 
     def add_shape(self, shape: pymunk.Shape):
         """
@@ -158,6 +237,7 @@ class Body(PhysicsInterface, Graphical):
         To be called within create_physics()
         """
         shape._parent_body = self
+        shape.collision_type = self._get_collision_type()
         shape.density = self.density
         shape.friction = self._friction
         # shape.elasticity = .5
@@ -170,10 +250,29 @@ class Body(PhysicsInterface, Graphical):
             self._body = pymunk.Body(body_type=pymunk.Body.STATIC)
         else:
             self._body = pymunk.Body()
+        self._body._parent_body = self
         self._body.position = self.start_position
         self._body.angle = self.start_angle
         return self._body
 
+    def get_render_transform(self):
+        """
+        Returns (position, angle) interpolated between the last two
+        physics states of Engine.advance()
+        """
+        if self._body and self.engine:
+            if self.engine.body_transforms is not None:
+                transform = self.engine.body_transforms.get_transform(self)
+                if transform:
+                    return transform
+            previous = self.engine.get_previous_transform(self._body)
+            if previous:
+                t = self.engine.interpolation_alpha
+                position = previous[0] + (self._body.position - previous[0]) * t
+                angle = previous[1] + (self._body.angle - previous[1]) * t
+                return position, angle
+        return self.position, self.angle
+
     def iter_points(self):
         raise StopIteration
 
@@ -181,6 +280,39 @@ class Body(PhysicsInterface, Graphical):
         for p in self.iter_points():
             yield self.position + p.rotated(self.angle)
 
+    def iter_render_points(self):
+        position, angle = self.get_render_transform()
+        for p in self.iter_points():
+            yield position + p.rotated(angle)
+
+    def get_local_points(self):
+        """Returns iter_points() as cached array of shape (N, 2)"""
+        if self._local_points is None:
+            self._local_points = np.array(
+                [(p[0], p[1]) for p in self.iter_points()], dtype=np.float64
+            ).reshape(-1, 2)
+        return self._local_points
+
+    def get_render_points(self):
+        if self.engine and self.engine.body_transforms is not None:
+            points = self.engine.body_transforms.get_points(self)
+            if points is not None:
+                return points
+
+        position, angle = self.get_render_transform()
+        local_points = self.get_local_points()
+        c, s = np.cos(angle), np.sin(angle)
+        points = np.empty_like(local_points)
+        points[:, 0] = position[0] + local_points[:, 0] * c - local_points[:, 1] * s
+        points[:, 1] = position[1] + local_points[:, 0] * s + local_points[:, 1] * c
+        return points
+
+    def is_render_static(self):
+        return self.is_sleeping()
+
+    def is_in_view(self, renderer):
+        return renderer.is_body_visible(self)
+
     def dump(self, file=None):
         print(self.__class__.__name__, file=file)
         params = self.to_dict()
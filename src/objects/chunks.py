@@ -0,0 +1,376 @@
+import math
+from typing import List
+
+import numpy as np
+from pymunk import Vec2d
+
+from .base import EngineObject
+from .body import Body
+from .container import ObjectContainer
+from ..snapshot import pack_objects, unpack_objects
+from ..util.ordered_set import OrderedSet
+
+
+class Chunk(ObjectContainer):
+    """
+    A square region of a ChunkedWorld.
+
+    Inactive chunks have no pymunk objects and no graphics. The kinematic state of each
+    body is stored in its start_position, start_angle, velocity and angular_velocity
+    attributes and the pymunk-only state of constraints in Constraint.get_physics_state(),
+    which are used when the physics are created again.
+
+    pack() then replaces the Body and Constraint objects by their compact column state,
+    see snapshot.pack_objects(), so the memory of inactive chunks does not grow with the
+    number of Python objects. activate() creates new objects from it, references to
+    the objects of an inactive chunk are stale afterwards, look them up by id instead.
+    Bodies with a constraint to a body of another chunk, and their constraints, are kept
+    as objects. Such a constraint loses its pymunk constraint when either chunk is
+    deactivated, the body of the other chunk then moves freely.
+    """
+
+    TRANSIENT_ATTRIBUTES = {
+        "_movable_bodies": None,
+    }
+
+    def __init__(self, key, **parameters):
+        super().__init__(**parameters)
+        self.key = key
+        self.active = False
+        self._movable_bodies = None
+        # results of pack_objects() with the bodies first and then the constraints
+        self._packs: List[dict] = []
+
+    def to_dict(self):
+        return {
+            **super().to_dict(),
+            "key": self.key,
+            "active": self.active,
+        }
+
+    @property
+    def physics_enabled(self):
+        return self.active
+
+    @property
+    def graphics_enabled(self):
+        return self.active and super().graphics_enabled
+
+    @property
+    def num_packed_bodies(self):
+        return sum(pack["num_bodies"] for pack in self._packs)
+
+    def iter_packed_ids(self):
+        """Yields the ids of all packed objects"""
+        for pack in self._packs:
+            yield from pack["ids"].tolist()
+
+    def has_pending_removals(self):
+        return bool(self._bodies_to_remove or self._constraints_to_remove or self._containers_to_remove)
+
+    def is_sleeping(self):
+        """Inactive chunks are only updated to process pending removals"""
+        return not self.active and not self.has_pending_removals()
+
+    def update_graphics(self, dt):
+        if self.active:
+            super().update_graphics(dt)
+        else:
+            self._destroy_graphics()
+
+    def render_graphics(self):
+        if self.active:
+            super().render_graphics()
+
+    def invalidate_iteration_cache(self):
+        super().invalidate_iteration_cache()
+        self._movable_bodies = None
+
+    def iter_movable_bodies(self):
+        """Yields all non-static bodies"""
+        if self._movable_bodies is None:
+            self._movable_bodies = [b for b in self.bodies if b.density]
+        return iter(self._movable_bodies)
+
+    def activate(self):
+        """
+        Unpack the packed objects and create physics for all bodies
+        and for all constraints whose bodies both exist
+        """
+        if self.active:
+            return
+        self.active = True
+        self.unpack()
+
+        for body in self.bodies:
+            if body.can_create_physics():
+                body.create_physics()
+                body.apply_start_velocity()
+            if self.graphics_enabled:
+                self._graphics_to_create.append(body)
+
+        for body in self.bodies:
+            for constraint in body._constraints:
+                if constraint.engine and constraint.can_create_physics():
+                    constraint.create_physics()
+
+        if self.graphics_enabled:
+            for constraint in self.constraints:
+                self._graphics_to_create.append(constraint)
+        if self.engine:
+            self.engine.queries.clear()
+
+    def deactivate(self):
+        """
+        Store the state of all bodies, remove them from the physics space and pack them.
+        Returns False if there are objects left that can be packed later, see pack()
+        """
+        if not self.active:
+            return True
+        self.active = False
+
+        self._physics_to_create.clear()
+        self._graphics_to_create.clear()
+        for body in self.bodies:
+            self.freeze_body(body)
+        for constraint in self.constraints:
+            constraint.destroy_graphics()
+        if self.engine:
+            self.engine.queries.clear()
+        return self.pack()
+
+    def pack(self):
+        """
+        Replace the bodies and constraints of the inactive chunk by their packed state.
+
+        Bodies with constraints to bodies outside of the chunk, their constraints,
+        and objects whose attributes can not be encoded are kept.
+        Returns False if packing must wait for pending removals.
+        """
+        if self.active:
+            return True
+        if self.has_pending_removals():
+            return False
+
+        bodies = [
+            body for body in self.bodies
+            if all(
+                c in self.constraints and c.a in self.bodies and c.b in self.bodies
+                for c in body._constraints
+            )
+        ]
+        packed_bodies = set(bodies)
+        constraints = [c for c in self.constraints if c.a in packed_bodies and c.b in packed_bodies]
+        if not bodies and not constraints:
+            return True
+
+        objects = bodies + constraints
+        packed = set(objects)
+        try:
+            pack = pack_objects(objects, lambda obj: isinstance(obj, EngineObject) and obj not in packed)
+        except TypeError as e:
+            self.log(1, "can not pack", self, e)
+            return True
+
+        pack["num_bodies"] = len(bodies)
+        pack["ids"] = np.array([obj.id for obj in objects], dtype=str)
+        self._packs.append(pack)
+        for body in bodies:
+            self.bodies.discard(body)
+        for constraint in constraints:
+            self.constraints.discard(constraint)
+        for obj in objects:
+            obj._parent_container = None
+            obj._engine = None
+        self.invalidate_iteration_cache()
+        return True
+
+    def unpack(self):
+        """Add new objects for all packed objects"""
+        if not self._packs:
+            return
+        for pack in self._packs:
+            objects = unpack_objects(pack)
+            for obj in objects:
+                obj._engine = self.engine
+            for body in objects[:pack["num_bodies"]]:
+                self.bodies.add(body)
+            for constraint in objects[pack["num_bodies"]:]:
+                self.constraints.add(constraint)
+        self._packs = []
+        self.invalidate_iteration_cache()
+
+    @staticmethod
+    def freeze_body(body: Body):
+        """
+        Destroy physics and graphics of the body and the physics of all it's constraints,
+        including those to bodies of other, active chunks, and keep the state of the body
+        """
+        for constraint in body._constraints:
+            if constraint._constraint:
+                constraint.destroy_physics()
+
+        if body._body:
+            position = Vec2d(body._body.position)
+            angle = body._body.angle
+            velocity = Vec2d(body._body.velocity)
+            angular_velocity = body._body.angular_velocity
+            body.destroy_physics()
+            body.position = position
+            body.angle = angle
+            body.velocity = velocity
+            body.angular_velocity = angular_velocity
+
+        body.destroy_graphics()
+
+
+class ChunkedWorld(ObjectContainer):
+    """
+    Distributes added bodies into a grid of Chunk containers.
+
+    Only the chunks around the focus position (the player by default)
+    exist in the physics space, all others are kept inactive.
+    Constraints are added to the chunk of their first body and get their
+    physics as soon as both bodies are active.
+    Added containers (e.g. agents) are held by the world itself and are always active.
+
+    :param chunk_size: float, width and height of one chunk in map units
+    :param active_radius: int, number of chunks around the focus chunk that are active,
+        chunks are deactivated at one chunk further away
+    :param update_interval: int, number of updates between checking the chunks
+    """
+
+    def __init__(self, chunk_size=16., active_radius=2, update_interval=30, **parameters):
+        super().__init__(**parameters)
+        self.chunk_size = chunk_size
+        self.active_radius = active_radius
+        self.update_interval = update_interval
+        self.focus_position = None
+        self.chunks = dict()
+        # ordered, so activation and body moves do not depend on object ids
+        self._active_chunks = OrderedSet()
+        # inactive chunks with objects that are not packed yet
+        self._chunks_to_pack = OrderedSet()
+        self._update_countdown = 0
+
+    def to_dict(self):
+        return {
+            **super().to_dict(),
+            "chunk_size": self.chunk_size,
+            "active_radius": self.active_radius,
+            "update_interval": self.update_interval,
+        }
+
+    def chunk_key(self, position):
+        return (
+            math.floor(position[0] / self.chunk_size),
+            math.floor(position[1] / self.chunk_size),
+        )
+
+    def get_chunk(self, key, create=True):
+        chunk = self.chunks.get(key)
+        if chunk is None and create:
+            chunk = Chunk(key)
+            self.chunks[key] = chunk
+            super().add_container(chunk)
+            if self.focus_distance(key) <= self.active_radius:
+                chunk.activate()
+                self._active_chunks.add(chunk)
+        return chunk
+
+    def focus_distance(self, key, focus_key=None):
+        """Distance of chunk `key` to the focus chunk, in chunks"""
+        focus_x, focus_y = focus_key or self.chunk_key(self.get_focus_position())
+        return max(abs(key[0] - focus_x), abs(key[1] - focus_y))
+
+    def iter_active_chunks(self):
+        return iter(self._active_chunks)
+
+    def get_focus_position(self):
+        if self.focus_position is not None:
+            return Vec2d(self.focus_position)
+        if self.engine and self.engine.player:
+            return self.engine.player.position
+        return Vec2d(0, 0)
+
+    def add_body(self, body):
+        chunk = self.get_chunk(self.chunk_key(body.position))
+        if not chunk.active:
+            self._chunks_to_pack.add(chunk)
+        return chunk.add_body(body)
+
+    def add_constraint(self, constraint):
+        chunk = constraint.a._parent_container
+        if isinstance(chunk, Chunk) and chunk._parent_container is self:
+            if not chunk.active:
+                self._chunks_to_pack.add(chunk)
+            return chunk.add_constraint(constraint)
+        return super().add_constraint(constraint)
+
+    def find_body(self, id):
+        """
+        Returns the body with `id` in an active chunk or None.
+        Bodies of inactive chunks may be packed, see Chunk
+        """
+        for chunk in self._active_chunks:
+            for body in chunk.bodies:
+                if body.id == id:
+                    return body
+        return None
+
+    def update(self, dt):
+        if self._update_countdown <= 0:
+            self.update_chunks()
+            self._update_countdown = self.update_interval
+        self._update_countdown -= 1
+
+        super().update(dt)
+
+    def update_chunks(self):
+        """Move bodies to the chunk they are in and (de-)activate the chunks around the focus"""
+        self._move_bodies_to_chunks()
+
+        focus_key = self.chunk_key(self.get_focus_position())
+        to_activate = []
+        to_deactivate = []
+        for key, chunk in self.chunks.items():
+            distance = self.focus_distance(key, focus_key)
+            if not chunk.active and distance <= self.active_radius:
+                to_activate.append(chunk)
+            elif chunk.active and distance > self.active_radius + 1:
+                to_deactivate.append(chunk)
+
+        for chunk in to_deactivate:
+            self.log(3, "deactivate", chunk)
+            if not chunk.deactivate():
+                self._chunks_to_pack.add(chunk)
+            self._active_chunks.discard(chunk)
+
+        for chunk in to_activate:
+            self.log(3, "activate", chunk)
+            chunk.activate()
+            self._active_chunks.add(chunk)
+
+        for chunk in tuple(self._chunks_to_pack):
+            if chunk.active or chunk.pack():
+                self._chunks_to_pack.discard(chunk)
+
+        if to_activate or to_deactivate:
+            self.request_sleep_check()
+
+    def _move_bodies_to_chunks(self):
+        for chunk in tuple(self._active_chunks):
+            moved_bodies = []
+            for body in chunk.iter_movable_bodies():
+                if body._body and not body._body.is_sleeping:
+                    if self.chunk_key(body._body.position) != chunk.key:
+                        moved_bodies.append(body)
+
+            for body in moved_bodies:
+                target = self.get_chunk(self.chunk_key(body.position))
+                chunk._detach_body(body)
+                target._attach_body(body)
+                if not target.active:
+                    target.freeze_body(body)
+                    self.engine.queries.clear()
+                    self._chunks_to_pack.add(target)
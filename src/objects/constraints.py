@@ -1,3 +1,5 @@
+import math
+
 import pymunk
 from pymunk import Vec2d
 
@@ -7,6 +9,14 @@ from .physical import PhysicsInterface
 
 class Constraint(PhysicsInterface, Graphical):
 
+    # the breaking impulse is only visible in the update of the step that woke the bodies,
+    # containers re-check sleeping objects with a delay, so never skip breakable constraints
+    UPDATE_WHILE_SLEEPING = True
+
+    TRANSIENT_ATTRIBUTES = {
+        "_constraint": None,
+    }
+
     def __init__(self, a, b, breaking_impulse=0, **parameters):
         if "graphic_settings" not in parameters:
             parameters["graphic_settings"] = GraphicSettings(
@@ -18,9 +28,11 @@ class Constraint(PhysicsInterface, Graphical):
 
         self.a = a
         self.b = b
-        self.breaking_impulse = breaking_impulse
+        self._breaking_impulse = breaking_impulse
         # the pymunk constraint
         self._constraint: pymunk.Constraint = None
+        # get_physics_state() of the last destroyed pymunk constraint, applied to the next one
+        self._physics_state = None
 
     def to_dict(self):
         return {
@@ -30,6 +42,17 @@ class Constraint(PhysicsInterface, Graphical):
             "breaking_impulse": self.breaking_impulse,
         }
 
+    @property
+    def breaking_impulse(self):
+        return self._breaking_impulse
+
+    @breaking_impulse.setter
+    def breaking_impulse(self, v):
+        needed_update = self.needs_update()
+        self._breaking_impulse = v
+        if self._parent_container and needed_update != self.needs_update():
+            self._parent_container.invalidate_iteration_cache()
+
     @property
     def impulse(self):
         if not self._constraint:
@@ -44,24 +67,86 @@ class Constraint(PhysicsInterface, Graphical):
             else:
                 self.engine.remove_constraint(self)
 
+    def can_create_physics(self):
+        """Both bodies need to exist in the physics space"""
+        return self._constraint is None and bool(self.a._body) and bool(self.b._body)
+
     def destroy_physics(self):
         if self._constraint:
+            self._physics_state = self.get_physics_state()
             self.engine.space.remove(self._constraint)
         self._constraint = None
 
+    def get_physics_state(self):
+        """
+        Returns the state of the pymunk constraint that is not mirrored in the attributes:
+        (max_force, error_bias, max_bias, distance), distance is NaN for all but pin joints.
+        Without pymunk constraint, the state of the last destroyed one or None
+        """
+        c = self._constraint
+        if c is None:
+            return self._physics_state
+        distance = c.distance if isinstance(c, pymunk.PinJoint) else math.nan
+        return c.max_force, c.error_bias, c.max_bias, distance
+
+    def set_physics_state(self, state):
+        """Set the state of get_physics_state(), it's applied when the pymunk constraint is created"""
+        self._physics_state = None if state is None else tuple(state)
+        if self._constraint is not None:
+            self._apply_physics_state()
+
+    def _add_to_space(self, constraint: pymunk.Constraint):
+        """Add the new pymunk constraint, to be called by create_physics()"""
+        self._constraint = constraint
+        self._apply_physics_state()
+        self.engine.space.add(constraint)
+
+    def _apply_physics_state(self):
+        if self._physics_state is None:
+            return
+        c = self._constraint
+        max_force, error_bias, max_bias, distance = self._physics_state
+        c.max_force = max_force
+        c.error_bias = error_bias
+        c.max_bias = max_bias
+        if not math.isnan(distance) and isinstance(c, pymunk.PinJoint):
+            c.distance = distance
+
     def update(self, dt):
         super().update(dt)
-        true_impulse = self.impulse / dt
+        # impulse is from the last pymunk step which might be shorter than dt
+        true_impulse = self.impulse / (self.engine.substep_dt or dt)
 
         if self.breaking_impulse and true_impulse > self.breaking_impulse:
             #print(f"constraint broken {true_impulse} > {self.breaking_impulse}: {self}")
             self.engine.remove_constraint(self)
 
+    def needs_update(self):
+        """Only breakable constraints need to be updated"""
+        return bool(self._breaking_impulse) or type(self).update is not Constraint.update
+
+    def is_sleeping(self):
+        if not self._constraint:
+            return True
+        return self.a.is_sleeping() and self.b.is_sleeping()
+
     def iter_world_points(self):
         if hasattr(self, "anchor_a") and hasattr(self, "anchor_b"):
             yield self.a.position + self.anchor_a.rotated(self.a.angle)
             yield self.b.position + self.anchor_b.rotated(self.b.angle)
 
+    def is_render_static(self):
+        return bool(self._constraint) and self.is_sleeping()
+
+    def is_in_view(self, renderer):
+        return renderer.is_body_visible(self.a) or renderer.is_body_visible(self.b)
+
+    def iter_render_points(self):
+        if hasattr(self, "anchor_a") and hasattr(self, "anchor_b"):
+            for body, anchor in ((self.a, self.anchor_a), (self.b, self.anchor_b)):
+                position, angle = body.get_render_transform()
+                yield position + anchor.rotated(angle)
+
 
 class FixedJoint(Constraint):
 
@@ -97,9 +182,9 @@ class FixedJoint(Constraint):
             anchor_b=self.anchor_b,
         )
 
-        self._constraint = constraint
-        self.engine.space.add(constraint)
-        self.original_distance = self._constraint.distance
+        self._add_to_space(constraint)
+        if self.original_distance is None:
+            self.original_distance = self._constraint.distance
 
 
 class PivotAnchorJoint(Constraint):
@@ -122,8 +207,7 @@ class PivotAnchorJoint(Constraint):
             self.anchor_a,
             self.anchor_b,
         )
-        self._constraint = constraint
-        self.engine.space.add(constraint)
+        self._add_to_space(constraint)
 
 
 class SpringJoint(Constraint):
@@ -171,8 +255,7 @@ class SpringJoint(Constraint):
             damping=self.damping,
         )
 
-        self._constraint = constraint
-        self.engine.space.add(constraint)
+        self._add_to_space(constraint)
 
 
 class RotarySpringJoint(Constraint):
@@ -214,8 +297,7 @@ class RotarySpringJoint(Constraint):
             damping=self.damping,
         )
 
-        self._constraint = constraint
-        self.engine.space.add(constraint)
+        self._add_to_space(constraint)
 
 
 class RotaryLimitJoint(Constraint):
@@ -263,5 +345,4 @@ class RotaryLimitJoint(Constraint):
             max=self.max,
         )
 
-        self._constraint = constraint
-        self.engine.space.add(constraint)
+        self._add_to_space(constraint)
@@ -1,13 +1,15 @@
-from typing import List
+from collections import deque
+from typing import Deque, List, Optional
 
 import pymunk
 
-from .base import EngineObject
+from .base import EngineObject, overrides_any
 from .physical import PhysicsInterface
 from .graphical import Graphical
 from .body import Body
 from .constraints import Constraint
 from ..log import LogMixin
+from ..util.ordered_set import OrderedSet
 
 
 class ObjectContainer(PhysicsInterface, Graphical, LogMixin):
@@ -17,27 +19,88 @@ class ObjectContainer(PhysicsInterface, Graphical, LogMixin):
     Engine itself holds a base container where everything is managed
     """
 
+    # search the whole tree on removal to validate the parent pointers
+    VALIDATE_REMOVAL = False
+    # number of updates after which awake children are checked for falling asleep
+    SLEEP_CHECK_INTERVAL = 10
+    # overriding any of these makes the contained bodies listen to collisions
+    LISTENER_METHODS = Body.LISTENER_METHODS + ("on_collision_events", )
+    TRANSIENT_ATTRIBUTES = {
+        "_physics_objects": None,
+        "_graphics_objects": None,
+        "_active_physics_objects": None,
+        "_sleeping_physics_objects": None,
+    }
+
     def __init__(self, **parameters):
         Graphical.__init__(self, **parameters)
         PhysicsInterface.__init__(self)
 
-        self.bodies: List[Body] = []
-        self.constraints: List[Constraint] = []
-        self.containers: List[ObjectContainer] = []
-        self._physics_to_create = []
-        self._physics_to_destroy = []
-        self._graphics_to_create = []
-        self._graphics_to_destroy = []
-        self._bodies_to_remove = []
-        self._constraints_to_remove = []
-        self._containers_to_remove = []
-        self._containers_to_create_objects = []
-        self._containers_to_destroy_physics = []
-        self._containers_to_destroy_graphics = []
+        # insertion-ordered sets for O(1) add, remove and membership tests
+        self.bodies: OrderedSet = OrderedSet()
+        self.constraints: OrderedSet = OrderedSet()
+        self.containers: OrderedSet = OrderedSet()
+        self._physics_to_create: Deque = deque()
+        self._physics_to_destroy: Deque = deque()
+        self._graphics_to_create: Deque = deque()
+        self._graphics_to_destroy: Deque = deque()
+        self._bodies_to_remove: Deque[Body] = deque()
+        self._constraints_to_remove: Deque[Constraint] = deque()
+        self._containers_to_remove: Deque[ObjectContainer] = deque()
+        self._containers_to_create_objects: Deque[ObjectContainer] = deque()
+        self._containers_to_destroy_physics: Deque[ObjectContainer] = deque()
+        self._containers_to_destroy_graphics: Deque[ObjectContainer] = deque()
+        # cached lists of children that need updates, None when invalid
+        self._physics_objects: Optional[List[PhysicsInterface]] = None
+        self._graphics_objects: Optional[List[Graphical]] = None
+        # the part of _physics_objects that is not sleeping, and the rest
+        self._active_physics_objects: Optional[List[PhysicsInterface]] = None
+        self._sleeping_physics_objects: Optional[List[PhysicsInterface]] = None
+        self._sleep_check_countdown = 0
+
+    @property
+    def physics_enabled(self):
+        """False if added objects should currently not get physics created"""
+        return True
+
+    @property
+    def graphics_enabled(self):
+        """False when attached to a headless Engine, graphics are never created then"""
+        return not (self.engine and self.engine.headless)
 
     def on_collision(self, a: Body, b: Body, arbiter: pymunk.Arbiter):
+        """
+        Called for collisions of bodies in this or nested containers,
+        only if has_collision_listener() is True
+        """
         return True
 
+    def on_contact_begin(self, a: Body, b: Body, arbiter: pymunk.Arbiter):
+        """Called once when contained bodies start touching, after on_collision()"""
+        pass
+
+    def on_contact_persist(self, a: Body, b: Body):
+        """Called at most once per Engine.update() while contained bodies touch and are awake"""
+        pass
+
+    def on_contact_end(self, a: Body, b: Body):
+        """Called when contained bodies stop touching or one of them is removed"""
+        pass
+
+    def on_collision_events(self, events: "CollisionEvents"):
+        """
+        Called once per Engine.update() with the collisions of the frame
+        if any of them involves a body of this or of a nested container
+        """
+        pass
+
+    def has_collision_listener(self):
+        """
+        True if on_collision(), on_collision_events() or an on_contact_*() hook is overridden,
+        the bodies of the container then listen to collisions
+        """
+        return overrides_any(type(self), ObjectContainer, self.LISTENER_METHODS)
+
     def update(self, dt):
         # self.log(4, "UPDATE", self)
         super().update(dt)
@@ -61,7 +124,7 @@ class ObjectContainer(PhysicsInterface, Graphical, LogMixin):
             self._create_physics()
             self._create_container_objects()
 
-        for obj in self.iter_physics():
+        for obj in self.iter_active_physics():
             obj._base_update_called = False
             obj.update(dt)
             if not obj._base_update_called:
@@ -81,22 +144,39 @@ class ObjectContainer(PhysicsInterface, Graphical, LogMixin):
         self._destroy_graphics()
         self._create_graphics()
 
+        renderer = self.engine.renderer
         for g in self.iter_graphics():
-            g.update_graphics(dt)
+            if g.is_in_view(renderer):
+                if g._culled:
+                    g.set_culled(False)
+                g.update_graphics(dt)
+            elif not g._culled:
+                g.set_culled(True)
 
     def render_graphics(self):
         for g in self.iter_graphics():
-            g.render_graphics()
+            if not g._culled:
+                g.render_graphics()
+
+    def set_culled(self, culled):
+        super().set_culled(culled)
+        if culled:
+            for g in self.iter_graphics():
+                if not g._culled:
+                    g.set_culled(True)
 
     def add_body(self, body):
         self.log(3, "add_body", body)
         assert isinstance(body, Body)
         body._parent_container = self
         body._engine = self.engine
-        self.bodies.append(body)
+        self.bodies.add(body)
+        self.invalidate_iteration_cache()
         # self._add_to_agent(agent, "body", body)
-        self._physics_to_create.append(body)
-        self._graphics_to_create.append(body)
+        if self.physics_enabled:
+            self._physics_to_create.append(body)
+        if self.graphics_enabled:
+            self._graphics_to_create.append(body)
         body.on_engine_attached()
         return body
 
@@ -105,15 +185,20 @@ class ObjectContainer(PhysicsInterface, Graphical, LogMixin):
         assert isinstance(constraint, Constraint)
         constraint._parent_container = self
         constraint._engine = self.engine
-        self.constraints.append(constraint)
+        self.constraints.add(constraint)
+        self.invalidate_iteration_cache()
         # self._add_to_agent(agent, "constraint", constraint)
-        self._physics_to_create.append(constraint)
-        self._graphics_to_create.append(constraint)
+        if self.physics_enabled:
+            self._physics_to_create.append(constraint)
+        if self.graphics_enabled:
+            self._graphics_to_create.append(constraint)
         constraint.on_engine_attached()
         for body in (constraint.a, constraint.b):
             body._constraints.append(constraint)
         for body in (constraint.a, constraint.b):
             body.on_constraint_added(constraint)
+            if body._parent_container:
+                body._parent_container.request_sleep_check()
         return constraint
 
     def add_container(self, container):
@@ -121,55 +206,85 @@ class ObjectContainer(PhysicsInterface, Graphical, LogMixin):
         assert isinstance(container, ObjectContainer)
         container._parent_container = self
         container._engine = self.engine
-        self.containers.append(container)
+        self.containers.add(container)
+        self.invalidate_iteration_cache()
         if hasattr(container, "create_objects"):
             self._containers_to_create_objects.append(container)
         return container
 
+    def _detach_body(self, body):
+        """Remove the body from this container immediately, keeping it's physics and graphics"""
+        self.bodies.discard(body)
+        self.invalidate_iteration_cache()
+        body._parent_container = None
+
+    def _attach_body(self, body):
+        """Add a body with existing physics and graphics, counterpart of _detach_body()"""
+        body._parent_container = self
+        body._engine = self.engine
+        self.bodies.add(body)
+        self.invalidate_iteration_cache()
+        # the collision listeners of the new parents can differ
+        body._update_collision_type()
+
     def remove_body(self, body):
         self.log(3, "remove_body", body)
-        if not self._remove_body_recursive(body):
+        container = self._get_owning_container(body, "bodies")
+        if not container:
             raise ValueError(f"remove_body on {self.short_name()} not successful with {body}")
+        container._bodies_to_remove.append(body)
 
     def remove_constraint(self, constraint):
         self.log(3, "remove_constraint", constraint)
-        if not self._remove_constraint_recursive(constraint):
+        container = self._get_owning_container(constraint, "constraints")
+        if not container:
             raise ValueError(f"remove_constraint on {self.short_name()} not successful with {constraint}\nXX {self.constraints}")
+        container._constraints_to_remove.append(constraint)
 
     def remove_container(self, container):
         self.log(3, "remove_container", container)
-        if not self._remove_container_recursive(container):
+        parent = self._get_owning_container(container, "containers")
+        if not parent:
             raise ValueError(f"remove_container on {self.short_name()} not successful with {container}")
+        parent._containers_to_remove.append(container)
+
+    def _get_owning_container(self, obj, attribute):
+        """
+        Returns the container in this tree that holds `obj` in it's `attribute` set, or None.
+
+        Uses the _parent_container pointer of the object, so the cost
+        only depends on the depth of the tree.
+        If VALIDATE_REMOVAL is True, the result is compared with a recursive search
+        of the whole tree, which is used as fallback if the pointer is wrong.
+        """
+        container = obj._parent_container
+        if container is not None and obj not in getattr(container, attribute):
+            container = None
+
+        parent = container
+        while parent is not None and parent is not self:
+            parent = parent._parent_container
+        if parent is None:
+            container = None
+
+        if self.VALIDATE_REMOVAL:
+            found_container = self._find_owning_container_recursive(obj, attribute)
+            if found_container is not container:
+                self.log(
+                    0, f"parent pointer of {obj} points to {container}, but it's held by {found_container}"
+                )
+                container = found_container
 
-    def _remove_body_recursive(self, body):
-        if body in self.bodies:
-            self._bodies_to_remove.append(body)
-            return True
-        else:
-            for c in self.containers:
-                if c._remove_body_recursive(body):
-                    return True
-        return False
-
-    def _remove_constraint_recursive(self, constraint):
-        if constraint in self.constraints:
-            self._constraints_to_remove.append(constraint)
-            return True
-        else:
-            for c in self.containers:
-                if c._remove_constraint_recursive(constraint):
-                    return True
-        return False
-    
-    def _remove_container_recursive(self, container):
-        if container in self.containers:
-            self._containers_to_remove.append(container)
-            return True
-        else:
-            for c in self.containers:
-                if c._remove_container_recursive(container):
-                    return True
-        return False
+        return container
+
+    def _find_owning_container_recursive(self, obj, attribute):
+        if obj in getattr(self, attribute):
+            return self
+        for c in self.containers:
+            container = c._find_owning_container_recursive(obj, attribute)
+            if container:
+                return container
+        return None
 
     def iter_objects(self):
         """Yields all contained EngineObject instances"""
@@ -180,66 +295,128 @@ class ObjectContainer(PhysicsInterface, Graphical, LogMixin):
         for o in self.containers:
             yield o
 
-    def iter_graphics(self):
+    def iter_objects_recursive(self):
+        """Yields all EngineObject instances of the tree below this container, depth first"""
         for o in self.iter_objects():
-            if isinstance(o, Graphical):
-                yield o
+            yield o
+            if isinstance(o, ObjectContainer):
+                yield from o.iter_objects_recursive()
+
+    def iter_graphics(self):
+        """
+        Yields all contained Graphical instances that need graphics updates.
+        The list is cached until objects are added or removed
+        """
+        if self._graphics_objects is None:
+            self._graphics_objects = [
+                o for o in self.iter_objects()
+                if isinstance(o, Graphical) and o.needs_graphics_update()
+            ]
+        return iter(self._graphics_objects)
 
     def iter_physics(self):
-        for o in self.iter_objects():
-            if isinstance(o, PhysicsInterface):
-                yield o
+        """
+        Yields all contained PhysicsInterface instances that need updates.
+        The list is cached until objects are added or removed
+        """
+        if self._physics_objects is None:
+            self._physics_objects = [
+                o for o in self.iter_objects()
+                if isinstance(o, PhysicsInterface) and o.needs_update()
+            ]
+        return iter(self._physics_objects)
+
+    def iter_active_physics(self):
+        """
+        Yields the objects of iter_physics() that are not sleeping or have UPDATE_WHILE_SLEEPING set.
+        Skipped objects are checked on every call, so they are updated as soon as pymunk wakes them,
+        e.g. by a collision or through a joint. Objects falling asleep are skipped
+        after at most SLEEP_CHECK_INTERVAL calls
+        """
+        if self._active_physics_objects is None or self._sleep_check_countdown <= 0 \
+                or not all(o.is_sleeping() for o in self._sleeping_physics_objects):
+            self._active_physics_objects = []
+            self._sleeping_physics_objects = []
+            for o in self.iter_physics():
+                if o.UPDATE_WHILE_SLEEPING or not o.is_sleeping():
+                    self._active_physics_objects.append(o)
+                else:
+                    self._sleeping_physics_objects.append(o)
+            self._sleep_check_countdown = self.SLEEP_CHECK_INTERVAL
+        self._sleep_check_countdown -= 1
+        return iter(self._active_physics_objects)
+
+    def invalidate_iteration_cache(self):
+        """Call when the result of needs_update() or needs_graphics_update() of a child changes"""
+        self._physics_objects = None
+        self._graphics_objects = None
+        self._active_physics_objects = None
+        self._sleeping_physics_objects = None
+
+    def request_sleep_check(self):
+        """Check all children for falling asleep or waking up on next update"""
+        self._sleep_check_countdown = 0
 
     def _create_physics(self):
         while self._physics_to_create:
-            obj = self._physics_to_create.pop(0)
+            obj = self._physics_to_create.popleft()
+            # skip objects that have been removed again before their creation
+            if not obj.engine or not obj.can_create_physics():
+                continue
             self.log(4, "create_physics:", obj)
             obj.create_physics()
             if isinstance(obj, Body):
-                obj._start_angular_velocity_applied = False
+                obj.apply_start_velocity()
+            obj.engine.queries.clear()
 
     def _destroy_physics(self):
         while self._physics_to_destroy:
-            obj = self._physics_to_destroy.pop(0)
+            obj = self._physics_to_destroy.popleft()
             self.log(4, "destroy_physics:", obj)
+            engine = obj.engine
             obj.destroy_physics()
+            if engine:
+                engine.queries.clear()
             obj.on_engine_detached()
             obj._engine = None
 
     def _create_graphics(self):
         while self._graphics_to_create:
-            obj = self._graphics_to_create.pop(0)
+            obj = self._graphics_to_create.popleft()
+            if not obj.engine:
+                continue
             self.log(4, "create_graphics:", obj)
             obj.create_graphics()
 
     def _destroy_graphics(self):
         while self._graphics_to_destroy:
-            obj = self._graphics_to_destroy.pop(0)
+            obj = self._graphics_to_destroy.popleft()
             self.log(4, "destroy_graphics:", obj)
             obj.destroy_graphics()
 
         while self._containers_to_destroy_graphics:
-            c = self._containers_to_destroy_graphics.pop(0)
+            c = self._containers_to_destroy_graphics.popleft()
             c._destroy_graphics()
 
     def _remove_bodies(self):
         while self._bodies_to_remove:
-            body = self._bodies_to_remove.pop(0)
+            body = self._bodies_to_remove.popleft()
 
             body.fire_callback("remove_body", body)
 
             for constraint in body._constraints:
                 constraint.remove()
 
-            if body in self.bodies:
-                self.bodies.remove(body)
+            self.bodies.discard(body)
+            self.invalidate_iteration_cache()
 
             self._physics_to_destroy.append(body)
-            self._graphics_to_destroy.append(body)
+            if self.graphics_enabled:
+                self._graphics_to_destroy.append(body)
 
     def _remove_constraints(self):
         while self._constraints_to_remove:
-            constraint = self._constraints_to_remove.pop(0)
+            constraint = self._constraints_to_remove.popleft()
 
             constraint.fire_callback("remove_constraint", constraint)
 
@@ -248,21 +425,24 @@ class ObjectContainer(PhysicsInterface, Graphical, LogMixin):
                     body._constraints.remove(constraint)
             for body in (constraint.a, constraint.b):
                 body.on_remove_constraint(constraint)
+                if body._parent_container:
+                    body._parent_container.request_sleep_check()
 
-            if constraint in self.constraints:
-                self.constraints.remove(constraint)
+            self.constraints.discard(constraint)
+            self.invalidate_iteration_cache()
 
             self._physics_to_destroy.append(constraint)
-            self._graphics_to_destroy.append(constraint)
+            if self.graphics_enabled:
+                self._graphics_to_destroy.append(constraint)
 
     def _create_container_objects(self):
         while self._containers_to_create_objects:
-            container = self._containers_to_create_objects.pop(0)
+            container = self._containers_to_create_objects.popleft()
             container.create_objects()
 
     def _remove_containers(self):
         while self._containers_to_remove:
-            container: ObjectContainer = self._containers_to_remove.pop(0)
+            container: ObjectContainer = self._containers_to_remove.popleft()
             for c in container.containers:
                 container.remove_container(c)
             for c in container.constraints:
@@ -270,11 +450,12 @@ class ObjectContainer(PhysicsInterface, Graphical, LogMixin):
             for b in container.bodies:
                 container.remove_body(b)
 
-            if container in self.containers:
-                self.containers.remove(container)
+            self.containers.discard(container)
+            self.invalidate_iteration_cache()
 
             self._containers_to_destroy_physics.append(container)
-            self._containers_to_destroy_graphics.append(container)
+            if self.graphics_enabled:
+                self._containers_to_destroy_graphics.append(container)
 
     def dump_tree(self, indent="", file=None):
         print(f"{indent}{self.short_name()}")
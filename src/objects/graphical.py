@@ -8,44 +8,132 @@ from ..image_gen import ImageGeneratorSettings
 
 class Graphical(EngineObject):
 
+    TRANSIENT_ATTRIBUTES = {
+        "_graphics": list,
+        "_lines": None,
+        "_graphics_created": False,
+        "_graphics_current": False,
+        "_culled": False,
+    }
+
     def __init__(self, graphic_settings=None, **parameters):
         super().__init__(**parameters)
         self.graphic_settings = graphic_settings or GraphicSettings(draw_lines=True)
         self._graphics = []
+        self._lines = None
+        self._graphics_created = False
+        self._graphics_current = False
+        self._culled = False
 
     def create_graphics(self):
-        """Default implementation create a sprite if configured in graphics_settings"""
+        """
+        Default implementation create a sprite if configured in graphics_settings
+        and a vertex list for the lines along iter_render_points(), if present
+        """
+        self._graphics_created = True
+        self._graphics_current = False
         if self.graphic_settings.draw_sprite:
             sprite = self.graphic_settings.create_sprite(self.engine)
             if sprite:
                 self.on_sprite_created(sprite)
                 self._graphics.append(sprite)
+        if self.graphic_settings.draw_lines and hasattr(self, "iter_render_points"):
+            self._update_lines()
 
     def destroy_graphics(self):
+        self._graphics_created = False
+        self._culled = False
         for g in self._graphics:
             g.delete()
         self._graphics = []
+        if self._lines is not None:
+            self._lines.delete()
+            self._lines = None
 
     def update_graphics(self, dt):
         """
-        Default implementation updates the sprites with position and angle, if present
+        Default implementation updates the sprites with get_render_transform(), if present,
+        and the lines with get_render_points(), if present.
+        Nothing is updated while is_render_static() is True.
         """
-        if hasattr(self, "position"):
-            if self.graphic_settings.draw_sprite and self._graphics:
+        if self._graphics_current and self.is_render_static():
+            return
+        self._graphics_current = self._graphics_created
+
+        if self.graphic_settings.draw_lines and self._graphics_created and hasattr(self, "iter_render_points"):
+            self._update_lines()
+
+        if self.graphic_settings.draw_sprite and self._graphics:
+            transform = self.get_render_transform()
+            if transform:
+                position, angle = transform
                 sprite = self._graphics[0]
-                sprite.position = self.position
-                if hasattr(self, "angle"):
-                    sprite.rotation = -self.angle * 180. / math.pi
+                sprite.position = position
+                if angle is not None:
+                    sprite.rotation = -angle * 180. / math.pi
+
+    def get_render_transform(self):
+        """
+        Returns (position, angle) tuple used for rendering or None.
+        Default implementation returns position and angle, if present
+        """
+        if hasattr(self, "position"):
+            return self.position, getattr(self, "angle", None)
+
+    def is_in_view(self, renderer):
+        """Return False to skip update_graphics() and hide the graphics, see set_culled()"""
+        return True
+
+    def set_culled(self, culled):
+        """Hide the sprites and delete the lines if culled, they are updated again when visible"""
+        self._culled = culled
+        self._graphics_current = False
+        for g in self._graphics:
+            g.visible = not culled
+        if culled and self._lines is not None:
+            self._lines.delete()
+            self._lines = None
+
+    def get_render_points(self):
+        """Returns the world points of the lines used for rendering"""
+        return tuple(self.iter_render_points())
+
+    def is_render_static(self):
+        """Return True if the rendered graphics do not change since the last update_graphics()"""
+        return False
 
     def render_graphics(self):
-        """Default function renders lines along iter_world_points(), if present"""
-        if hasattr(self, "iter_world_points"):
-            if self.graphic_settings.draw_lines:
-                batch: pyglet.graphics.Batch = self.engine.renderer.get_batch(self.graphic_settings.line_batch_name)
-                if batch:
-                    #if isinstance(self, Constraint):
-                    #    print("RENDCON", list(self.iter_world_points()))
-                    self.engine.renderer.draw_lines(batch, self.iter_world_points())
+        """
+        Called each frame before drawing the batches.
+        Can be overridden to draw into the per-frame batches of Renderer.get_batch()
+        """
+        pass
+
+    def _update_lines(self):
+        """Create or update the retained vertex list of the lines"""
+        renderer = self.engine.renderer
+        batch_name = self.graphic_settings.line_batch_name
+        if not renderer.is_batch_enabled(batch_name):
+            return
+
+        vertices = self.get_render_points()
+        if self._lines is not None and self._lines.get_size() != len(vertices):
+            self._lines.delete()
+            self._lines = None
+
+        if self._lines is None:
+            self._lines = renderer.create_lines(renderer.get_permanent_batch(batch_name), vertices)
+        else:
+            renderer.update_lines(self._lines, vertices)
+
+    def needs_graphics_update(self):
+        """
+        Return False if update_graphics() and render_graphics() do nothing.
+        Containers skip the object when rendering then.
+        """
+        return bool(self.graphic_settings.draw_sprite or self.graphic_settings.draw_lines) \
+            or type(self).update_graphics is not Graphical.update_graphics \
+            or type(self).render_graphics is not Graphical.render_graphics
 
     def on_sprite_created(self, sprite):
         """Called by default implementation of create_graphics() if 'draw_sprite' is enabled in graphics_settings"""
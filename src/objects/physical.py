@@ -6,6 +6,9 @@ class PhysicsInterface:
     An interface to apply updates to physics
     """
 
+    # True if update() must not be skipped while is_sleeping() is True
+    UPDATE_WHILE_SLEEPING = False
+
     def __init__(self):
         self._base_update_called = False
         self._num_update_calls = 0
@@ -14,6 +17,26 @@ class PhysicsInterface:
         self._base_update_called = True
         self._num_update_calls += 1
 
+    def needs_update(self):
+        """
+        Return False if update() does nothing.
+        Containers skip the object on each update then.
+        Default implementation checks if update() is overridden.
+        """
+        return type(self).update is not PhysicsInterface.update
+
+    def is_sleeping(self):
+        """
+        Return True if the object is currently at rest.
+        Containers skip the update of sleeping objects until they wake up,
+        unless UPDATE_WHILE_SLEEPING is set.
+        """
+        return False
+
+    def can_create_physics(self):
+        """Return False if create_physics() can not or should not be called right now"""
+        return True
+
     def create_physics(self):
         pass
 
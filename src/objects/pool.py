@@ -0,0 +1,124 @@
+import weakref
+from typing import Dict, List
+
+from pymunk import Vec2d
+
+from .body import Body
+
+
+class BodyPool:
+    """
+    Reuses short-lived bodies like bullets.
+
+    Released bodies are parked: they are removed from their container and
+    the physics space but keep their pymunk body, shapes and sprite.
+    acquire() revives a parked body with the same class and parameters
+    or creates a new one.
+
+    Bodies with constraints and bodies whose physics or graphics are not
+    created yet are removed normally on release.
+    Release and acquire must not be called during a space step,
+    e.g. from collision callbacks, but from update() methods.
+
+    :param max_parked: int, maximum number of parked bodies per key
+    """
+
+    def __init__(self, engine, max_parked=256):
+        self.engine = engine
+        self.max_parked = max_parked
+        self._parked: Dict[tuple, List[Body]] = dict()
+        # weak, so bodies that are removed by other means than release() are forgotten
+        self._keys: Dict[Body, tuple] = weakref.WeakKeyDictionary()
+        self._stats = {
+            "created": 0,
+            "revived": 0,
+            "parked": 0,
+            "removed": 0,
+        }
+
+    @staticmethod
+    def make_key(body_class, parameters):
+        return (body_class, ) + tuple(sorted(parameters.items()))
+
+    def stats(self):
+        return {
+            **self._stats,
+            "num_parked": sum(len(bodies) for bodies in self._parked.values()),
+        }
+
+    def clear(self):
+        """Forget all parked bodies and delete their graphics"""
+        for bodies in self._parked.values():
+            for body in bodies:
+                body.destroy_graphics()
+        self._parked.clear()
+        for body in [body for body in self._keys if not body.engine]:
+            del self._keys[body]
+
+    def acquire(
+            self, container, body_class, position, angle=0.,
+            velocity=(0, 0), angular_velocity=0., **parameters
+    ):
+        """
+        Returns a revived or new body of `body_class` in `container`
+        :param container: ObjectContainer to add the body to
+        :param body_class: a Body class
+        :param parameters: the other constructor parameters of body_class, must be hashable
+        """
+        key = self.make_key(body_class, parameters)
+        parked = self._parked.get(key)
+        if parked:
+            body = parked.pop()
+            self._revive(container, body, position, angle, velocity, angular_velocity)
+            self._stats["revived"] += 1
+        else:
+            body = body_class(position=position, angle=angle, velocity=velocity, **parameters)
+            body.angular_velocity = angular_velocity
+            container.add_body(body)
+            self._keys[body] = key
+            self._stats["created"] += 1
+        return body
+
+    def release(self, body: Body):
+        """Park a body that was created by acquire(), or remove it if it can not be parked"""
+        key = self._keys.get(body)
+        container = body._parent_container
+        parked = self._parked.setdefault(key, []) if key else None
+        if key is None or container is None or not body.engine \
+                or body._body is None or body._constraints \
+                or (container.graphics_enabled and not body._graphics_created) \
+                or len(parked) >= self.max_parked:
+            self._keys.pop(body, None)
+            if body.engine:
+                body.remove()
+            self._stats["removed"] += 1
+            return
+
+        container._detach_body(body)
+        self.engine.space.remove(body._body, *body._shapes)
+        self.engine.queries.clear()
+        for g in body._graphics:
+            g.visible = False
+        if body._lines is not None:
+            body._lines.delete()
+            body._lines = None
+        body._graphics_current = False
+
+        parked.append(body)
+        self._stats["parked"] += 1
+
+    def _revive(self, container, body, position, angle, velocity, angular_velocity):
+        pymunk_body = body._body
+        pymunk_body.force = Vec2d(0, 0)
+        pymunk_body.torque = 0.
+        body.position = position
+        body.angle = angle
+        body.velocity = Vec2d(velocity)
+        body.angular_velocity = angular_velocity
+        self.engine.space.add(pymunk_body, *body._shapes)
+        self.engine.queries.clear()
+
+        container._attach_body(body)
+        for g in body._graphics:
+            g.visible = True
+        body._culled = False
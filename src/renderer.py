@@ -1,5 +1,7 @@
 import math
 
+import numpy as np
+
 import pymunk
 from pymunk import Vec2d
 
@@ -16,6 +18,12 @@ class Renderer:
         self._batches_disabled = set()
         self.translation = Vec2d()
         self.scale = 8.
+        # objects further than cull_margin outside of the view are not updated and hidden
+        self.culling_enabled = True
+        self.cull_margin = 2.
+        self.view_bb: pymunk.BB = None
+        self._visible_bodies = set()
+        self._cull_shape_filter = pymunk.ShapeFilter()
 
     def get_permanent_batch(self, name):
         if name in self._batches_disabled:
@@ -51,6 +59,42 @@ class Renderer:
             bottom + pixel_pos[1] / self.engine.window_size[1] * (top - bottom),
         ) + self.translation
 
+    def get_view_bb(self, margin=0.):
+        """Returns the visible map rectangle of render() as pymunk.BB"""
+        aspect = self.engine.window_size.x / self.engine.window_size.y
+        center = self.translation + (0, .5 * self.scale)
+        return pymunk.BB(
+            center.x - self.scale * aspect - margin,
+            center.y - self.scale - margin,
+            center.x + self.scale * aspect + margin,
+            center.y + self.scale + margin,
+        )
+
+    def update_culling(self):
+        """Find all bodies with a shape in the view rectangle plus cull_margin"""
+        if not self.culling_enabled:
+            self.view_bb = None
+            self._visible_bodies = set()
+            return
+
+        self.view_bb = self.get_view_bb(self.cull_margin)
+        self._visible_bodies = {
+            getattr(shape, "_parent_body", None)
+            for shape in self.engine.space.bb_query(self.view_bb, self._cull_shape_filter)
+        }
+
+    @property
+    def visible_bodies(self):
+        """Set of Body instances found by the last update_culling()"""
+        return self._visible_bodies
+
+    def is_body_visible(self, body):
+        if self.view_bb is None:
+            return True
+        if body._body:
+            return body in self._visible_bodies
+        return self.view_bb.contains_vect(body.position)
+
     def render(self):
         gl.glMatrixMode(gl.GL_PROJECTION)
         gl.glPushMatrix()
@@ -72,12 +116,47 @@ class Renderer:
         # print(self._batches, self._permanent_batches)
 
         for key in self._permanent_batches:
-            self._permanent_batches[key].draw()
+            if key not in self._batches_disabled:
+                self._permanent_batches[key].draw()
 
         for key in tuple(self._batches):
             self._batches[key].draw()
             del self._batches[key]
 
+    def create_lines(self, batch, vertices):
+        """
+        Adds a closed line loop (or a single line for two vertices) to the batch.
+        Returns the vertex list, which can be updated with update_lines()
+        as long as the number of vertices does not change, or None for less than two vertices.
+        """
+        if not isinstance(vertices, np.ndarray):
+            vertices = tuple(vertices)
+        num_vertices = len(vertices)
+        if num_vertices < 2:
+            return None
+        if num_vertices == 2:
+            indices = (0, 1)
+        else:
+            indices = []
+            for i in range(num_vertices):
+                indices.append(i)
+                indices.append((i + 1) % num_vertices)
+
+        return batch.add_indexed(
+            num_vertices, gl.GL_LINES, None,
+            indices,
+            ("v2f/stream", self._flatten_vertices(vertices)),
+        )
+
+    def update_lines(self, vertex_list, vertices):
+        vertex_list.vertices[:] = self._flatten_vertices(vertices)
+
+    @staticmethod
+    def _flatten_vertices(vertices):
+        if isinstance(vertices, np.ndarray):
+            return vertices.ravel().tolist()
+        return [c for pos in vertices for c in (pos[0], pos[1])]
+
     def draw_lines(self, batch, vertices):
         vertices = tuple(vertices)
         num_vertices = len(vertices)
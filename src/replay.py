@@ -0,0 +1,235 @@
+import json
+import zlib
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from .headless import HeadlessRunner
+from .substeps import SubstepPolicy
+
+
+def state_checksum(engine) -> int:
+    """
+    CRC32 of the kinematic state of all bodies in the space and of the particle positions.
+    Two runs with equal checksums at the same update are, with high probability, bit-identical.
+    """
+    states = np.array(
+        [(*b.position, b.angle, *b.velocity, b.angular_velocity) for b in engine.space.bodies],
+        dtype=np.float64
+    )
+    checksum = zlib.crc32(states.tobytes())
+    return zlib.crc32(np.ascontiguousarray(engine.particles.positions).tobytes(), checksum)
+
+
+def mouse_press(engine, position, button: int):
+    """
+    The effect of a mouse press at map `position` on the world,
+    shared by the window, InputRecorder and InputReplay.
+    Returns the body under the cursor or None.
+    """
+    return engine.point_query_body(position)
+
+
+class InputRecording:
+    """
+    The key events and mouse presses of a Player session by engine update, along with
+    everything needed to replay it: map, seed, fixed time step and substep policy.
+
+    `checksums` holds the state_checksum() after each update, it's filled
+    by the first replay and compared by later replays.
+    """
+
+    VERSION = 2
+
+    def __init__(
+            self,
+            map_name="bd",
+            seed=0,
+            fixed_dt=1. / 60.,
+            substep_policy: Optional[str] = None,
+            num_steps=0,
+            events: List[Tuple[int, str, bool]] = None,
+            mouse_events: List[Tuple[int, float, float, int]] = None,
+            checksums: List[int] = None,
+    ):
+        self.map_name = map_name
+        self.seed = seed
+        self.fixed_dt = fixed_dt
+        self.substep_policy = substep_policy
+        self.num_steps = num_steps
+        # (update index, key, down)
+        self.events = events or []
+        # (update index, map x, map y, button)
+        self.mouse_events = mouse_events or []
+        self.checksums = checksums or []
+
+    def __repr__(self):
+        return (
+            f"{self.__class__.__name__}(map_name={self.map_name!r}, seed={self.seed!r}"
+            f", num_steps={self.num_steps}, events={len(self.events)}, mouse_events={len(self.mouse_events)}"
+            f", checksums={len(self.checksums)})"
+        )
+
+    def to_dict(self):
+        return {
+            "version": self.VERSION,
+            "map_name": self.map_name,
+            "seed": self.seed,
+            "fixed_dt": self.fixed_dt,
+            "substep_policy": self.substep_policy,
+            "num_steps": self.num_steps,
+            "events": [list(e) for e in self.events],
+            "mouse_events": [list(e) for e in self.mouse_events],
+            "checksums": self.checksums,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        # version 1 recordings have no mouse events
+        if data.get("version") not in (1, cls.VERSION):
+            raise ValueError(f"Unsupported recording version {data.get('version')}")
+        return cls(
+            map_name=data["map_name"],
+            seed=data["seed"],
+            fixed_dt=data["fixed_dt"],
+            substep_policy=data["substep_policy"],
+            num_steps=data["num_steps"],
+            events=[(int(step), key, bool(down)) for step, key, down in data["events"]],
+            mouse_events=[
+                (int(step), float(x), float(y), int(button))
+                for step, x, y, button in data.get("mouse_events", [])
+            ],
+            checksums=data["checksums"],
+        )
+
+    def save(self, filename):
+        with open(filename, "w") as fp:
+            json.dump(self.to_dict(), fp)
+
+    @classmethod
+    def load(cls, filename):
+        with open(filename) as fp:
+            return cls.from_dict(json.load(fp))
+
+
+class InputRecorder:
+    """
+    Records the key events of the Engine's player and the mouse presses by engine update.
+
+    Key events must be passed to set_key_down() instead of Player.keys
+    and mouse presses to mouse_press() instead of the module function.
+    The recording starts at the current update and replays start with a freshly
+    initialized map, so create the recorder right after the map.
+    Other changes to the world, e.g. adding objects from the window, are not recorded.
+    """
+
+    def __init__(self, engine, map_name, seed, substep_policy: Optional[str] = None):
+        self.engine = engine
+        self.start_update = engine.num_updates
+        self.recording = InputRecording(
+            map_name=map_name,
+            seed=seed,
+            fixed_dt=engine.fixed_step_dt,
+            substep_policy=substep_policy,
+        )
+
+    @property
+    def step(self):
+        return self.engine.num_updates - self.start_update
+
+    def set_key_down(self, key, down: bool):
+        self.recording.events.append((self.step, key, bool(down)))
+        self.engine.player.keys.set_key_down(key, down)
+
+    def mouse_press(self, position, button: int):
+        """Record and apply a mouse press at map `position`, returns the body under the cursor"""
+        self.recording.mouse_events.append((self.step, float(position[0]), float(position[1]), int(button)))
+        return mouse_press(self.engine, position, button)
+
+    def stop(self) -> InputRecording:
+        self.recording.num_steps = self.step
+        return self.recording
+
+
+class InputReplay:
+    """
+    Replays an InputRecording in a HeadlessRunner as fast as possible.
+
+    The key events are passed to the player and the mouse presses to mouse_press()
+    before their update, and the state_checksum()
+    is computed after each update (timed as "checksum" phase).
+    If the recording has checksums, they are compared and the mismatches counted,
+    otherwise the recording's checksums are set from this replay.
+    """
+
+    def __init__(self, recording: InputRecording, with_checksums=True):
+        self.recording = recording
+        self.with_checksums = with_checksums
+        self.runner = HeadlessRunner(
+            map_name=recording.map_name,
+            fixed_dt=recording.fixed_dt,
+            substep_policy=SubstepPolicy.from_string(recording.substep_policy)
+            if recording.substep_policy else None,
+            seed=recording.seed,
+        )
+        self.checksums = []
+        self.num_mismatches = 0
+        self.first_mismatch = None
+        self._event_index = 0
+        self._mouse_event_index = 0
+
+    @property
+    def engine(self):
+        return self.runner.engine
+
+    def run(self, num_steps=None):
+        """Replay the first `num_steps` or all steps of the recording"""
+        if num_steps is None:
+            num_steps = self.recording.num_steps - self.runner.num_steps
+        self._apply_events()
+        self.runner.run(num_steps=num_steps, callback=self._after_step)
+        if self.with_checksums and not self.recording.checksums:
+            self.recording.checksums = list(self.checksums)
+        return self
+
+    def stats(self):
+        return {
+            **self.runner.stats(),
+            "events": self._event_index,
+            "mouse_events": self._mouse_event_index,
+            "checksums": len(self.checksums),
+            "checksum_mismatches": self.num_mismatches,
+            "first_mismatch": self.first_mismatch,
+        }
+
+    def print_report(self, file=None):
+        self.runner.print_report(file=file, stats=self.stats())
+
+    def _apply_events(self):
+        events = self.recording.events
+        step = self.runner.num_steps
+        while self._event_index < len(events) and events[self._event_index][0] <= step:
+            _, key, down = events[self._event_index]
+            self.engine.player.keys.set_key_down(key, down)
+            self._event_index += 1
+
+        mouse_events = self.recording.mouse_events
+        while self._mouse_event_index < len(mouse_events) and mouse_events[self._mouse_event_index][0] <= step:
+            _, x, y, button = mouse_events[self._mouse_event_index]
+            mouse_press(self.engine, (x, y), button)
+            self._mouse_event_index += 1
+
+    def _after_step(self, runner):
+        if self.with_checksums:
+            with self.engine.phase_timings.measure("checksum"):
+                checksum = state_checksum(self.engine)
+            self.checksums.append(checksum)
+
+            expected = self.recording.checksums
+            step = len(self.checksums) - 1
+            if step < len(expected) and expected[step] != checksum:
+                self.num_mismatches += 1
+                if self.first_mismatch is None:
+                    self.first_mismatch = step
+
+        self._apply_events()
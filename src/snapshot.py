@@ -0,0 +1,802 @@
+import gc
+import json
+import math
+import random
+import struct
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Union
+
+import numpy as np
+import pymunk
+from pymunk import Vec2d
+
+from .keyhandler import KeyHandler
+from .objects.base import EngineObject, get_transient_attributes
+from .objects.body import Body
+from .objects.constraints import Constraint
+from .objects.container import ObjectContainer
+from .parameterized import Parameterized
+from .util.ordered_set import OrderedSet
+
+
+# kinematic state of each body in Snapshot payloads, sleep_group is the index
+# of the body whose sleeping group the body belongs to or -1 if it's awake
+BODY_STATE_DTYPE = np.dtype([
+    ("position", np.float64, (2, )),
+    ("angle", np.float64),
+    ("velocity", np.float64, (2, )),
+    ("angular_velocity", np.float64),
+    ("sleep_group", np.int64),
+])
+
+# Constraint.get_physics_state() of each constraint with a pymunk constraint,
+# distance is the distance of pin joints (e.g. changed by the Tentacle) or NaN
+CONSTRAINT_STATE_DTYPE = np.dtype([
+    ("max_force", np.float64),
+    ("error_bias", np.float64),
+    ("max_bias", np.float64),
+    ("distance", np.float64),
+])
+
+# non-Parameterized classes whose instances can be stored as values
+VALUE_CLASSES = (KeyHandler, )
+
+_NUMPY_BIT_GENERATORS = ("MT19937", "PCG64", "PCG64DXSM", "Philox", "SFC64")
+
+
+class Snapshot:
+    """
+    Serialized state of an Engine, see Engine.snapshot() and Engine.restore().
+
+    The `schema` is a json-compatible dict with the engine scalars and the object tree:
+    one group per class with the object indices and one column per attribute.
+    Numeric, string, vector, tuple and reference columns are numpy arrays, as are the kinematic state
+    of all bodies (BODY_STATE_DTYPE), the constraint state (CONSTRAINT_STATE_DTYPE)
+    and numpy attributes like the particle arrays. Other values are tagged json,
+    columns of mostly equal values store each value once and an index array.
+    Objects are rebuilt without calling their constructors and only classes
+    derived from Parameterized (including EngineObject) or in VALUE_CLASSES are instantiated.
+    Nothing is unpickled or evaluated.
+    Bodies and constraints are listed in the order of the physics space, so restores
+    recreate them in that order.
+
+    File layout: magic, schema size, number of arrays, (offset, size) of each array,
+    the schema as utf-8 json and the arrays, each aligned to ALIGNMENT bytes.
+    Loaded arrays are memory-mapped copy-on-write, see take_arrays().
+    """
+
+    MAGIC = b"C2DSNAP2"
+    ALIGNMENT = 64
+    VERSION = 4
+
+    def __init__(self, schema: dict, arrays: List[np.ndarray], filename: Optional[Union[str, Path]] = None):
+        self.schema = schema
+        self.arrays = arrays
+        self.filename = filename
+        self._arrays_taken = False
+
+    @property
+    def nbytes(self):
+        return len(json.dumps(self.schema)) + sum(a.nbytes for a in self.arrays)
+
+    def take_arrays(self) -> List[np.ndarray]:
+        """
+        Returns the arrays for one restore. The restored objects own and modify them,
+        so these are copies, except for the first restore of a loaded snapshot,
+        which gets the copy-on-write mapped arrays.
+        """
+        if self.filename is not None and not self._arrays_taken:
+            self._arrays_taken = True
+            return self.arrays
+        if self.filename is not None:
+            return self.load(self.filename).arrays
+        return [a.copy() for a in self.arrays]
+
+    def save(self, filename: Union[str, Path]):
+        schema = {
+            **self.schema,
+            "arrays": [
+                {"dtype": np.lib.format.dtype_to_descr(a.dtype), "shape": list(a.shape)}
+                for a in self.arrays
+            ],
+        }
+        data = json.dumps(schema, separators=(",", ":")).encode("utf-8")
+
+        header_size = len(self.MAGIC) + 16 + 16 * len(self.arrays)
+        offset = self._align(header_size + len(data))
+        entries = []
+        for array in self.arrays:
+            entries.append((offset, array.nbytes))
+            offset = self._align(offset + array.nbytes)
+
+        with open(filename, "wb") as fp:
+            fp.write(self.MAGIC)
+            fp.write(struct.pack("<QQ", len(data), len(self.arrays)))
+            for entry in entries:
+                fp.write(struct.pack("<QQ", *entry))
+            fp.write(data)
+            for (offset, size), array in zip(entries, self.arrays):
+                fp.write(b"\0" * (offset - fp.tell()))
+                fp.write(np.ascontiguousarray(array).reshape(-1).view(np.uint8).data)
+
+    @classmethod
+    def load(cls, filename: Union[str, Path]):
+        memmap = np.memmap(filename, dtype=np.uint8, mode="c")
+        pos = len(cls.MAGIC)
+        if bytes(memmap[:pos]) != cls.MAGIC:
+            raise ValueError(f"'{filename}' is not a snapshot file")
+
+        try:
+            data_size, num_arrays = struct.unpack("<QQ", memmap[pos:pos + 16])
+            pos += 16
+            entries = np.frombuffer(memmap[pos:pos + 16 * num_arrays], dtype="<u8").reshape(-1, 2).tolist()
+            pos += 16 * num_arrays
+            schema = json.loads(bytes(memmap[pos:pos + data_size]).decode("utf-8"))
+            infos = schema.pop("arrays")
+            if len(infos) != num_arrays:
+                raise ValueError("number of arrays does not match")
+
+            arrays = []
+            for (offset, size), info in zip(entries, infos):
+                dtype = np.lib.format.descr_to_dtype(_decode_descr(info["dtype"]))
+                if dtype.hasobject:
+                    raise ValueError(f"object dtype {dtype}")
+                shape = tuple(int(s) for s in info["shape"])
+                if offset + size > memmap.shape[0] or math.prod(shape) * dtype.itemsize != size:
+                    raise ValueError(f"array of {size} bytes at {offset} out of bounds")
+                arrays.append(memmap[offset:offset + size].view(dtype).reshape(shape))
+        except (KeyError, TypeError, struct.error, UnicodeDecodeError) as e:
+            raise ValueError(f"'{filename}' is not a valid snapshot file: {e!r}")
+        except ValueError as e:
+            raise ValueError(f"'{filename}' is not a valid snapshot file: {e}")
+
+        return cls(schema, arrays, filename=filename)
+
+    @classmethod
+    def _align(cls, offset):
+        return (offset + cls.ALIGNMENT - 1) // cls.ALIGNMENT * cls.ALIGNMENT
+
+
+def _decode_descr(descr):
+    """json turns the tuples of structured dtype descriptions into lists"""
+    if isinstance(descr, str):
+        return descr
+    fields = []
+    for name, field_descr, *shape in descr:
+        if isinstance(name, list):
+            name = tuple(name)
+        fields.append((name, _decode_descr(field_descr), *(tuple(s) for s in shape)))
+    return fields
+
+
+@contextmanager
+def _gc_disabled():
+    """The garbage collector is slow with the many objects created by snapshots and restores"""
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def create_snapshot(engine) -> Snapshot:
+    with _gc_disabled():
+        return _create_snapshot(engine)
+
+
+def restore_snapshot(engine, snapshot: Snapshot):
+    with _gc_disabled():
+        _restore_snapshot(engine, snapshot)
+
+
+def pack_objects(objects: list, is_external: Callable[[object], bool]) -> dict:
+    """
+    Encode `objects` and everything they reference into the Snapshot column format.
+
+    Referenced objects for which `is_external()` is True are not encoded but kept in
+    the "externals" list and passed back by unpack_objects().
+    Returns a dict of plain values, numpy arrays and the externals,
+    which can itself be part of a Snapshot.
+    Raises TypeError if a value can not be encoded.
+    """
+    with _gc_disabled():
+        encoder = _Encoder(is_external)
+        for obj in objects:
+            encoder.add_object(obj)
+        groups = encoder.encode_objects()
+    return {
+        "num_packed": len(objects),
+        "num_objects": len(encoder.objects),
+        "groups": groups,
+        "arrays": encoder.arrays,
+        "externals": encoder.externals,
+    }
+
+
+def unpack_objects(packed: dict) -> list:
+    """Returns new instances of the `objects` passed to pack_objects()"""
+    with _gc_disabled():
+        decoder = _Decoder(packed, packed["arrays"], packed["externals"])
+        decoder.decode_objects()
+    return decoder.objects[:packed["num_packed"]]
+
+
+def _create_snapshot(engine) -> Snapshot:
+    encoder = _Encoder()
+    container_index = encoder.add_object(engine.container)
+    for obj in engine.container.iter_objects_recursive():
+        encoder.add_object(obj)
+    groups = encoder.encode_objects()
+
+    bodies = _get_space_order(
+        encoder, [b._parent_body for b in engine.space.bodies],
+        [i for i, o in enumerate(encoder.objects) if isinstance(o, Body)],
+    )
+    body_states = np.array(
+        [_get_body_state(encoder.objects[i]) for i in bodies], dtype=BODY_STATE_DTYPE
+    ).reshape(-1)
+    body_states["sleep_group"] = _get_sleep_groups([encoder.objects[i] for i in bodies])
+
+    constraint_objects = {
+        id(o._constraint): o for o in encoder.objects
+        if isinstance(o, Constraint) and o._constraint is not None
+    }
+    constraints = _get_space_order(
+        encoder, [constraint_objects.get(id(c)) for c in engine.space.constraints],
+        [encoder.get_index(o) for o in constraint_objects.values()],
+    )
+    constraint_states = np.array(
+        [encoder.objects[i].get_physics_state() for i in constraints], dtype=CONSTRAINT_STATE_DTYPE
+    ).reshape(-1)
+
+    schema = {
+        "version": Snapshot.VERSION,
+        "time": engine.time,
+        "step_count": engine.step_count,
+        "num_updates": engine.num_updates,
+        "rng": encoder.encode(engine.rng),
+        "time_accumulator": engine._time_accumulator,
+        "gravity": list(engine.space.gravity),
+        "substep_policy": encoder.encode(engine.substep_policy),
+        "container": container_index,
+        "player": encoder.encode(engine.player),
+        "particles": encoder.encode(engine.particles),
+        "bodies": encoder.add_array(np.array(bodies, dtype=np.int64)),
+        "body_states": encoder.add_array(body_states),
+        "constraints": encoder.add_array(np.array(constraints, dtype=np.int64)),
+        "constraint_states": encoder.add_array(constraint_states),
+    }
+    # the engine values can reference objects that are not in the tree
+    groups.extend(encoder.encode_objects())
+    schema.update({
+        "num_objects": len(encoder.objects),
+        "groups": groups,
+    })
+    return Snapshot(schema, encoder.arrays)
+
+
+def _restore_snapshot(engine, snapshot: Snapshot):
+    schema = snapshot.schema
+    if schema.get("version") != Snapshot.VERSION:
+        raise ValueError(f"Unsupported snapshot version {schema.get('version')}")
+
+    # decode everything before the world is touched, so invalid snapshots keep the engine intact
+    try:
+        decoder = _Decoder(schema, snapshot.take_arrays())
+        decoder.decode_objects()
+        container = decoder.get_object(schema["container"], ObjectContainer)
+        player = decoder.decode(schema["player"])
+        particles = decoder.decode(schema["particles"])
+        rng = decoder.decode(schema["rng"])
+        substep_policy = decoder.decode(schema["substep_policy"])
+        bodies = [decoder.get_object(i, Body) for i in decoder.get_array(schema["bodies"]).tolist()]
+        body_states = decoder.get_array(schema["body_states"], BODY_STATE_DTYPE)
+        constraints = [decoder.get_object(i, Constraint) for i in decoder.get_array(schema["constraints"]).tolist()]
+        constraint_states = decoder.get_array(schema["constraint_states"], CONSTRAINT_STATE_DTYPE)
+        if len(bodies) != len(body_states) or len(constraints) != len(constraint_states):
+            raise ValueError("Number of states does not match")
+        sleep_groups = body_states["sleep_group"]
+        sleeping = np.flatnonzero(sleep_groups >= 0)
+        if np.any(sleep_groups[sleeping] >= len(bodies)) \
+                or np.any(sleep_groups[sleep_groups[sleeping]] != sleep_groups[sleeping]):
+            raise ValueError("Invalid sleep groups")
+    except (KeyError, IndexError, TypeError, AttributeError) as e:
+        raise ValueError(f"Invalid snapshot: {e!r}")
+
+    engine._reset_world()
+    engine.time = schema["time"]
+    engine.step_count = schema["step_count"]
+    engine.num_updates = schema["num_updates"]
+    engine.rng = rng
+    engine._time_accumulator = schema["time_accumulator"]
+    engine.space.gravity = tuple(schema["gravity"])
+    engine.substep_policy = substep_policy
+    engine.player = player
+    engine.particles = particles
+
+    engine.container = container
+    container._engine = engine
+    for obj in container.iter_objects_recursive():
+        obj._engine = engine
+
+    # column-wise, converting the structured rows is slower
+    for body, (px, py), angle, (vx, vy), angular_velocity in zip(
+            bodies,
+            body_states["position"].tolist(),
+            body_states["angle"].tolist(),
+            body_states["velocity"].tolist(),
+            body_states["angular_velocity"].tolist(),
+    ):
+        body.start_position = Vec2d(px, py)
+        body.start_angle = angle
+        body._start_velocity = Vec2d(vx, vy)
+        body.start_angular_velocity = angular_velocity
+
+    for constraint, state in zip(constraints, constraint_states.tolist()):
+        constraint.set_physics_state(state)
+
+    _create_objects(container, bodies, constraints)
+    _restore_sleep_groups(bodies, sleep_groups)
+
+
+def _get_space_order(encoder, space_objects: list, indices: List[int]) -> List[int]:
+    """
+    Returns `indices` with the objects of `space_objects` first, in their order.
+    Objects that are not in the snapshot are skipped
+    """
+    ordered = dict.fromkeys(
+        index for index in map(encoder.get_index, space_objects) if index is not None
+    )
+    ordered.update(dict.fromkeys(indices))
+    return list(ordered)
+
+
+def _get_body_state(body: Body):
+    b = body._body
+    if b is not None and b.body_type != pymunk.Body.STATIC:
+        return tuple(b.position), b.angle, tuple(b.velocity), b.angular_velocity, -1
+    return tuple(body.start_position), body.start_angle, tuple(body._start_velocity), body.start_angular_velocity, -1
+
+
+def _get_sleep_groups(bodies: List[Body]) -> np.ndarray:
+    """
+    Returns the sleep_group column: sleeping bodies that are connected by constraints
+    share the index of one of them.
+    The sleeping groups of pymunk also contain touching bodies, but their arbiters
+    are too slow to query, the restored groups wake each other on contact.
+    """
+    positions = {
+        body: i for i, body in enumerate(bodies)
+        if body._body is not None and body._body.body_type == pymunk.Body.DYNAMIC and body._body.is_sleeping
+    }
+    groups = np.full(len(bodies), -1, dtype=np.int64)
+    for body, i in positions.items():
+        groups[i] = i
+
+    def find(i):
+        while groups[i] != i:
+            groups[i] = groups[groups[i]]
+            i = groups[i]
+        return i
+
+    for body in positions:
+        for constraint in body._constraints:
+            if constraint.a in positions and constraint.b in positions:
+                a, b = find(positions[constraint.a]), find(positions[constraint.b])
+                groups[max(a, b)] = min(a, b)
+    for i in positions.values():
+        groups[i] = find(i)
+    return groups
+
+
+def _restore_sleep_groups(bodies: List[Body], sleep_groups: np.ndarray):
+    """Put the bodies of each sleep group to sleep, see _get_sleep_groups()"""
+    sleeping = np.flatnonzero(sleep_groups >= 0)
+    # group roots first, roots that can not sleep leave their group awake
+    roots = sleeping[sleep_groups[sleeping] == sleeping].tolist()
+    members = sleeping[sleep_groups[sleeping] != sleeping].tolist()
+    for i in roots:
+        b = bodies[i]._body
+        if b is not None and b.space is not None and b.body_type == pymunk.Body.DYNAMIC:
+            b.sleep()
+    for i in members:
+        b, root = bodies[i]._body, bodies[sleep_groups[i]]._body
+        if b is not None and b.space is not None and b.body_type == pymunk.Body.DYNAMIC \
+                and root is not None and root.is_sleeping:
+            b.sleep_with_group(root)
+
+
+def _create_objects(root: ObjectContainer, bodies: List[Body] = (), constraints: List[Constraint] = ()):
+    """
+    Create the physics of all bodies, then of all constraints, in containers with physics enabled,
+    and queue the graphics creation.
+    `bodies` and `constraints` are created first and in their order, the order of the physics space.
+    """
+    for body in bodies:
+        if body.engine and body._parent_container is not None and body._parent_container.physics_enabled \
+                and body.can_create_physics():
+            body.create_physics()
+            body.apply_start_velocity()
+
+    containers = [root] + [o for o in root.iter_objects_recursive() if isinstance(o, ObjectContainer)]
+    constraints = list(constraints)
+    for container in containers:
+        # pending objects are either still contained or have been removed
+        container._physics_to_create.clear()
+        container._graphics_to_create.clear()
+        if container.physics_enabled:
+            for body in container.bodies:
+                if body.can_create_physics():
+                    body.create_physics()
+                    body.apply_start_velocity()
+                constraints.extend(body._constraints)
+            constraints.extend(container.constraints)
+        if container.graphics_enabled:
+            container._graphics_to_create.extend(container.bodies)
+            container._graphics_to_create.extend(container.constraints)
+
+    for constraint in constraints:
+        if constraint.engine and constraint.can_create_physics():
+            constraint.create_physics()
+
+
+def _class_name(cls):
+    return f"{cls.__module__}.{cls.__qualname__}"
+
+
+def _iter_subclasses(cls):
+    for sub in cls.__subclasses__():
+        yield sub
+        yield from _iter_subclasses(sub)
+
+
+class _Missing:
+    """Marks attributes that only some objects of a group have"""
+
+
+_MISSING = _Missing()
+
+
+def _is_object(value) -> bool:
+    """Objects are stored in the class groups and referenced by index, preserving shared instances"""
+    return isinstance(value, Parameterized) or isinstance(value, VALUE_CLASSES)
+
+
+class _Encoder:
+    """
+    Encodes objects column-wise per class and other values as tagged json.
+
+    Objects are EngineObjects, other Parameterized instances (e.g. GraphicSettings)
+    and instances of VALUE_CLASSES. Tagged values are dicts with the tag in "$":
+    ref (object index), external (index in `externals`), tuple, dict, set, ordered_set,
+    deque, vec2d, shape_filter, array, scalar, random, numpy_random, missing.
+    Lists, strings, numbers, bools and None are plain json.
+
+    :param is_external: optional function, objects for which it returns True are
+        referenced by their index in `externals` instead of being encoded
+    """
+
+    def __init__(self, is_external: Optional[Callable[[object], bool]] = None):
+        self.objects: list = []
+        self.arrays: List[np.ndarray] = []
+        self.externals: list = []
+        self._object_indices: Dict[int, int] = dict()
+        self._external_indices: Dict[int, int] = dict()
+        self._is_external = is_external
+        self._num_encoded = 0
+
+    def add_object(self, obj) -> int:
+        index = self._object_indices.get(id(obj))
+        if index is None:
+            index = self._object_indices[id(obj)] = len(self.objects)
+            self.objects.append(obj)
+        return index
+
+    def get_external_index(self, obj) -> Optional[int]:
+        """Returns the index of `obj` in `externals`, adding it if it's external, or None"""
+        if self._is_external is None or not self._is_external(obj):
+            return None
+        index = self._external_indices.get(id(obj))
+        if index is None:
+            index = self._external_indices[id(obj)] = len(self.externals)
+            self.externals.append(obj)
+        return index
+
+    def get_index(self, obj) -> Optional[int]:
+        """Returns the index of an added object or None"""
+        if obj is None:
+            return None
+        return self._object_indices.get(id(obj))
+
+    def add_array(self, array: np.ndarray) -> int:
+        if array.dtype.hasobject:
+            raise TypeError(f"Can not snapshot numpy arrays of dtype {array.dtype}")
+        self.arrays.append(np.array(array))
+        return len(self.arrays) - 1
+
+    def encode_objects(self) -> List[dict]:
+        """Encode all objects added since the last call, including the newly referenced ones"""
+        groups = []
+        while self._num_encoded < len(self.objects):
+            indices_by_class = dict()
+            for index in range(self._num_encoded, len(self.objects)):
+                indices_by_class.setdefault(type(self.objects[index]), []).append(index)
+            self._num_encoded = len(self.objects)
+            for cls, indices in indices_by_class.items():
+                groups.append(self._encode_group(cls, indices))
+        return groups
+
+    def _encode_group(self, cls, indices: List[int]) -> dict:
+        transient = get_transient_attributes(cls) if issubclass(cls, EngineObject) else dict()
+        states = [vars(self.objects[i]) for i in indices]
+        keys = dict()
+        for state in states:
+            for key in state:
+                if key not in transient:
+                    keys[key] = None
+
+        columns = dict()
+        for key in keys:
+            values = [state.get(key, _MISSING) for state in states]
+            columns[key] = self._encode_column(values)
+
+        return {
+            "class": _class_name(cls),
+            "objects": self.add_array(np.array(indices, dtype=np.int64)),
+            "columns": columns,
+        }
+
+    def _encode_column(self, values: list) -> dict:
+        first = values[0]
+        if first is not _MISSING and all(v is first for v in values):
+            return {"kind": "const", "value": self.encode(first)}
+
+        types = set(map(type, values))
+        if len(types) == 1:
+            value_type = next(iter(types))
+            if value_type in (float, int, bool):
+                try:
+                    return {"kind": "array", "array": self.add_array(np.array(values, dtype=value_type))}
+                except OverflowError:
+                    pass
+            # numpy strips trailing null characters
+            elif value_type is str and not any(v.endswith("\0") for v in values):
+                return {"kind": "array", "array": self.add_array(np.array(values, dtype=str))}
+            elif value_type is Vec2d:
+                array = np.array([(v.x, v.y) for v in values], dtype=np.float64).reshape(-1, 2)
+                return {"kind": "vec2d", "array": self.add_array(array)}
+            elif value_type is tuple:
+                column = self._encode_tuple_column(values)
+                if column is not None:
+                    return column
+            elif value_type is np.ndarray:
+                if len(set((v.dtype, v.shape) for v in values)) == 1 and not first.dtype.hasobject:
+                    return {"kind": "stacked", "array": self.add_array(np.stack(values))}
+            elif value_type is dict and not any(values):
+                return {"kind": "empty", "type": "dict"}
+            elif value_type is list and not any(values):
+                return {"kind": "empty", "type": "list"}
+
+        if all(v is None or (_is_object(v) and self.get_external_index(v) is None) for v in values):
+            refs = [-1 if v is None else self.add_object(v) for v in values]
+            return {"kind": "ref", "array": self.add_array(np.array(refs, dtype=np.int64))}
+
+        encoded = [self.encode(v) for v in values]
+        # equal values, e.g. the user_data of map objects, are stored once
+        keys = [json.dumps(v, separators=(",", ":")) for v in encoded]
+        unique = dict()
+        for key, value in zip(keys, encoded):
+            unique.setdefault(key, (len(unique), value))
+        if len(unique) * 2 <= len(values):
+            return {
+                "kind": "indexed",
+                "values": [value for index, value in unique.values()],
+                "array": self.add_array(np.array([unique[key][0] for key in keys], dtype=np.int64)),
+            }
+        return {"kind": "values", "values": encoded}
+
+    def _encode_tuple_column(self, values: List[tuple]) -> Optional[dict]:
+        """Tuples of the same length and of only floats or only ints, e.g. colors"""
+        if len(set(map(len, values))) != 1:
+            return None
+        item_types = set(type(i) for v in values for i in v)
+        if len(item_types) != 1 or next(iter(item_types)) not in (float, int):
+            return None
+        try:
+            array = np.array(values, dtype=next(iter(item_types))).reshape(len(values), -1)
+        except OverflowError:
+            return None
+        return {"kind": "tuple", "array": self.add_array(array)}
+
+    def encode(self, value):
+        value_type = type(value)
+        if value is None or value_type in (bool, int, float, str):
+            return value
+        if value is _MISSING:
+            return {"$": "missing"}
+        if value_type is list:
+            return [self.encode(v) for v in value]
+        if _is_object(value):
+            external = self.get_external_index(value)
+            if external is not None:
+                return {"$": "external", "v": external}
+            return {"$": "ref", "v": self.add_object(value)}
+        if value_type is Vec2d:
+            return {"$": "vec2d", "v": [value.x, value.y]}
+        if isinstance(value, pymunk.ShapeFilter):
+            return {"$": "shape_filter", "v": [value.group, value.categories, value.mask]}
+        if value_type is tuple:
+            return {"$": "tuple", "v": [self.encode(v) for v in value]}
+        if value_type is dict:
+            return {"$": "dict", "v": [[self.encode(k), self.encode(v)] for k, v in value.items()]}
+        if value_type is OrderedSet:
+            return {"$": "ordered_set", "v": [self.encode(v) for v in value]}
+        if value_type in (set, frozenset):
+            return {"$": "set", "v": [self.encode(v) for v in value]}
+        if value_type is deque:
+            return {"$": "deque", "v": [self.encode(v) for v in value], "maxlen": value.maxlen}
+        if isinstance(value, np.ndarray):
+            return {"$": "array", "v": self.add_array(value)}
+        if isinstance(value, np.generic):
+            return {"$": "scalar", "dtype": value.dtype.str, "v": value.item()}
+        if value_type is random.Random:
+            return {"$": "random", "v": self.encode(value.getstate())}
+        if value_type is np.random.Generator:
+            return {"$": "numpy_random", "v": self.encode(value.bit_generator.state)}
+        raise TypeError(f"Can not snapshot value of type {value_type.__name__}: {value!r}")
+
+
+class _Decoder:
+    """Counterpart of _Encoder, instantiates only Parameterized classes and VALUE_CLASSES"""
+
+    def __init__(self, schema: dict, arrays: List[np.ndarray], externals: list = ()):
+        self.schema = schema
+        self.arrays = arrays
+        self.externals = externals
+        self.objects: list = [None] * int(schema["num_objects"])
+        self._classes = {
+            _class_name(cls): cls
+            for cls in (*_iter_subclasses(Parameterized), *VALUE_CLASSES)
+        }
+
+    def get_array(self, index, dtype=None) -> np.ndarray:
+        array = self.arrays[index]
+        if dtype is not None and array.dtype != dtype:
+            raise ValueError(f"Expected array of {dtype}, got {array.dtype}")
+        return array
+
+    def get_object(self, index, cls=EngineObject):
+        obj = self.objects[index]
+        if not isinstance(obj, cls):
+            raise ValueError(f"Expected {cls.__name__} at object index {index}, got {obj!r}")
+        return obj
+
+    def decode_objects(self):
+        groups = self.schema["groups"]
+        for group in groups:
+            cls = self._classes.get(group["class"])
+            if cls is None:
+                raise ValueError(f"Unknown object class '{group['class']}'")
+            for index in self.get_array(group["objects"]).tolist():
+                if self.objects[index] is not None:
+                    raise ValueError(f"Object index {index} is used twice")
+                self.objects[index] = cls.__new__(cls)
+        if any(obj is None for obj in self.objects):
+            raise ValueError("Not all objects are defined")
+
+        for group in groups:
+            self._decode_group(group)
+
+    def _decode_group(self, group: dict):
+        objects = [self.objects[i] for i in self.get_array(group["objects"]).tolist()]
+        cls = type(objects[0])
+        keys = list(group["columns"])
+        columns = [self._decode_column(column, len(objects)) for column in group["columns"].values()]
+        has_missing = any(column["kind"] in ("values", "indexed") for column in group["columns"].values())
+
+        if issubclass(cls, EngineObject):
+            transient = get_transient_attributes(cls)
+            custom_setstate = cls.__setstate__ is not EngineObject.__setstate__
+        else:
+            transient = dict()
+            custom_setstate = False
+        constants = {key: value for key, value in transient.items() if not callable(value)}
+        factories = [(key, value) for key, value in transient.items() if callable(value)]
+
+        for obj, values in zip(objects, zip(*columns) if columns else ((), ) * len(objects)):
+            state = dict(zip(keys, values))
+            if has_missing:
+                for key, value in tuple(state.items()):
+                    if value is _MISSING:
+                        del state[key]
+            if custom_setstate:
+                obj.__setstate__(state)
+                continue
+            state.update(constants)
+            for key, factory in factories:
+                state[key] = factory()
+            obj.__dict__ = state
+
+    def _decode_column(self, column: dict, size: int) -> list:
+        kind = column["kind"]
+        if kind == "const":
+            return [self.decode(column["value"])] * size
+        if kind == "empty":
+            if column["type"] == "dict":
+                return [dict() for _ in range(size)]
+            if column["type"] == "list":
+                return [[] for _ in range(size)]
+            raise ValueError(f"Unknown empty column type '{column['type']}'")
+        if kind == "values":
+            values = column["values"]
+            if len(values) != size:
+                raise ValueError("Column size does not match")
+            return [self.decode(v) for v in values]
+
+        array = self.get_array(column["array"])
+        if len(array) != size:
+            raise ValueError("Column size does not match")
+        if kind == "indexed":
+            values = column["values"]
+            return [self.decode(values[i]) for i in array.tolist()]
+        if kind == "array":
+            return array.tolist()
+        if kind == "vec2d":
+            return [Vec2d(x, y) for x, y in array.tolist()]
+        if kind == "tuple":
+            return list(map(tuple, array.tolist()))
+        if kind == "stacked":
+            return list(array)
+        if kind == "ref":
+            objects = self.objects
+            return [None if i < 0 else objects[i] for i in array.tolist()]
+        raise ValueError(f"Unknown column kind '{kind}'")
+
+    def decode(self, value):
+        if not isinstance(value, (dict, list)):
+            return value
+        if isinstance(value, list):
+            return [self.decode(v) for v in value]
+
+        tag = value["$"]
+        v = value.get("v")
+        if tag == "ref":
+            return self.objects[v]
+        if tag == "external":
+            return self.externals[v]
+        if tag == "vec2d":
+            return Vec2d(float(v[0]), float(v[1]))
+        if tag == "shape_filter":
+            return pymunk.ShapeFilter(group=v[0], categories=v[1], mask=v[2])
+        if tag == "tuple":
+            return tuple(self.decode(i) for i in v)
+        if tag == "dict":
+            return {self.decode(key): self.decode(item) for key, item in v}
+        if tag == "ordered_set":
+            return OrderedSet(self.decode(i) for i in v)
+        if tag == "set":
+            return set(self.decode(i) for i in v)
+        if tag == "deque":
+            return deque((self.decode(i) for i in v), maxlen=value["maxlen"])
+        if tag == "array":
+            return self.get_array(v)
+        if tag == "scalar":
+            return np.dtype(value["dtype"]).type(v)
+        if tag == "random":
+            rng = random.Random()
+            rng.setstate(self.decode(v))
+            return rng
+        if tag == "numpy_random":
+            state = self.decode(v)
+            if state["bit_generator"] not in _NUMPY_BIT_GENERATORS:
+                raise ValueError(f"Unknown bit generator '{state['bit_generator']}'")
+            bit_generator = getattr(np.random, state["bit_generator"])()
+            bit_generator.state = state
+            return np.random.Generator(bit_generator)
+        if tag == "missing":
+            return _MISSING
+        raise ValueError(f"Unknown value tag '{tag}'")
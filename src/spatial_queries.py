@@ -0,0 +1,170 @@
+import numpy as np
+
+
+# One row per query of SpatialQueries.ray_query() and point_query().
+# For ray queries, distance is the distance from the ray origin, for point queries
+# it's the signed distance to the nearest surface and position is the nearest surface point.
+# body_index is an index into SpatialQueries.bodies or -1
+RAY_RESULT_DTYPE = np.dtype([
+    ("hit", np.bool_),
+    ("position", np.float64, (2, )),
+    ("normal", np.float64, (2, )),
+    ("distance", np.float64),
+    ("body_index", np.int64),
+])
+
+
+class SpatialQueries:
+    """
+    Batched ray and point queries against the Engine's space.
+
+    Identical queries are answered from a cache which is valid until the next space step,
+    so many agents can query the same sensors each update. The containers, chunks and the
+    BodyPool also clear the cache when they add bodies to or remove them from the space.
+    Moving bodies without stepping the space (e.g. setting position) does not invalidate
+    the cache, call clear() then.
+
+    The cache is also used by the single queries of the Engine through cached(),
+    with the arguments quantized to `resolution`.
+
+    :param resolution: float, quantization of positions and directions in cache keys
+        of cached(), 0 disables caching of the single queries
+    """
+
+    _MISS = (False, (0., 0.), (0., 0.), np.inf, -1)
+
+    def __init__(self, engine, resolution=1e-4):
+        self.engine = engine
+        self.resolution = resolution
+        self.bodies = []
+        self._body_indices = dict()
+        self._cache = dict()
+        self._step_count = None
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+        }
+
+    def stats(self):
+        return {
+            **self._stats,
+            "cache_size": len(self._cache),
+        }
+
+    def clear(self):
+        if not self._cache and not self.bodies:
+            return
+        self.bodies = []
+        self._body_indices = dict()
+        self._cache = dict()
+
+    def cached(self, key, compute):
+        """
+        Returns the cached result for `key` or stores and returns the result of `compute()`.
+        Floats and vectors in the key should be quantized with quantize()
+        """
+        if not self.resolution:
+            return compute()
+        self._check_step()
+        if key in self._cache:
+            self._stats["hits"] += 1
+            return self._cache[key]
+        self._stats["misses"] += 1
+        result = self._cache[key] = compute()
+        return result
+
+    def quantize(self, vector):
+        """Returns the vector as tuple of ints in units of `resolution`"""
+        if not self.resolution:
+            return tuple(vector)
+        return tuple(int(round(v / self.resolution)) for v in vector)
+
+    def get_body(self, body_index):
+        """Returns the Body of a result row's body_index or None"""
+        if body_index < 0:
+            return None
+        return self.bodies[body_index]
+
+    def ray_query(self, origins, directions, max_distance=1e6, shape_filter=None):
+        """
+        Find the first surface along each ray
+        :param origins: array of shape (N, 2)
+        :param directions: normalized directions, array of shape (N, 2) or (2, )
+        :param max_distance: float, length of the rays
+        :param shape_filter: pymunk.ShapeFilter instance or None
+        :return: numpy array of shape (N, ) with dtype RAY_RESULT_DTYPE
+        """
+        self._check_step()
+        shape_filter = shape_filter or self.engine._empty_shape_filter
+        origins = np.asarray(origins, dtype=np.float64).reshape(-1, 2)
+        directions = np.broadcast_to(np.asarray(directions, dtype=np.float64), origins.shape)
+        ends = origins + directions * max_distance
+
+        space = self.engine.space
+        rows = []
+        for origin, end in zip(origins.tolist(), ends.tolist()):
+            key = ("ray", origin[0], origin[1], end[0], end[1], shape_filter)
+            row = self._cache.get(key)
+            if row is None:
+                hit = space.segment_query_first(origin, end, 0, shape_filter)
+                if hit and hit.shape:
+                    row = (
+                        True, tuple(hit.point), tuple(hit.normal),
+                        hit.alpha * max_distance, self._get_body_index(hit.shape._parent_body),
+                    )
+                else:
+                    row = self._MISS
+                self._cache[key] = row
+                self._stats["misses"] += 1
+            else:
+                self._stats["hits"] += 1
+            rows.append(row)
+
+        return np.array(rows, dtype=RAY_RESULT_DTYPE).reshape(-1)
+
+    def point_query(self, points, max_distance=0., shape_filter=None):
+        """
+        Find the nearest surface to each point
+        :param points: array of shape (N, 2)
+        :param max_distance: float, maximum distance of the surface
+        :param shape_filter: pymunk.ShapeFilter instance or None
+        :return: numpy array of shape (N, ) with dtype RAY_RESULT_DTYPE
+        """
+        self._check_step()
+        shape_filter = shape_filter or self.engine._empty_shape_filter
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+
+        space = self.engine.space
+        rows = []
+        for point in points.tolist():
+            key = ("point", point[0], point[1], max_distance, shape_filter)
+            row = self._cache.get(key)
+            if row is None:
+                hit = space.point_query_nearest(point, max_distance, shape_filter)
+                if hit and hit.shape:
+                    row = (
+                        True, tuple(hit.point), tuple(hit.gradient),
+                        hit.distance, self._get_body_index(hit.shape._parent_body),
+                    )
+                else:
+                    row = self._MISS
+                self._cache[key] = row
+                self._stats["misses"] += 1
+            else:
+                self._stats["hits"] += 1
+            rows.append(row)
+
+        return np.array(rows, dtype=RAY_RESULT_DTYPE).reshape(-1)
+
+    def _check_step(self):
+        if self._step_count != self.engine.step_count:
+            self._step_count = self.engine.step_count
+            self.clear()
+
+    def _get_body_index(self, body):
+        index = self._body_indices.get(body)
+        if index is None:
+            index = len(self.bodies)
+            self.bodies.append(body)
+            self._body_indices[body] = index
+        return index
@@ -0,0 +1,151 @@
+import math
+
+from .parameterized import Parameterized
+
+
+class SubstepPolicy(Parameterized):
+    """
+    Decides how many pymunk steps are done per Engine.update
+    and how often the container tree is updated in between.
+
+    :param container_update_interval: int,
+        update containers every N substeps, or once per frame if 0.
+        The containers are always updated after the last substep
+    """
+
+    def __init__(self, container_update_interval=1):
+        super().__init__()
+        self.container_update_interval = container_update_interval
+
+    def to_dict(self):
+        return {
+            **super().to_dict(),
+            "container_update_interval": self.container_update_interval,
+        }
+
+    def num_substeps(self, engine, dt):
+        raise NotImplementedError
+
+    def is_container_update(self, substep, num_substeps):
+        """Returns True if containers should be updated after the substep with index `substep`"""
+        if substep == num_substeps - 1:
+            return True
+        interval = self.container_update_interval
+        return bool(interval) and (substep + 1) % interval == 0
+
+    @classmethod
+    def from_string(cls, s):
+        """
+        Create a policy from a short description like
+
+            fixed:10
+            max-dt:0.002
+            adaptive
+
+        optionally followed by the container update interval, e.g. "fixed:10/0"
+        """
+        s, _, interval = s.partition("/")
+        name, _, value = s.partition(":")
+        kwargs = dict()
+        if interval:
+            kwargs["container_update_interval"] = int(interval)
+        if name == "fixed":
+            if value:
+                kwargs["num"] = int(value)
+            return FixedSubsteps(**kwargs)
+        if name == "max-dt":
+            if value:
+                kwargs["max_dt"] = float(value)
+            return MaxSubstepDt(**kwargs)
+        if name == "adaptive":
+            if value:
+                kwargs["max_substeps"] = int(value)
+            return AdaptiveSubsteps(**kwargs)
+        raise ValueError(f"Unknown substep policy '{name}'")
+
+
+class FixedSubsteps(SubstepPolicy):
+    """Always the same number of substeps"""
+
+    def __init__(self, num=10, **parameters):
+        super().__init__(**parameters)
+        self.num = num
+
+    def to_dict(self):
+        return {
+            **super().to_dict(),
+            "num": self.num,
+        }
+
+    def num_substeps(self, engine, dt):
+        return self.num
+
+
+class MaxSubstepDt(SubstepPolicy):
+    """As many substeps as needed to keep each one below max_dt"""
+
+    def __init__(self, max_dt=1. / 600., max_substeps=50, **parameters):
+        super().__init__(**parameters)
+        self.max_dt = max_dt
+        self.max_substeps = max_substeps
+
+    def to_dict(self):
+        return {
+            **super().to_dict(),
+            "max_dt": self.max_dt,
+            "max_substeps": self.max_substeps,
+        }
+
+    def num_substeps(self, engine, dt):
+        return max(1, min(self.max_substeps, math.ceil(dt / self.max_dt - 1e-9)))
+
+
+class AdaptiveSubsteps(SubstepPolicy):
+    """
+    Few substeps for an idle scene, more when things move fast or constraints are stressed.
+
+    :param max_travel: float, maximum distance the fastest body should move per substep
+    :param max_impulse: float, maximum constraint impulse per substep,
+        the number of substeps is raised proportionally when exceeded
+    """
+
+    def __init__(
+            self,
+            min_substeps=2,
+            max_substeps=20,
+            max_travel=.1,
+            max_impulse=100.,
+            **parameters
+    ):
+        super().__init__(**parameters)
+        self.min_substeps = min_substeps
+        self.max_substeps = max_substeps
+        self.max_travel = max_travel
+        self.max_impulse = max_impulse
+
+    def to_dict(self):
+        return {
+            **super().to_dict(),
+            "min_substeps": self.min_substeps,
+            "max_substeps": self.max_substeps,
+            "max_travel": self.max_travel,
+            "max_impulse": self.max_impulse,
+        }
+
+    def num_substeps(self, engine, dt):
+        peak_velocity = 0.
+        for body in engine.space.bodies:
+            velocity = body.velocity.get_length_sqrd()
+            if velocity > peak_velocity:
+                peak_velocity = velocity
+        peak_velocity = math.sqrt(peak_velocity)
+
+        peak_impulse = 0.
+        for constraint in engine.space.constraints:
+            peak_impulse = max(peak_impulse, abs(constraint.impulse))
+
+        num = math.ceil(peak_velocity * dt / self.max_travel)
+        if peak_impulse > self.max_impulse and engine.num_substeps:
+            num = max(num, math.ceil(engine.num_substeps * peak_impulse / self.max_impulse))
+
+        return max(self.min_substeps, min(self.max_substeps, num))
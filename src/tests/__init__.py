@@ -1,4 +1,22 @@
+import os
+
+import pyglet
+
+# the render tests need an OpenGL context, use an offscreen one without display
+if not os.environ.get("DISPLAY"):
+    pyglet.options["headless"] = True
+
+from .test_chunks import *
+from .test_collisions import *
 from .test_container import *
 from .test_engine_trace import *
+from .test_headless import *
 from .test_image_gen import *
+from .test_images import *
+from .test_particles import *
+from .test_pool import *
+from .test_queries import *
 from .test_random import *
+from .test_renderer import *
+from .test_replay import *
+from .test_snapshot import *
@@ -0,0 +1,171 @@
+import unittest
+
+from ..engine import Engine
+from ..objects.chunks import ChunkedWorld
+from ..objects.primitives import Box
+from ..objects.constraints import FixedJoint
+
+
+class TestChunks(unittest.TestCase):
+
+    def test_chunk_streaming(self):
+        engine = Engine(headless=True)
+        engine.space.gravity = (0, 0)
+        world = engine.add_container(ChunkedWorld(chunk_size=10, active_radius=1, update_interval=1))
+        world.focus_position = (0, 0)
+
+        near_box = world.add_body(Box((5, 5), (.5, .5)))
+        far_box_a = world.add_body(Box((44, 5), (.5, .5), density=1, velocity=(3, 0)))
+        far_box_b = world.add_body(Box((46, 5), (.5, .5), density=1, velocity=(3, 0)))
+        joint = world.add_constraint(FixedJoint(far_box_a, far_box_b, (.5, 0), (-.5, 0)))
+        engine.update(1/60)
+
+        # the objects of the inactive chunk are packed
+        self.assertEqual(2, len(world.chunks))
+        far_chunk = world.get_chunk(world.chunk_key((45, 5)), create=False)
+        self.assertEqual(2, far_chunk.num_packed_bodies)
+        self.assertEqual({far_box_a.id, far_box_b.id, joint.id}, set(far_chunk.iter_packed_ids()))
+        self.assertFalse(far_chunk.bodies)
+        self.assertIsNone(far_box_a.engine)
+        self.assertEqual(1, len(engine.space.bodies))
+
+        world.focus_position = (45, 0)
+        engine.update(1/60)
+        self.assertEqual(2, len(engine.space.bodies))
+        self.assertEqual(1, len(engine.space.constraints))
+        self.assertEqual(1, world.get_chunk(world.chunk_key((5, 5))).num_packed_bodies)
+        box_a = world.find_body(far_box_a.id)
+        self.assertIsNot(far_box_a, box_a)
+        self.assertAlmostEqual(3, box_a.velocity.x)
+        joint = next(iter(far_chunk.constraints))
+        self.assertIs(box_a, joint.a)
+        self.assertIs(box_a._body, joint._constraint.a)
+        joint.distance = 1.2
+
+        for i in range(10):
+            engine.update(1/60)
+
+        # state is kept while inactive
+        world.focus_position = (0, 0)
+        engine.update(1/60)
+        self.assertEqual(2, far_chunk.num_packed_bodies)
+        self.assertEqual(0, len(engine.space.constraints))
+        position, velocity = box_a.position, box_a.velocity
+        self.assertGreater(position.x, 44)
+        engine.update(1/60)
+
+        world.focus_position = (45, 0)
+        world.update_chunks()
+        self.assertEqual(1, len(engine.space.constraints))
+        box_a = world.find_body(far_box_a.id)
+        self.assertEqual((position, velocity), (box_a.position, box_a.velocity))
+        self.assertAlmostEqual(1.2, next(iter(far_chunk.constraints)).distance)
+
+    def test_packed_state(self):
+        engine = Engine(headless=True)
+        world = engine.add_container(ChunkedWorld(chunk_size=10, active_radius=0, update_interval=1))
+        world.focus_position = (-100, 0)
+        bodies = [
+            world.add_body(Box((x, 5), (.5, .5), density=1, user_data={"type": "box"}))
+            for x in range(1, 9, 2)
+        ]
+        bodies.append(world.add_body(Box((9, 5), (.5, .2), density=2, user_data={"type": "stone"})))
+        engine.update(1/60)
+        chunk = world.get_chunk((0, 0), create=False)
+        self.assertEqual(5, chunk.num_packed_bodies)
+
+        world.focus_position = (5, 5)
+        world.update_chunks()
+        unpacked = [world.find_body(body.id) for body in bodies]
+        self.assertEqual(
+            [(b.user_data, b.extent, b.density) for b in bodies],
+            [(b.user_data, b.extent, b.density) for b in unpacked],
+        )
+        self.assertIsNot(unpacked[0].user_data, unpacked[1].user_data)
+        self.assertIs(chunk, unpacked[0]._parent_container)
+
+        # objects with values that can not be packed are kept
+        unpacked[0].add_callback("remove_body", lambda body: None)
+        world.focus_position = (-100, 0)
+        world.update_chunks()
+        self.assertEqual(0, chunk.num_packed_bodies)
+        self.assertIn(unpacked[0], chunk.bodies)
+
+    def test_bodies_move_between_chunks(self):
+        engine = Engine(headless=True)
+        engine.space.gravity = (0, 0)
+        world = engine.add_container(ChunkedWorld(chunk_size=10, active_radius=1, update_interval=1))
+        world.focus_position = (0, 0)
+
+        box = world.add_body(Box((5, 5), (.5, .5), density=1, velocity=(60, 0)))
+        start_chunk = box._parent_container
+        for i in range(30):
+            engine.update(1/60)
+
+        # left the active area and was frozen and packed by it's new chunk
+        chunk = world.get_chunk(world.chunk_key(box.position), create=False)
+        self.assertIsNot(start_chunk, chunk)
+        self.assertFalse(chunk.active)
+        self.assertEqual([box.id], list(chunk.iter_packed_ids()))
+        self.assertNotIn(box, start_chunk.bodies)
+        self.assertIsNone(box._body)
+
+        world.focus_position = box.position
+        engine.update(1/60)
+        self.assertAlmostEqual(60, world.find_body(box.id).velocity.x)
+
+    def test_constraint_between_chunks(self):
+        engine = Engine(headless=True)
+        engine.space.gravity = (0, 0)
+        world = engine.add_container(ChunkedWorld(chunk_size=10, active_radius=0, update_interval=1))
+        world.focus_position = (5, 5)
+
+        box_a = world.add_body(Box((9, 5), (.5, .5), density=1))
+        box_b = world.add_body(Box((11, 5), (.5, .5), density=1))
+        joint = world.add_constraint(FixedJoint(box_a, box_b, (.5, 0), (-.5, 0)))
+        engine.update(1/60)
+        self.assertIsNot(box_a._parent_container, box_b._parent_container)
+        self.assertIn(joint, box_a._parent_container.constraints)
+        self.assertIsNone(box_b._body)
+        self.assertIsNone(joint._constraint)
+
+        # activating the chunk of the second body creates the joint
+        world.focus_position = (15, 5)
+        engine.update(1/60)
+        self.assertTrue(box_a._parent_container.active)
+        self.assertEqual(1, len(engine.space.constraints))
+        joint.distance = 1.5
+
+        # deactivating the chunk of the joint's first body destroys it, the second body stays active
+        world.focus_position = (25, 5)
+        engine.update(1/60)
+        self.assertFalse(box_a._parent_container.active)
+        self.assertIsNotNone(box_b._body)
+        self.assertIsNone(joint._constraint)
+        self.assertEqual(0, len(engine.space.constraints))
+
+        world.focus_position = (5, 5)
+        engine.update(1/60)
+        self.assertEqual(1, len(engine.space.constraints))
+        self.assertIs(box_a._body, joint._constraint.a)
+        self.assertIs(box_b._body, joint._constraint.b)
+        # the pymunk-only state is kept
+        self.assertAlmostEqual(1.5, joint.distance)
+
+        # and the same for the chunk of the second body
+        world.focus_position = (-5, 5)
+        engine.update(1/60)
+        self.assertFalse(box_b._parent_container.active)
+        self.assertIsNotNone(box_a._body)
+        self.assertEqual(0, len(engine.space.constraints))
+
+        world.focus_position = (15, 5)
+        engine.update(1/60)
+        self.assertEqual(1, len(engine.space.constraints))
+        self.assertAlmostEqual(1.5, joint.distance)
+        # the bodies of a constraint between chunks are not packed
+        self.assertEqual(0, box_a._parent_container.num_packed_bodies)
+
+
+if __name__ == '__main__':
+    unittest.main()
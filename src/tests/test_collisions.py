@@ -0,0 +1,208 @@
+import gc
+import unittest
+import weakref
+
+import numpy as np
+
+from ..engine import Engine
+from ..objects.body import Body
+from ..objects.container import ObjectContainer
+from ..objects.primitives import Box
+
+
+class ListeningBox(Box):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.collisions = []
+
+    def on_collision(self, body, arbiter):
+        self.collisions.append(body)
+        return True
+
+
+class ListeningContainer(ObjectContainer):
+
+    def __init__(self, **parameters):
+        super().__init__(**parameters)
+        self.collisions = []
+
+    def on_collision(self, a, b, arbiter):
+        self.collisions.append((a, b))
+        return True
+
+
+class ContactBox(Box):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.events = []
+
+    def on_contact_begin(self, body, arbiter):
+        self.events.append(("begin", body))
+
+    def on_contact_persist(self, body):
+        self.events.append(("persist", body))
+
+    def on_contact_end(self, body):
+        self.events.append(("end", body))
+
+
+class EventContainer(ObjectContainer):
+
+    def __init__(self, **parameters):
+        super().__init__(**parameters)
+        self.frames = []
+
+    def on_collision_events(self, events):
+        self.frames.append((events.arrays.copy(), list(events.bodies)))
+
+
+class TestCollisions(unittest.TestCase):
+
+    def test_collision_types(self):
+        engine = Engine(headless=True)
+        ground = engine.add_body(Box((0, -1), (20, 1)))
+        box = engine.add_body(Box((-5, 1), (.5, .5), density=1))
+        flagged_box = engine.add_body(Box((0, 1), (.5, .5), density=1, collision_listener=True))
+        listening_box = engine.add_body(ListeningBox((5, 1), (.5, .5), density=1))
+        container = engine.add_container(ListeningContainer())
+        contained_box = container.add_body(Box((10, 1), (.5, .5), density=1))
+
+        for i in range(60):
+            engine.update(1/60)
+
+        self.assertEqual(Body.DEFAULT_COLLISION_TYPE, ground._shapes[0].collision_type)
+        self.assertEqual(Body.DEFAULT_COLLISION_TYPE, box._shapes[0].collision_type)
+        for body in (flagged_box, listening_box, contained_box):
+            self.assertEqual(Body.LISTENER_COLLISION_TYPE, body._shapes[0].collision_type)
+
+        self.assertEqual({ground}, set(listening_box.collisions))
+        self.assertEqual({(contained_box, ground)}, set(
+            (a, b) if a is contained_box else (b, a) for a, b in container.collisions
+        ))
+
+    def test_collision_type_of_moved_bodies(self):
+        engine = Engine(headless=True)
+        container = engine.add_container(ListeningContainer())
+        pool = engine.body_pool
+        box = pool.acquire(container, Box, position=(0, 0), extent=(.5, .5), density=1)
+        engine.update(1/60)
+        self.assertEqual(Body.LISTENER_COLLISION_TYPE, box._shapes[0].collision_type)
+
+        # revived into a container without listener
+        pool.release(box)
+        self.assertIs(box, pool.acquire(engine.container, Box, position=(0, 0), extent=(.5, .5), density=1))
+        self.assertEqual(Body.DEFAULT_COLLISION_TYPE, box._shapes[0].collision_type)
+
+        pool.release(box)
+        self.assertIs(box, pool.acquire(container, Box, position=(0, 0), extent=(.5, .5), density=1))
+        self.assertEqual(Body.LISTENER_COLLISION_TYPE, box._shapes[0].collision_type)
+
+    def test_contact_events(self):
+        engine = Engine(headless=True)
+        ground = engine.add_body(Box((0, -1), (20, 1)))
+        box = engine.add_body(ContactBox((0, 0.01), (.5, .5), density=1))
+        engine.update(1/60)
+        self.assertEqual(Body.LISTENER_COLLISION_TYPE, box._shapes[0].collision_type)
+        # one begin although there were 10 substeps
+        self.assertEqual([("begin", ground)], box.events)
+        self.assertEqual(1, len(engine.contacts))
+
+        for i in range(5):
+            engine.update(1/60)
+        # one persist per update
+        self.assertEqual([("begin", ground)] + [("persist", ground)] * 5, box.events)
+
+        box.events.clear()
+        box.position = (0, 10)
+        for i in range(5):
+            engine.update(1/60)
+        self.assertEqual([("end", ground)], box.events)
+        self.assertEqual(0, len(engine.contacts))
+        self.assertEqual({"begun": 1, "ended": 1, "num_contacts": 0}, engine.contacts.stats())
+
+    def test_contacts_released_on_remove(self):
+        engine = Engine(headless=True)
+        ground = engine.add_body(Box((0, -1), (20, 1)))
+        boxes = [
+            engine.add_body(ContactBox((x, 0.01), (.5, .5), density=1))
+            for x in range(-5, 6, 2)
+        ]
+        for i in range(3):
+            engine.update(1/60)
+        self.assertEqual(len(boxes), len(engine.contacts))
+
+        ref = weakref.ref(boxes[0])
+        for box in boxes:
+            box.remove()
+        engine.update(1/60)
+        self.assertEqual(0, len(engine.contacts))
+        self.assertEqual(("end", ground), boxes[0].events[-1])
+
+        boxes.clear()
+        gc.collect()
+        self.assertIsNone(ref())
+
+    def test_collision_events(self):
+        engine = Engine(headless=True)
+        ground = engine.add_body(Box((0, -1), (20, 1)))
+        container = engine.add_container(EventContainer())
+        boxes = [container.add_body(Box((x, 0.01), (.5, .5), density=1)) for x in (-2, 2)]
+        for i in range(30):
+            engine.update(1/60)
+        for box in boxes:
+            self.assertEqual(Body.LISTENER_COLLISION_TYPE, box._shapes[0].collision_type)
+
+        # one call per update with one row per touching pair
+        self.assertEqual(30, len(container.frames))
+        arrays, bodies = container.frames[-1]
+        self.assertEqual(2, len(arrays))
+        self.assertEqual(
+            {(box, ground) for box in boxes},
+            {
+                (bodies[a], bodies[b]) if bodies[b] is ground else (bodies[b], bodies[a])
+                for a, b in zip(arrays["body_a"], arrays["body_b"])
+            }
+        )
+        # resting boxes: the impulses of all substeps add up to the weight times the frame time
+        np.testing.assert_allclose(
+            np.abs(arrays["impulse"][:, 1]), [b.mass * 10. / 60. for b in boxes], rtol=.05,
+        )
+        # the peak impulse is the one of a single substep
+        num_substeps = engine.substep_policy.num
+        np.testing.assert_allclose(
+            np.abs(arrays["peak_impulse"][:, 1]) * num_substeps, np.abs(arrays["impulse"][:, 1]), rtol=.1,
+        )
+        # contact points are on the bottom of the boxes
+        np.testing.assert_allclose(arrays["point"][:, 1], boxes[0].position.y - .5, atol=.01)
+        self.assertEqual(0, len(engine.collision_events))
+
+    def test_nested_listeners(self):
+        engine = Engine(headless=True)
+        ground = engine.add_body(Box((0, -1), (20, 1)))
+        outer = engine.add_container(EventContainer())
+        listening = outer.add_container(ListeningContainer())
+        inner = listening.add_container(ObjectContainer())
+        box = inner.add_body(Box((0, 0.01), (.5, .5), density=1))
+        for i in range(3):
+            engine.update(1/60)
+
+        self.assertEqual([listening, outer], list(box.iter_listening_containers()))
+        self.assertEqual(Body.LISTENER_COLLISION_TYPE, box._shapes[0].collision_type)
+        self.assertEqual(3, len(outer.frames))
+        self.assertIn(box, outer.frames[-1][1])
+        self.assertEqual([(box, ground)], [
+            (a, b) if a is box else (b, a) for a, b in listening.collisions
+        ])
+
+    def test_collision_events_grow(self):
+        engine = Engine(headless=True)
+        engine.collision_events.buffer = engine.collision_events.buffer[:1]
+        engine.add_body(Box((0, -1), (20, 1)))
+        container = engine.add_container(EventContainer())
+        for x in range(-5, 6, 2):
+            container.add_body(Box((x, 0.01), (.5, .5), density=1))
+        engine.update(1/60)
+        self.assertEqual(6, len(container.frames[-1][0]))
+        self.assertLessEqual(6, engine.collision_events.capacity)
@@ -1,13 +1,27 @@
+import gc
 import unittest
 
 from ..engine import Engine
 from ..objects.container import ObjectContainer
-from ..objects.primitives import Box
+from ..objects.primitives import Box, Circle
+from ..objects.constraints import FixedJoint
+from ..agents.lemming import Lemming
 from ..objects.graphical import GraphicSettings
+from ..util.timer import Timer
 
 sprite_settings = GraphicSettings(draw_sprite=True, image_name="gen/")
 
 
+class UpdatedBox(Box):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.num_updates = 0
+
+    def update(self, dt):
+        super().update(dt)
+        self.num_updates += 1
+
+
 class TestContainer(unittest.TestCase):
 
     def assertHasPhysicsBody(self, *objects, assert_true=True):
@@ -57,6 +71,143 @@ class TestContainer(unittest.TestCase):
 
         self.assertEqual(1, len(engine.space.bodies))
 
+    def test_nested_removal(self):
+        engine = Engine(headless=True)
+        cont_a = engine.add_container(ObjectContainer())
+        cont_b = engine.add_container(ObjectContainer())
+        sub_cont = cont_a.add_container(ObjectContainer())
+        box_a = sub_cont.add_body(Box((0, 0), (1, 1)))
+        box_b = cont_b.add_body(Box((10, 0), (1, 1)))
+        engine.update(1/60)
+
+        # only the owning tree can remove the body
+        with self.assertRaises(ValueError):
+            cont_b.remove_body(box_a)
+        with self.assertRaises(ValueError):
+            sub_cont.remove_body(box_b)
+
+        engine.remove_body(box_a)
+        cont_a.remove_container(sub_cont)
+        engine.update(1/60)
+        self.assertNotIn(box_a, sub_cont.bodies)
+        self.assertNotIn(sub_cont, cont_a.containers)
+        self.assertEqual(1, len(engine.space.bodies))
+
+        ObjectContainer.VALIDATE_REMOVAL = True
+        try:
+            # a stale parent pointer is repaired by the recursive search
+            box_b._parent_container = cont_a
+            engine.remove_body(box_b)
+            engine.update(1/60)
+            self.assertEqual(0, len(engine.space.bodies))
+        finally:
+            ObjectContainer.VALIDATE_REMOVAL = False
+
+    def test_iteration_cache(self):
+        engine = Engine(headless=True)
+        container = engine.add_container(ObjectContainer())
+        box_a = container.add_body(Box((0, 0), (1, 1)))
+        box_b = container.add_body(Box((2, 0), (1, 1), density=1))
+        box_c = container.add_body(Box((20, 0), (1, 1), density=1, velocity=(10, 0)))
+        joint = container.add_constraint(FixedJoint(box_a, box_b, (1, 0), (-1, 0)))
+        lemming = container.add_container(Lemming((5, 0)))
+        engine.update(1/60)
+
+        # plain bodies and unbreakable constraints are skipped
+        self.assertEqual([lemming], list(container.iter_physics()))
+        self.assertEqual([box_a, box_b, box_c, joint, lemming], list(container.iter_graphics()))
+        # start velocity is applied on physics creation
+        self.assertAlmostEqual(10, box_c.velocity.x)
+
+        joint.breaking_impulse = 100
+        self.assertEqual([joint, lemming], list(container.iter_physics()))
+
+        engine.remove_container(lemming)
+        engine.update(1/60)
+        self.assertEqual([joint], list(container.iter_physics()))
+
+    def test_sleeping(self):
+        engine = Engine(headless=True)
+        ground = engine.add_body(Box((0, -1), (10, 1)))
+        box_a = engine.add_body(UpdatedBox((0, .5), (.5, .5), density=1))
+        box_b = engine.add_body(Box((1, .5), (.5, .5), density=1))
+        joint = engine.add_constraint(FixedJoint(box_a, box_b, (.5, 0), (-.5, 0), breaking_impulse=1000))
+
+        engine.update(1/60)
+        self.assertTrue(ground.is_sleeping())
+        self.assertFalse(joint.is_sleeping())
+        self.assertIn(box_a, list(engine.container.iter_active_physics()))
+
+        for i in range(120):
+            engine.update(1/60)
+        self.assertTrue(box_a.is_sleeping())
+        self.assertTrue(joint.is_sleeping())
+        self.assertIn(box_a, list(engine.container.iter_physics()))
+        self.assertNotIn(box_a, list(engine.container.iter_active_physics()))
+        # breakable constraints are updated while sleeping
+        self.assertIn(joint, list(engine.container.iter_active_physics()))
+
+        # woken by pymunk through the joint, updated in the same step without a sleep check
+        num_updates = box_a.num_updates
+        engine.phase_timings.enabled = True
+        box_b.velocity = (0, 5)
+        engine.update(1/60)
+        self.assertFalse(box_a.is_sleeping())
+        self.assertEqual(
+            engine.phase_timings.counts["container_update"],
+            box_a.num_updates - num_updates,
+        )
+        self.assertIn(box_a, list(engine.container.iter_active_physics()))
+
+    def test_sleeping_joint_breaks(self):
+        engine = Engine(headless=True)
+        engine.add_body(Box((0, -1), (10, 1)))
+        box_a = engine.add_body(Box((0, .5), (.5, .5), density=1))
+        box_b = engine.add_body(Box((1, .5), (.5, .5), density=1))
+        joint = engine.add_constraint(FixedJoint(box_a, box_b, (.5, 0), (-.5, 0), breaking_impulse=100))
+        for i in range(120):
+            engine.update(1/60)
+        self.assertTrue(joint.is_sleeping())
+
+        # the hit wakes the joint and the breaking impulse is only seen in that update
+        bullet = engine.add_body(Circle((-3, .5), .2, density=50))
+        bullet.velocity = (60, 0)
+        for i in range(5):
+            engine.update(1/60)
+        self.assertIsNone(joint.engine)
+        self.assertNotIn(joint, engine.container.constraints)
+
+    def test_mass_removal_timing(self):
+        """Removing all bodies of a container should scale linearly"""
+        timings = []
+        for num_bodies in (2500, 10000):
+            engine = Engine(headless=True)
+            container = engine.add_container(ObjectContainer())
+            bodies = [
+                container.add_body(Box((i % 100, i // 100), (.5, .5)))
+                for i in range(num_bodies)
+            ]
+            engine.update(1/60)
+            self.assertEqual(num_bodies, len(container.bodies))
+
+            gc.collect()
+            gc.disable()
+            try:
+                with Timer(num_bodies) as timer:
+                    for body in bodies:
+                        engine.remove_body(body)
+                    container.update(1/60)
+            finally:
+                gc.enable()
+            timer.print(f"removing {num_bodies} bodies")
+            timings.append(timer.length)
+
+            self.assertEqual(0, len(container.bodies))
+            self.assertEqual(0, len(engine.space.bodies))
+
+        # 4 times the bodies, quadratic would be 16 times the duration
+        self.assertLess(timings[1] / timings[0], 8.)
+
 
 if __name__ == '__main__':
     unittest.main()
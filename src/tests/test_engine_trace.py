@@ -5,6 +5,7 @@ from ..engine import Engine
 from ..objects.container import ObjectContainer
 from ..objects.primitives import Box, Circle
 from ..objects.graphical import GraphicSettings
+from ..util.timer import Timer
 
 
 class TestEngine(unittest.TestCase):
@@ -31,10 +32,11 @@ class TestEngine(unittest.TestCase):
         obj_2 = engine.add_body(Circle((10, 0), 5))
         engine.update(1/60)
 
-        self.assertTrace(engine.trace((-10, 0), (1, 0)), body=obj_1)
-        self.assertTrace(engine.trace((-10, 0.9), (1, 0)), body=obj_1)
-        self.assertTrace(engine.trace((-10, 2), (1, 0)), body=obj_2)
-        self.assertIsNone(engine.trace((-10, 10), (1, 0)))
+        for mode in ("segment", "sdf"):
+            self.assertTrace(engine.trace((-10, 0), (1, 0), mode=mode), body=obj_1)
+            self.assertTrace(engine.trace((-10, 0.9), (1, 0), mode=mode), body=obj_1)
+            self.assertTrace(engine.trace((-10, 2), (1, 0), mode=mode), body=obj_2)
+            self.assertIsNone(engine.trace((-10, 10), (1, 0), mode=mode))
 
     def test_trace_box(self):
         engine = Engine()
@@ -42,8 +44,47 @@ class TestEngine(unittest.TestCase):
         obj_2 = engine.add_body(Box((0, 10), (1, 1), angle=math.radians(45)))
         engine.update(1/60)
 
-        self.assertTrace(engine.trace((-10, 0), (1, 0)), body=obj_1, position=(-1, .98))
-        self.assertTrace(engine.trace((-10, 10.707), (1, 0)), body=obj_2, position=(-.707, 10.707))
+        for mode in ("segment", "sdf"):
+            self.assertTrace(engine.trace((-10, 0), (1, 0), mode=mode), body=obj_1, position=(-1, .98))
+            self.assertTrace(engine.trace((-10, 10.707), (1, 0), mode=mode), body=obj_2, position=(-.707, 10.707))
+
+        hit = engine.trace((-10, 0), (1, 0), mode="segment")
+        self.assertAlmostEqual(9., hit.distance)
+        self.assertEqual((-1, 0), tuple(hit.gradient))
+
+        # the default mode is raymarching, distance is the remaining distance to the surface
+        self.assertEqual("sdf", engine.trace_mode)
+        hit = engine.trace((-10, 0), (1, 0))
+        self.assertLessEqual(hit.distance, 0.001)
+        self.assertAlmostEqual(-1., hit.position.x, places=2)
+
+    def test_trace_all(self):
+        engine = Engine()
+        obj_1 = engine.add_body(Circle((0, 0), 1))
+        obj_2 = engine.add_body(Circle((10, 0), 5))
+        engine.update(1/60)
+
+        hits = engine.trace_all((-10, 0), (1, 0), max_distance=100)
+        self.assertEqual([obj_1, obj_2], [hit.body for hit in hits])
+        self.assertAlmostEqual(9., hits[0].distance)
+        self.assertAlmostEqual(15., hits[1].distance)
+        self.assertEqual([obj_1], [hit.body for hit in engine.trace_all((-10, 0), (1, 0), max_distance=12)])
+
+    def test_trace_timing(self):
+        engine = Engine(headless=True)
+        for i in range(100):
+            engine.add_body(Box((i * 3, 0), (1, 1)))
+        engine.update(1/60)
+        engine.queries.resolution = 0
+
+        for mode in ("segment", "sdf"):
+            # straight hits and grazing rays along the tops of the boxes
+            rays = [((-10, 0), (1, 0)), ((-10, 1.01), (1, 0)), ((-10, 3), (.99, -.14))]
+            with Timer(len(rays) * 100) as timer:
+                for i in range(100):
+                    for position, direction in rays:
+                        engine.trace(position, direction, max_distance=1000, mode=mode)
+            timer.print(f"trace mode {mode}")
 
 
 if __name__ == '__main__':
@@ -0,0 +1,78 @@
+import unittest
+
+from ..engine import Engine
+from ..objects.primitives import Circle
+from ..headless import HeadlessRunner
+from ..substeps import SubstepPolicy, FixedSubsteps, MaxSubstepDt, AdaptiveSubsteps
+
+
+class TestHeadless(unittest.TestCase):
+
+    def test_headless_run(self):
+        runner = HeadlessRunner(map_name="bd")
+        runner.run(num_steps=10)
+
+        self.assertIsNone(runner.engine.renderer)
+        self.assertEqual(10, runner.num_steps)
+        self.assertAlmostEqual(10 / 60., runner.simulated_time)
+        self.assertGreater(len(runner.engine.space.bodies), 0)
+        self.assertIn("space_step", runner.engine.phase_timings.seconds)
+
+        containers = [runner.engine.container]
+        while containers:
+            container = containers.pop()
+            containers += container.containers
+            self.assertEqual(0, len(container._graphics_to_create))
+            for body in container.bodies:
+                self.assertEqual([], body._graphics)
+
+        runner.print_report()
+
+    def test_substep_policies(self):
+        for policy_str, policy_class in (
+                ("fixed:5/0", FixedSubsteps),
+                ("max-dt:0.004/2", MaxSubstepDt),
+                ("adaptive", AdaptiveSubsteps),
+        ):
+            policy = SubstepPolicy.from_string(policy_str)
+            self.assertIsInstance(policy, policy_class)
+
+            runner = HeadlessRunner(map_name="gen2", substep_policy=policy)
+            runner.run(num_steps=10)
+            engine = runner.engine
+            print(policy, "substeps:", engine.num_substeps)
+
+            self.assertAlmostEqual(1 / 60., engine.num_substeps * engine.substep_dt)
+            num_container_updates = engine.phase_timings.counts["container_update"]
+            if policy_str == "fixed:5/0":
+                self.assertEqual(5, engine.num_substeps)
+                self.assertEqual(10, num_container_updates)
+            elif policy_str == "max-dt:0.004/2":
+                self.assertEqual(5, engine.num_substeps)
+                # after substep 2, 4 and the last one
+                self.assertEqual(30, num_container_updates)
+            else:
+                self.assertLessEqual(policy.min_substeps, engine.num_substeps)
+                self.assertGreaterEqual(policy.max_substeps, engine.num_substeps)
+
+    def test_advance(self):
+        engine = Engine(headless=True)
+        body = engine.add_body(Circle((0, 10), 1, density=1))
+
+        self.assertEqual(2, engine.advance(2.5 / 60.))
+        self.assertAlmostEqual(.5, engine.interpolation_alpha)
+        self.assertAlmostEqual(2 / 60., engine.time)
+
+        previous_position, previous_angle = engine.get_previous_transform(body.body)
+        position, angle = body.get_render_transform()
+        self.assertLess(body.position.y, position.y)
+        self.assertLess(position.y, previous_position.y)
+
+        # slow frame is capped
+        self.assertEqual(engine.max_steps_per_frame, engine.advance(1.))
+        self.assertGreater(engine.num_dropped_steps, 0)
+        self.assertLessEqual(engine.interpolation_alpha, 1.)
+
+
+if __name__ == '__main__':
+    unittest.main()
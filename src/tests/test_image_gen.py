@@ -1,6 +1,9 @@
 import unittest
 
+import numpy as np
+
 from ..image_gen import ImageGenerator, ImageGeneratorSettings, RGBAImage
+from ..util.timer import Timer
 
 
 class TestImageGen(unittest.TestCase):
@@ -25,6 +28,47 @@ class TestImageGen(unittest.TestCase):
         )
         print(settings)
 
+    def test_uri_round_trip(self):
+        settings = ImageGeneratorSettings(
+            shape="ngon", size=(16, 8), color=(.5, .5, .5), segments=5, gradient=.3, noise=.2, seed=3,
+        )
+        uri = settings.to_uri()
+        self.assertEqual(uri, ImageGeneratorSettings.from_uri(uri).to_uri())
+
+    def test_masks(self):
+        im = RGBAImage((17, 9))
+        for name, mask in (
+                ("circle", im.circle_mask()),
+                ("rect_bevel", im.rect_bevel_mask()),
+                ("ngon", im.ngon_mask(5)),
+                ("gradient", im.gradient_mask()),
+                ("radial_gradient", im.radial_gradient_mask()),
+                ("noise", im.noise_mask()),
+        ):
+            self.assertEqual((9, 17, 1), mask.shape, name)
+
+        circle = im.circle_mask()[:, :, 0]
+        self.assertEqual(1., circle[4, 8])
+        self.assertEqual(0., circle[0, 0])
+        gradient = im.gradient_mask()[:, :, 0]
+        np.testing.assert_almost_equal(np.linspace(0, 1, 9), gradient[:, 0])
+
+        gen = ImageGenerator()
+        for shape in ("rect", "circle", "ngon"):
+            image = gen.create_rgba_image(ImageGeneratorSettings(shape=shape, gradient=.5, noise=.5))
+            self.assertEqual((32, 32, 4), image.pixels.shape)
+            # gradient and noise only change the color
+            plain_image = gen.create_rgba_image(ImageGeneratorSettings(shape=shape))
+            np.testing.assert_equal(plain_image.pixels[:, :, 3], image.pixels[:, :, 3])
+            self.assertFalse(np.array_equal(plain_image.pixels[:, :, :3], image.pixels[:, :, :3]))
+
+    def test_mask_timing(self):
+        for size in (32, 128, 256):
+            settings = ImageGeneratorSettings(shape="circle", size=(size, size), gradient=.3, noise=.2)
+            with Timer() as timer:
+                ImageGenerator().create_rgba_image(settings)
+            timer.print(f"{size}x{size} image")
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,91 @@
+import os
+import tempfile
+import unittest
+
+import pyglet
+
+from ..images import Images
+from ..image_cache import ImageDiskCache
+from ..image_gen import ImageGenerator, ImageGeneratorSettings
+
+
+class TestImages(unittest.TestCase):
+
+    def test_disk_cache(self):
+        with tempfile.TemporaryDirectory() as path:
+            images = Images(disk_cache=ImageDiskCache(path), atlas_size=0)
+            uri = "gen/?size=16,8&shape=circle&color=1,.5,0,1"
+            image = images.centered_image(uri)
+            images.centered_image(uri)
+            self.assertEqual((8, 4), (image.anchor_x, image.anchor_y))
+            self.assertEqual(
+                {"memory_hits": 1, "disk_hits": 0, "misses": 1, "images": 1, "atlas_textures": 0, "disk_bytes": 16 * 8 * 4},
+                images.stats(),
+            )
+
+            # a new process with an equivalent uri loads from disk
+            images = Images(disk_cache=ImageDiskCache(path), atlas_size=0)
+            normalized_uri = ImageGeneratorSettings.from_uri(uri).to_uri()
+            image2 = images.centered_image(normalized_uri)
+            self.assertEqual(1, images.stats()["disk_hits"])
+            self.assertEqual(0, images.stats()["misses"])
+            self.assertEqual(
+                image.get_data("RGBA", 16 * 4),
+                image2.get_data("RGBA", 16 * 4),
+            )
+            self.assertEqual(
+                ImageGenerator().create_from_uri(uri).get_data("RGBA", 16 * 4),
+                image2.get_data("RGBA", 16 * 4),
+            )
+
+            # a changed generator does not use the old files
+            images = Images(disk_cache=ImageDiskCache(path), atlas_size=0)
+            images.generator.VERSION = ImageGenerator.VERSION + 1
+            images.centered_image(uri)
+            self.assertEqual(0, images.stats()["disk_hits"])
+            self.assertEqual(1, images.stats()["misses"])
+
+    def test_atlas(self):
+        images = Images(disk_cache=False, atlas_size=128, atlas_max_image_size=64)
+        uris = [
+            ImageGeneratorSettings(shape="circle", size=(16, 16), color=(i / 10, .5, .5, 1)).to_uri()
+            for i in range(10)
+        ]
+        regions = [images.centered_image(uri) for uri in uris]
+        self.assertEqual(1, len(set(region.get_texture().id for region in regions)))
+        self.assertEqual(1, images.stats()["atlas_textures"])
+        self.assertEqual((8, 8), (regions[3].anchor_x, regions[3].anchor_y))
+        self.assertEqual(
+            ImageGenerator().create_from_uri(uris[3]).get_data("RGBA", 16 * 4),
+            regions[3].get_image_data().get_data("RGBA", 16 * 4),
+        )
+
+        # sprites of different images share the texture group
+        sprites = [pyglet.sprite.Sprite(region) for region in regions[:2]]
+        self.assertEqual(sprites[0]._group, sprites[1]._group)
+
+        # images larger than atlas_max_image_size get their own texture
+        large_image = images.centered_image("gen/?size=100,20")
+        self.assertNotIn(large_image.get_texture().id, [region.get_texture().id for region in regions])
+
+        # overflow into a second atlas
+        for i in range(20):
+            images.centered_image(f"gen/?size=40,40&seed={i}&noise=.1")
+        self.assertLess(1, images.stats()["atlas_textures"])
+
+    def test_disk_cache_eviction(self):
+        with tempfile.TemporaryDirectory() as path:
+            cache = ImageDiskCache(path, max_bytes=3 * 64)
+            for i in range(3):
+                cache.put(f"image-{i}", bytes([i]) * 64)
+                os.utime(cache.filename(f"image-{i}"), ns=(i * 10**9, i * 10**9))
+
+            # touch the first one
+            self.assertIsNotNone(cache.get("image-0", (4, 4)))
+            self.assertIsNone(cache.get("image-0", (4, 5)))
+
+            cache.put("image-3", bytes([3]) * 64)
+            self.assertEqual(3 * 64, cache.total_bytes())
+            self.assertIsNone(cache.get("image-1", (4, 4)))
+            for i in (0, 2, 3):
+                self.assertEqual(bytes([i]) * 64, cache.get(f"image-{i}", (4, 4)))
@@ -0,0 +1,63 @@
+import unittest
+
+import numpy as np
+
+from ..engine import Engine
+from ..objects.primitives import Box
+from ..util.timer import Timer
+
+
+class TestParticles(unittest.TestCase):
+
+    def test_particles(self):
+        engine = Engine(headless=True)
+        engine.particles.rng = np.random.default_rng(23)
+        engine.add_body(Box((0, -1), (20, 1)))
+        engine.update(1 / 60)
+
+        engine.add_particles((0, 2), num=10000, min_lifetime=1, max_lifetime=2)
+        self.assertEqual(10000, len(engine.particles))
+        self.assertEqual(0, len(engine.particles.bodies))
+
+        with Timer(60) as timer:
+            for i in range(60):
+                engine.update(1 / 60)
+        timer.print("10000 particles update")
+
+        particles = engine.particles
+        # nothing falls through the ground
+        on_ground = np.abs(particles.positions[:, 0]) < 19
+        self.assertLess(-.05, np.min(particles.positions[on_ground, 1] - particles.radii[on_ground]))
+
+        for i in range(30):
+            engine.update(1 / 60)
+        self.assertLess(0, len(particles))
+        self.assertGreater(10000, len(particles))
+        self.assertTrue(np.all(particles.ages < particles.lifetimes))
+
+        for i in range(60):
+            engine.update(1 / 60)
+        self.assertEqual(0, len(particles))
+
+    def test_max_particles(self):
+        engine = Engine(headless=True)
+        engine.particles.max_particles = 100
+        engine.add_particles((0, 0), num=80, min_lifetime=1, max_lifetime=1)
+        engine.add_particles((0, 0), num=80, min_lifetime=2, max_lifetime=2)
+        self.assertEqual(100, len(engine.particles))
+        self.assertEqual(80, np.sum(engine.particles.lifetimes == 2))
+
+    def test_render(self):
+        engine = Engine()
+        engine.add_particles((0, 0), num=10)
+        engine.update(1 / 60)
+        engine.render(1 / 60)
+        self.assertEqual(10 * 10, engine.particles._vertex_list.get_size())
+
+        engine.particles.add_particle((0, 0), (0, 0), .1)
+        engine.render(1 / 60)
+        self.assertEqual(11 * 10, engine.particles._vertex_list.get_size())
+
+        engine.particles.clear()
+        engine.render(1 / 60)
+        self.assertIsNone(engine.particles._vertex_list)
@@ -0,0 +1,110 @@
+import gc
+import unittest
+
+from pymunk import Vec2d
+
+from ..engine import Engine
+from ..agents.player import Player
+from ..objects.primitives import Box
+from ..objects.constraints import FixedJoint
+from ..objects.graphical import GraphicSettings
+
+sprite_settings = GraphicSettings(draw_sprite=True, image_name="gen/")
+
+
+class TestPool(unittest.TestCase):
+
+    def test_park_and_revive(self):
+        engine = Engine()
+        pool = engine.body_pool
+        body = pool.acquire(
+            engine.container, Box, position=(0, 0), extent=(.5, .5), density=1, graphic_settings=sprite_settings,
+        )
+        engine.update(1/60)
+        engine.render(1/60)
+        pymunk_body = body._body
+        sprite = body._graphics[0]
+        self.assertIn(pymunk_body, engine.space.bodies)
+
+        pool.release(body)
+        self.assertNotIn(body, engine.container.bodies)
+        self.assertNotIn(pymunk_body, engine.space.bodies)
+        self.assertFalse(sprite.visible)
+        self.assertIsNone(body._lines)
+        engine.update(1/60)
+        engine.render(1/60)
+
+        # different parameters create a new body
+        other = pool.acquire(
+            engine.container, Box, position=(0, 0), extent=(.5, 1), density=1, graphic_settings=sprite_settings,
+        )
+        self.assertIsNot(body, other)
+
+        revived = pool.acquire(
+            engine.container, Box, position=(3, 4), angle=1., velocity=(1, 0),
+            extent=(.5, .5), density=1, graphic_settings=sprite_settings,
+        )
+        self.assertIs(body, revived)
+        self.assertIs(pymunk_body, body._body)
+        self.assertIn(pymunk_body, engine.space.bodies)
+        self.assertIn(body, engine.container.bodies)
+        self.assertEqual(Vec2d(3, 4), body.position)
+        self.assertEqual(Vec2d(1, 0), body.velocity)
+
+        engine.update(1/60)
+        engine.render(1/60)
+        self.assertIs(sprite, body._graphics[0])
+        self.assertTrue(sprite.visible)
+        self.assertEqual(tuple(body.position), sprite.position)
+        self.assertIsNotNone(body._lines)
+        self.assertEqual({"created": 2, "revived": 1, "parked": 1, "removed": 0, "num_parked": 0}, pool.stats())
+
+    def test_not_parkable(self):
+        engine = Engine(headless=True)
+        pool = engine.body_pool
+        a = pool.acquire(engine.container, Box, position=(0, 0), extent=(.5, .5), density=1)
+        b = engine.add_body(Box((1, 0), (.5, .5), density=1))
+        # physics not yet created
+        pool.release(pool.acquire(engine.container, Box, position=(0, 0), extent=(.5, .5), density=1))
+        engine.update(1/60)
+        engine.add_constraint(FixedJoint(a, b, (0, 0), (0, 0)))
+        engine.update(1/60)
+        pool.release(a)
+        engine.update(1/60)
+        self.assertNotIn(a, engine.container.bodies)
+        self.assertIsNone(a._body)
+        self.assertEqual(2, pool.stats()["removed"])
+        self.assertEqual(0, pool.stats()["num_parked"])
+
+    def test_removed_bodies_are_forgotten(self):
+        engine = Engine(headless=True)
+        pool = engine.body_pool
+        body = pool.acquire(engine.container, Box, position=(0, 0), extent=(.5, .5), density=1)
+        engine.update(1/60)
+        self.assertEqual(1, len(pool._keys))
+
+        # removed without release()
+        body.remove()
+        engine.update(1/60)
+        del body
+        gc.collect()
+        self.assertEqual(0, len(pool._keys))
+
+    def test_bullets(self):
+        engine = Engine(headless=True)
+        engine.player = engine.add_container(Player((0, 1)))
+        engine.add_body(Box((0, -1), (20, 1)))
+        engine.update(1/60)
+        # bullets live until removed unless a lifetime is set
+        self.assertIsNone(engine.player.bullet_lifetime)
+        engine.player.bullet_lifetime = .5
+
+        for i in range(120):
+            if i % 10 == 0:
+                engine.player.shoot(Vec2d(0, 1))
+            engine.update(1/60)
+
+        stats = engine.body_pool.stats()
+        self.assertEqual(12, stats["created"] + stats["revived"])
+        self.assertGreaterEqual(4, stats["created"])
+        self.assertEqual(len(engine.player._bullets), len(engine.player.bodies) - 1)
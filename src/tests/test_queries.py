@@ -0,0 +1,133 @@
+import unittest
+
+import numpy as np
+
+from ..engine import Engine
+from ..agents.player import Player
+from ..objects.primitives import Box, Circle
+from ..util.timer import Timer
+
+
+class TestQueries(unittest.TestCase):
+
+    def test_ray_query(self):
+        engine = Engine(headless=True)
+        obj_1 = engine.add_body(Circle((0, 0), 1))
+        obj_2 = engine.add_body(Circle((10, 0), 5))
+        engine.update(1/60)
+
+        origins = [(-10, 0), (-10, .9), (-10, 2), (-10, 10), (-10, 0)]
+        hits = engine.queries.ray_query(origins, (1, 0), max_distance=100)
+        self.assertEqual([True, True, True, False, True], hits["hit"].tolist())
+        self.assertEqual(
+            [obj_1, obj_1, obj_2, None, obj_1],
+            [engine.queries.get_body(i) for i in hits["body_index"]],
+        )
+        self.assertEqual(1, engine.queries.stats()["hits"])
+        self.assertEqual(4, engine.queries.stats()["misses"])
+        for origin, hit in zip(origins, hits):
+            trace_hit = engine.trace(origin, (1, 0), max_distance=100, mode="segment")
+            if trace_hit:
+                np.testing.assert_allclose(tuple(trace_hit.position), hit["position"])
+                np.testing.assert_allclose(tuple(trace_hit.gradient), hit["normal"])
+                self.assertAlmostEqual(trace_hit.distance, hit["distance"])
+
+        # cached until next space step
+        hits = engine.queries.stats()["hits"]
+        engine.queries.ray_query(origins, (1, 0), max_distance=100)
+        self.assertEqual(hits + 5, engine.queries.stats()["hits"])
+        engine.update(1/60)
+        engine.queries.ray_query(origins, (1, 0), max_distance=100)
+        self.assertEqual(hits + 6, engine.queries.stats()["hits"])
+
+    def test_single_query_cache(self):
+        engine = Engine(headless=True)
+        obj_1 = engine.add_body(Box((0, 0), (1, 1)))
+        engine.update(1/60)
+        queries = engine.queries
+
+        self.assertIs(obj_1, engine.point_query_nearest_body((2, 0), max_distance=2))
+        self.assertIs(obj_1, engine.point_query_nearest_body((2, 0.000001), max_distance=2))
+        self.assertIsNone(engine.point_query_nearest_body((2, 0), max_distance=.5))
+        self.assertIs(obj_1, engine.point_query_body((0, 0)))
+        self.assertIs(obj_1, engine.point_query_body((0, 0)))
+        hit = engine.trace((-10, 0), (1, 0))
+        self.assertIs(hit, engine.trace((-10, 0), (1, 0)))
+        self.assertIsNot(hit, engine.trace((-10, 0), (1, 0), mode="segment"))
+        self.assertEqual(3, queries.stats()["hits"])
+        self.assertEqual(5, queries.stats()["misses"])
+
+        # invalidated by the next step
+        engine.update(1/60)
+        self.assertIsNot(hit, engine.trace((-10, 0), (1, 0)))
+        self.assertEqual(6, queries.stats()["misses"])
+
+        queries.resolution = 0
+        self.assertIsNot(hit, engine.trace((-10, 0), (1, 0)))
+        self.assertEqual(6, queries.stats()["misses"])
+
+    def test_cache_invalidated_by_space_changes(self):
+        engine = Engine(headless=True)
+        box = engine.add_body(Box((0, 0), (1, 1)))
+        engine.update(1/60)
+        self.assertIs(box, engine.point_query_nearest_body((0, 0)))
+
+        # the container update runs after the space step, within the same step_count
+        step_count = engine.step_count
+        engine.remove_body(box)
+        engine.container.update(1/60)
+        self.assertEqual(step_count, engine.step_count)
+        self.assertIsNone(engine.point_query_nearest_body((0, 0)))
+
+        circle = engine.add_body(Circle((0, 0), 1))
+        engine.container.update(1/60)
+        self.assertIs(circle, engine.point_query_nearest_body((0, 0)))
+
+        hits = engine.queries.ray_query([(-10, 0)], (1, 0), max_distance=100)
+        self.assertEqual([True], hits["hit"].tolist())
+        engine.remove_body(circle)
+        engine.container.update(1/60)
+        hits = engine.queries.ray_query([(-10, 0)], (1, 0), max_distance=100)
+        self.assertEqual([False], hits["hit"].tolist())
+
+    def test_point_query(self):
+        engine = Engine(headless=True)
+        obj_1 = engine.add_body(Box((0, 0), (1, 1)))
+        engine.update(1/60)
+
+        hits = engine.queries.point_query([(3, 0), (0, 0), (10, 0)], max_distance=5)
+        self.assertEqual([True, True, False], hits["hit"].tolist())
+        self.assertEqual([0, 0, -1], hits["body_index"].tolist())
+        self.assertAlmostEqual(2., hits["distance"][0])
+        self.assertAlmostEqual(-1., hits["distance"][1])
+        np.testing.assert_allclose((1, 0), hits["position"][0])
+        np.testing.assert_allclose((1, 0), hits["normal"][0])
+
+    def test_foot_contact(self):
+        engine = Engine(headless=True)
+        engine.player = engine.add_container(Player((0, 1)))
+        engine.add_body(Box((0, -1), (20, 1)))
+        for i in range(60):
+            engine.update(1/60)
+        self.assertTrue(engine.player.has_foot_contact())
+        engine.player.bodies[0].position = (0, 5)
+        engine.queries.clear()
+        self.assertFalse(engine.player.has_foot_contact())
+
+    def test_query_timing(self):
+        engine = Engine(headless=True)
+        for i in range(100):
+            engine.add_body(Box((i * 3, 0), (1, 1)))
+        engine.update(1/60)
+
+        # 100 agents with the same 10 sensor rays
+        origins = np.tile(np.stack([np.linspace(0, 300, 10), np.full(10, 5.)], axis=-1), (100, 1))
+        for resolution in (0, engine.queries.resolution):
+            engine.queries.resolution = resolution
+            with Timer(len(origins)) as timer:
+                for origin in origins:
+                    engine.trace(origin, (0, -1), max_distance=10)
+            timer.print(f"single traces, cache resolution {resolution}")
+        with Timer(len(origins)) as timer:
+            engine.queries.ray_query(origins, (0, -1), max_distance=10)
+        timer.print("batched ray query")
@@ -1,6 +1,8 @@
 import unittest
 import time
 
+import numpy as np
+
 from ..maps.rand import RandomXY
 
 
@@ -43,6 +45,48 @@ class TestRandom(unittest.TestCase):
         print(f"{num_steps} random numbers took {round(length, 3)} seconds == "
               f"{int(num_steps/length)} numbers per second")
 
+        for name, func in (
+                ("random_grid", rnd.random_grid),
+                ("noise_grid", rnd.noise_grid),
+                ("fractal_noise_grid", rnd.fractal_noise_grid),
+        ):
+            xs = np.arange(1000) / 10
+            ys = np.arange(100) / 10
+            start_time = time.time()
+            func(xs, ys)
+            length = max(1e-9, time.time() - start_time)
+            num_steps = len(xs) * len(ys)
+            print(f"{num_steps} {name} numbers took {round(length, 3)} seconds == "
+                  f"{int(num_steps/length)} numbers per second")
+
+    def test_grid(self):
+        rnd = RandomXY(5)
+        # per-point noise() truncates negative coordinates towards zero, so compare positive ones
+        xs = np.arange(100) / 5
+        ys = np.arange(50) / 5
+
+        grid = rnd.random_grid(np.arange(-100, 100), np.arange(-50, 50))
+        self.assertEqual((100, 200), grid.shape)
+        self.assertTrue(np.all(grid >= 0) and np.all(grid < 1))
+        self.assertAlmostEqual(.5, grid.mean(), places=1)
+        self.assertAlmostEqual(np.sqrt(1 / 12), grid.std(), places=1)
+
+        # deterministic in the seed
+        np.testing.assert_equal(grid, RandomXY(5).random_grid(np.arange(-100, 100), np.arange(-50, 50)))
+        self.assertFalse(np.all(grid == RandomXY(6).random_grid(np.arange(-100, 100), np.arange(-50, 50))))
+        self.assertFalse(np.all(grid == rnd.random_grid(np.arange(-100, 100), np.arange(-50, 50), seed=1)))
+
+        # statistically similar to the per-point versions
+        for grid_func, point_func in (
+                (rnd.noise_grid, rnd.noise),
+                (rnd.fractal_noise_grid, rnd.fractal_noise),
+        ):
+            grid = grid_func(xs, ys)
+            points = np.array([[point_func(x, y) for x in xs] for y in ys])
+            self.assertEqual(points.shape, grid.shape)
+            self.assertAlmostEqual(points.mean(), grid.mean(), places=1)
+            self.assertAlmostEqual(points.std(), grid.std(), places=1)
+
 
 if __name__ == '__main__':
     unittest.main()
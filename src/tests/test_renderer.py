@@ -0,0 +1,132 @@
+import unittest
+
+import numpy as np
+from pymunk import Vec2d
+
+from ..engine import Engine
+from ..objects.primitives import Box, Circle, Ngon
+from ..objects.constraints import FixedJoint
+from ..objects.graphical import GraphicSettings
+from ..util.timer import Timer
+
+
+class TestRenderer(unittest.TestCase):
+
+    def assertLinesEqual(self, obj):
+        expected = [c for pos in obj.iter_render_points() for c in (pos[0], pos[1])]
+        for value, expected_value in zip(obj._lines.vertices, expected):
+            self.assertAlmostEqual(expected_value, value, places=4)
+
+    def test_retained_lines(self):
+        engine = Engine()
+        box = engine.add_body(Box((0, 0), (1, 1)))
+        box_2 = engine.add_body(Box((2, 0), (1, 1)))
+        joint = engine.add_constraint(FixedJoint(box, box_2, (.5, 0), (-.5, 0)))
+
+        engine.update(1/60)
+        engine.render(1/60)
+        self.assertEqual(4, box._lines.get_size())
+        self.assertEqual(2, joint._lines.get_size())
+        self.assertLinesEqual(box)
+        self.assertLinesEqual(joint)
+
+        # the vertex lists are updated in place
+        lines = box._lines
+        for i in range(10):
+            engine.update(1/60)
+        engine.render(1/60)
+        self.assertIs(lines, box._lines)
+        self.assertLinesEqual(box)
+        self.assertLinesEqual(joint)
+        self.assertEqual(0, len(engine.renderer._batches))
+
+        # disabled batches are not updated
+        engine.renderer.set_batch_enabled("lines", False)
+        vertices = tuple(box._lines.vertices)
+        engine.update(1/60)
+        engine.render(1/60)
+        self.assertEqual(vertices, tuple(box._lines.vertices))
+        engine.renderer.set_batch_enabled("lines", True)
+        engine.render(1/60)
+        self.assertLinesEqual(box)
+
+        engine.remove_body(box)
+        engine.update(1/60)
+        engine.render(1/60)
+        self.assertIsNone(box._lines)
+        self.assertIsNone(joint._lines)
+
+    def test_body_transforms(self):
+        engine = Engine()
+        ground = engine.add_body(Box((0, -1), (50, 1)))
+        bodies = []
+        for i in range(100):
+            if i % 3 == 0:
+                bodies.append(engine.add_body(Circle((i % 10 - 5, i // 10 + 1), .3, density=1)))
+            elif i % 3 == 1:
+                bodies.append(engine.add_body(Ngon((i % 10 - 5, i // 10 + 1), .3, segments=5, density=1)))
+            else:
+                bodies.append(engine.add_body(Box((i % 10 - 5, i // 10 + 1), (.3, .2), angle=i, density=1)))
+
+        for i in range(3):
+            engine.advance(1 / 60)
+            engine.render(1 / 60)
+
+        self.assertEqual(100, len(engine.body_transforms))
+        for body in bodies:
+            points = engine.body_transforms.get_points(body)
+            expected_points = [(p.x, p.y) for p in body.iter_render_points()]
+            np.testing.assert_allclose(expected_points, points, atol=1e-9)
+            self.assertLinesEqual(body)
+
+        # static bodies are not updated again
+        self.assertTrue(ground._graphics_current)
+        self.assertIsNone(engine.body_transforms.get_points(ground))
+        vertices = tuple(ground._lines.vertices)
+        ground.position = (0, -2)
+        engine.render(1 / 60)
+        self.assertNotEqual(vertices, tuple(ground._lines.vertices))
+        self.assertLinesEqual(ground)
+
+        with Timer(len(bodies)) as timer:
+            for body in bodies:
+                tuple(body.iter_world_points())
+        timer.print("per-vertex world points")
+        with Timer(len(bodies)) as timer:
+            engine.body_transforms.update()
+        timer.print("batched world points")
+
+    def test_culling(self):
+        engine = Engine()
+        sprite_settings = GraphicSettings(draw_sprite=True, draw_lines=True, image_name="gen/")
+        near_box = engine.add_body(Box((0, 0), (1, 1), density=1, graphic_settings=sprite_settings))
+        far_box = engine.add_body(Box((100, 0), (1, 1), density=1, graphic_settings=sprite_settings))
+        far_ground = engine.add_body(Box((100, -2), (5, 1)))
+        joint = engine.add_constraint(FixedJoint(near_box, far_box, (0, 0), (0, 0)))
+
+        engine.update(1/60)
+        engine.render(1/60)
+        self.assertEqual({near_box}, engine.renderer.visible_bodies)
+        self.assertTrue(near_box._graphics[0].visible)
+        self.assertFalse(far_box._graphics[0].visible)
+        self.assertIsNotNone(near_box._lines)
+        self.assertIsNone(far_box._lines)
+        self.assertIsNone(far_ground._lines)
+        self.assertIsNotNone(joint._lines)
+        self.assertEqual(1, len(engine.body_transforms))
+
+        engine.renderer.translation = Vec2d(100, 0)
+        engine.update(1/60)
+        engine.render(1/60)
+        self.assertEqual({far_box, far_ground}, engine.renderer.visible_bodies)
+        self.assertFalse(near_box._graphics[0].visible)
+        self.assertTrue(far_box._graphics[0].visible)
+        self.assertIsNone(near_box._lines)
+        self.assertLinesEqual(far_box)
+        self.assertLinesEqual(far_ground)
+        self.assertEqual(far_box.position, far_box._graphics[0].position)
+
+        engine.renderer.culling_enabled = False
+        engine.render(1/60)
+        self.assertTrue(near_box._graphics[0].visible)
+        self.assertLinesEqual(near_box)
@@ -0,0 +1,99 @@
+import io
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from ..engine import Engine
+from ..headless import HeadlessRunner
+from ..maps import map_gen
+from ..objects.body import Body
+from ..replay import InputRecording, InputRecorder, InputReplay, state_checksum
+
+
+class TestReplay(unittest.TestCase):
+
+    KEY_SCRIPT = {
+        5: ("right", True),
+        40: ("right", False),
+        41: ("up", True),
+        43: ("up", False),
+        50: ("shoot", True),
+        52: ("shoot", False),
+        60: ("left", True),
+        100: ("left", False),
+    }
+
+    def record(self, num_steps=120):
+        runner = HeadlessRunner("bd", seed=23)
+        recorder = InputRecorder(runner.engine, "bd", 23)
+        for i in range(num_steps):
+            if i in self.KEY_SCRIPT:
+                recorder.set_key_down(*self.KEY_SCRIPT[i])
+            if i == 10:
+                player = runner.engine.player
+                self.assertIs(player.bodies[0], recorder.mouse_press(player.position, 1))
+            runner.step()
+        return recorder.stop(), state_checksum(runner.engine)
+
+    def test_record_and_replay(self):
+        recording, live_checksum = self.record()
+        self.assertEqual(120, recording.num_steps)
+        self.assertEqual(len(self.KEY_SCRIPT), len(recording.events))
+        self.assertEqual(1, len(recording.mouse_events))
+        self.assertEqual((10, 1), (recording.mouse_events[0][0], recording.mouse_events[0][3]))
+
+        with tempfile.TemporaryDirectory() as path:
+            filename = os.path.join(path, "recording.json")
+            recording.save(filename)
+            recording = InputRecording.load(filename)
+        self.assertEqual(1, len(recording.mouse_events))
+
+        # the first replay reproduces the live session and stores the checksums
+        replay = InputReplay(recording).run()
+        self.assertEqual(120, len(recording.checksums))
+        self.assertEqual(live_checksum, recording.checksums[-1])
+        self.assertEqual(len(self.KEY_SCRIPT), replay.stats()["events"])
+        self.assertEqual(1, replay.stats()["mouse_events"])
+        self.assertIn("checksum", replay.engine.phase_timings.seconds)
+
+        replay = InputReplay(recording).run()
+        self.assertEqual(0, replay.num_mismatches)
+        self.assertIsNone(replay.first_mismatch)
+
+        # behavior drift, the jump was pressed before update 41
+        recording.events = [e for e in recording.events if e[1] != "up"]
+        replay = InputReplay(recording).run()
+        self.assertEqual(41, replay.first_mismatch)
+        self.assertGreater(replay.num_mismatches, 0)
+
+        # recordings without mouse events
+        data = recording.to_dict()
+        data["version"] = 1
+        del data["mouse_events"]
+        self.assertEqual([], InputRecording.from_dict(data).mouse_events)
+
+        file = io.StringIO()
+        replay.print_report(file)
+        report = file.getvalue()
+        self.assertIn("first_mismatch", report)
+        self.assertIn("steps_per_second", report)
+        self.assertIn("phases:", report)
+
+    def test_seeded_engine(self):
+        def create_world(seed):
+            engine = Engine(headless=True, seed=seed)
+            engine.add_particles((0, 0), num=50)
+            map_gen.add_from_map(engine)
+            engine.update(1/60)
+            bodies = [o for o in engine.container.iter_objects_recursive() if isinstance(o, Body)]
+            return engine.particles.positions, [(tuple(b.position), b.density) for b in bodies]
+
+        positions, bodies = create_world(5)
+        positions_2, bodies_2 = create_world(5)
+        np.testing.assert_equal(positions, positions_2)
+        self.assertEqual(bodies, bodies_2)
+
+        positions_3, bodies_3 = create_world(6)
+        self.assertFalse(np.array_equal(positions, positions_3))
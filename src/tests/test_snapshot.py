@@ -0,0 +1,181 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from ..engine import Engine
+from ..headless import HeadlessRunner
+from ..objects.body import Body
+from ..objects.container import ObjectContainer
+from ..objects.primitives import Box, Circle
+from ..objects.constraints import FixedJoint, SpringJoint
+from ..objects.chunks import ChunkedWorld
+from ..replay import state_checksum
+
+
+class TestSnapshot(unittest.TestCase):
+
+    def get_state(self, engine):
+        return sorted(
+            (o.id, tuple(o.position), o.angle, tuple(o.velocity), o.angular_velocity)
+            for o in engine.container.iter_objects_recursive()
+            if isinstance(o, Body)
+        )
+
+    def test_round_trip(self):
+        runner = HeadlessRunner("gen2")
+        runner.run(30)
+        engine = runner.engine
+        engine.add_particles((0, 5), num=100)
+        engine.update(1/60)
+
+        state = self.get_state(engine)
+        particle_positions = engine.particles.positions.copy()
+        num_constraints = len(engine.space.constraints)
+        snapshot = engine.snapshot()
+
+        runner.run(30)
+        self.assertNotEqual(state, self.get_state(engine))
+
+        engine.restore(snapshot)
+        self.assertEqual(state, self.get_state(engine))
+        self.assertEqual(len(state), len(engine.space.bodies))
+        self.assertEqual(num_constraints, len(engine.space.constraints))
+        np.testing.assert_equal(particle_positions, engine.particles.positions)
+        self.assertIs(engine.player, next(c for c in engine.container.containers if c is engine.player))
+        self.assertIs(engine, engine.player.bodies[0].engine)
+
+        # restored worlds continue identically
+        engine.restore(snapshot)
+        runner.run(30)
+        state_2 = self.get_state(engine)
+        engine.restore(snapshot)
+        runner.run(30)
+        self.assertEqual(state_2, self.get_state(engine))
+
+    def test_file(self):
+        engine = Engine(headless=True)
+        ground = engine.add_body(Box((0, -1), (20, 1)))
+        a = engine.add_body(Circle((0, 3), .5, density=1))
+        b = engine.add_body(Circle((2, 3), .5, density=1))
+        engine.add_constraint(SpringJoint(a, b, (0, 0), (0, 0)))
+        engine.add_particles((0, 1), num=1000)
+        for i in range(10):
+            engine.update(1/60)
+        state = self.get_state(engine)
+
+        with tempfile.TemporaryDirectory() as path:
+            filename = os.path.join(path, "snapshot.bin")
+            engine.snapshot(filename)
+            for i in range(10):
+                engine.update(1/60)
+
+            engine.restore(filename)
+            self.assertEqual(state, self.get_state(engine))
+            self.assertEqual(1, len(engine.space.constraints))
+            # the particle arrays are mapped from the file
+            base = engine.particles.positions
+            while not isinstance(base, np.memmap) and base.base is not None:
+                base = base.base
+            self.assertIsInstance(base, np.memmap)
+            engine.update(1/60)
+
+            with open(filename, "wb") as fp:
+                fp.write(b"not a snapshot")
+            with self.assertRaises(ValueError):
+                engine.restore(filename)
+
+    def test_constraint_state(self):
+        engine = Engine(headless=True)
+        a = engine.add_body(Circle((0, 3), .5, density=1))
+        b = engine.add_body(Circle((2, 3), .5, density=1))
+        joint = engine.add_constraint(FixedJoint(a, b, (0, 0), (0, 0)))
+        engine.update(1/60)
+        joint.distance = 1.5
+        joint._constraint.max_force = 1000.
+
+        engine.restore(engine.snapshot())
+        restored = next(iter(engine.container.constraints))
+        self.assertIsNot(joint, restored)
+        self.assertAlmostEqual(1.5, restored.distance)
+        self.assertAlmostEqual(1000., restored._constraint.max_force)
+        self.assertAlmostEqual(2., restored.original_distance)
+
+    def test_space_order_and_sleep(self):
+        engine = Engine(headless=True)
+        container = engine.add_container(ObjectContainer())
+        container.add_body(Box((0, -1), (20, 1)))
+        engine.update(1/60)
+        # in the space after the ground, but before it in the tree
+        boxes = [engine.add_body(Box((x, 0.01), (.5, .5), density=1)) for x in (-4, 4)]
+        a = engine.add_body(Box((-1, 0.01), (.5, .5), density=1))
+        b = engine.add_body(Box((1, 0.01), (.5, .5), density=1))
+        engine.add_constraint(FixedJoint(a, b, (0, 0), (0, 0)))
+        for i in range(120):
+            engine.update(1/60)
+        self.assertTrue(all(body.is_sleeping() for body in boxes + [a, b]))
+
+        order = [body._parent_body.id for body in engine.space.bodies]
+        checksum = state_checksum(engine)
+        engine.restore(engine.snapshot())
+        self.assertEqual(order, [body._parent_body.id for body in engine.space.bodies])
+        self.assertEqual(checksum, state_checksum(engine))
+
+        bodies = {o.id: o for o in engine.container.iter_objects_recursive() if isinstance(o, Body)}
+        self.assertTrue(all(bodies[body.id].is_sleeping() for body in boxes + [a, b]))
+        # jointed bodies share their sleeping group
+        bodies[a.id].body.activate()
+        self.assertFalse(bodies[b.id].is_sleeping())
+        self.assertTrue(bodies[boxes[0].id].is_sleeping())
+
+    def test_unknown_class(self):
+        engine = Engine(headless=True)
+        box = engine.add_body(Box((0, 0), (1, 1), density=1))
+        engine.update(1/60)
+        snapshot = engine.snapshot()
+
+        group = next(g for g in snapshot.schema["groups"] if g["class"].endswith(".Box"))
+        group["class"] = "subprocess.Popen"
+        with self.assertRaises(ValueError):
+            engine.restore(snapshot)
+        # the current world is untouched
+        self.assertIs(box, next(iter(engine.container.bodies)))
+        self.assertEqual(1, len(engine.space.bodies))
+
+    def test_inactive_chunks(self):
+        engine = Engine(headless=True)
+        world = engine.add_container(ChunkedWorld(chunk_size=10, active_radius=0))
+        near = world.add_body(Box((1, 1), (.5, .5), density=1))
+        far = world.add_body(Box((51, 1), (.5, .5), density=1))
+        engine.update(1/60)
+        self.assertIsNotNone(near._body)
+        self.assertIsNone(far._body)
+
+        engine.restore(engine.snapshot())
+        world = next(c for c in engine.container.containers if isinstance(c, ChunkedWorld))
+        self.assertIsNotNone(world.find_body(near.id)._body)
+        self.assertEqual(1, len(engine.space.bodies))
+        # the packed chunk is part of the snapshot
+        chunk = world.get_chunk(world.chunk_key(far.position), create=False)
+        self.assertEqual([far.id], list(chunk.iter_packed_ids()))
+        world.focus_position = far.position
+        world.update_chunks()
+        self.assertEqual(far.position, world.find_body(far.id).position)
+        self.assertEqual(1, len(engine.space.bodies))
+
+    def test_graphics(self):
+        engine = Engine()
+        box = engine.add_body(Box((0, 0), (1, 1), density=1))
+        engine.update(1/60)
+        engine.render(1/60)
+        self.assertIsNotNone(box._lines)
+
+        engine.restore(engine.snapshot())
+        # the graphics of the old objects are deleted
+        self.assertIsNone(box._lines)
+        engine.update(1/60)
+        engine.render(1/60)
+        restored_box = next(iter(engine.container.bodies))
+        self.assertIsNot(box, restored_box)
+        self.assertIsNotNone(restored_box._lines)
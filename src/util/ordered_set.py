@@ -0,0 +1,61 @@
+import itertools
+
+
+class OrderedSet:
+    """
+    Insertion-ordered set backed by a dict.
+
+    add, remove and membership tests are O(1).
+    Indexing supports the first and last item in O(1),
+    other indices are O(n).
+    """
+
+    def __init__(self, iterable=None):
+        self._items = dict()
+        if iterable is not None:
+            for item in iterable:
+                self._items[item] = None
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({list(self._items)})"
+
+    def __len__(self):
+        return len(self._items)
+
+    def __bool__(self):
+        return bool(self._items)
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __reversed__(self):
+        return reversed(self._items)
+
+    def __contains__(self, item):
+        return item in self._items
+
+    def __getitem__(self, index):
+        if not isinstance(index, int):
+            raise TypeError(f"{self.__class__.__name__} indices must be integers, got {index!r}")
+        size = len(self._items)
+        if index < 0:
+            index += size
+        if index < 0 or index >= size:
+            raise IndexError(f"{self.__class__.__name__} index out of range")
+        if index == 0:
+            return next(iter(self._items))
+        if index == size - 1:
+            return next(reversed(self._items))
+        return next(itertools.islice(self._items, index, None))
+
+    def add(self, item):
+        self._items[item] = None
+
+    def remove(self, item):
+        del self._items[item]
+
+    def discard(self, item):
+        self._items.pop(item, None)
+
+    def clear(self):
+        self._items.clear()
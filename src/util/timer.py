@@ -40,3 +40,69 @@ class Timer:
         if abs(x) < 1:
             return round(x, 5)
         return round(x, 2)
+
+
+class PhaseTimings:
+    """
+    Accumulates wall-clock time per named phase
+
+        timings = PhaseTimings()
+        with timings.measure("space_step"):
+            space.step(dt)
+
+    When disabled, measure() returns a no-op context to keep the overhead low.
+    """
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.seconds = dict()
+        self.counts = dict()
+
+    def measure(self, name):
+        if not self.enabled:
+            return _null_context
+        return _PhaseContext(self, name)
+
+    def add(self, name, seconds):
+        self.seconds[name] = self.seconds.get(name, 0.) + seconds
+        self.counts[name] = self.counts.get(name, 0) + 1
+
+    def clear(self):
+        self.seconds.clear()
+        self.counts.clear()
+
+    def print(self, file=None):
+        if not self.seconds:
+            return
+        max_len = max(len(name) for name in self.seconds)
+        for name, seconds in sorted(self.seconds.items(), key=lambda kv: -kv[1]):
+            count = self.counts[name]
+            print(
+                f"{name:{max_len}}: {Timer._round(seconds)} seconds, x{count}, "
+                f"{Timer._round(seconds / count * 1000.)} ms each",
+                file=file
+            )
+
+
+class _PhaseContext:
+    def __init__(self, timings, name):
+        self.timings = timings
+        self.name = name
+        self.start_time = None
+
+    def __enter__(self):
+        self.start_time = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.timings.add(self.name, time.perf_counter() - self.start_time)
+
+
+class _NullContext:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+
+_null_context = _NullContext()
@@ -9,6 +9,7 @@ from .engine import Engine
 from .maps import map_gen, bd_map
 
 from .agents.player import Player
+from .replay import InputRecorder, mouse_press
 
 
 class MainWindow(pyglet.window.Window):
@@ -23,19 +24,27 @@ class MainWindow(pyglet.window.Window):
         115: "shoot",
     }
 
-    def __init__(self, size=None):
+    def __init__(self, size=None, seed=None, record_filename=None):
+        """
+        :param seed: int, seed of the Engine
+        :param record_filename: str, if given, the player keys and mouse presses are recorded
+            and saved to this file when the window is closed
+        """
         if size:
             super().__init__(width=size[0], height=size[1], fullscreen=False)
         else:
             super().__init__(fullscreen=True)
         self.fps_display = pyglet.window.FPSDisplay(self)
-        self.engine = Engine()
+        self.engine = Engine(seed=seed, image_disk_cache=True)
 
         self.engine.player = Player((0, 1))
         self.engine.add_container(self.engine.player)
         #map_gen.initialize_map_2(self.engine)
         bd_map.initialize_map(self.engine)
 
+        self.record_filename = record_filename
+        self.recorder = InputRecorder(self.engine, "bd", seed) if record_filename else None
+
         self.do_render = True
         self.do_physics = True
         self.do_print_sensors = False
@@ -69,15 +78,32 @@ class MainWindow(pyglet.window.Window):
             self.close()
 
         if symbol in self.SYMBOL_TO_PLAYER_KEY:
-            self.engine.player.keys.set_key_down(self.SYMBOL_TO_PLAYER_KEY[symbol], True)
+            self.set_player_key_down(self.SYMBOL_TO_PLAYER_KEY[symbol], True)
 
     def on_key_release(self, symbol, modifiers):
         if symbol in self.SYMBOL_TO_PLAYER_KEY:
-            self.engine.player.keys.set_key_down(self.SYMBOL_TO_PLAYER_KEY[symbol], False)
+            self.set_player_key_down(self.SYMBOL_TO_PLAYER_KEY[symbol], False)
+
+    def set_player_key_down(self, key, down):
+        if self.recorder:
+            self.recorder.set_key_down(key, down)
+        else:
+            self.engine.player.keys.set_key_down(key, down)
+
+    def on_close(self):
+        if self.recorder:
+            recording = self.recorder.stop()
+            recording.save(self.record_filename)
+            print("saved", recording, "to", self.record_filename)
+            self.recorder = None
+        super().on_close()
 
     def on_mouse_press(self, x, y, button, modifiers):
         map_pos = self.engine.renderer.pixel_to_map(Vec2d(x, y))
-        body = self.engine.point_query_body(map_pos)
+        if self.recorder:
+            body = self.recorder.mouse_press(map_pos, button)
+        else:
+            body = mouse_press(self.engine, map_pos, button)
         if body:
             print()
             body.dump()
@@ -104,7 +130,7 @@ class MainWindow(pyglet.window.Window):
     def update(self, dt):
         # print(dt)
         if self.do_physics:
-            self.engine.update(dt)
+            self.engine.advance(dt)
             if self.do_print_sensors and hasattr(self.engine.player, "dump_sensors"):
                 self.engine.player.dump_sensors(dt)
 